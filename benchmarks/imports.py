@@ -0,0 +1,107 @@
+"""
+Import time of `ddtrace_asgi`, on top of `ddtrace`.
+
+Imports the package in fresh interpreters with `-X importtime`, and reports the
+cumulative import time of `ddtrace_asgi` along with the third-party packages it
+pulled in.
+
+Usage:
+
+    python -m benchmarks.imports [--rounds N] [--compare PATH]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .utils import compare, default_output, environment, load, save
+
+# NOTE: `ddtrace` is imported first, so that its own import time is not counted.
+CODE = "import ddtrace; import ddtrace_asgi"
+WATCHED = ("starlette", "deprecation")
+
+
+def run() -> Tuple[int, Set[str]]:
+    """
+    Return the cumulative import time of `ddtrace_asgi` (in microseconds), and the
+    watched packages it imported.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODE],
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+
+    cumulative = 0
+    imported = set()
+    for line in process.stderr.splitlines():
+        # Format: 'import time: {self} | {cumulative} | {name}'
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        name = fields[2].strip()
+        if name == "ddtrace_asgi":
+            cumulative = int(fields[1])
+        elif name.split(".")[0] in WATCHED:
+            imported.add(name.split(".")[0])
+
+    return cumulative, imported
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--output", type=Path, default=default_output("imports"))
+    parser.add_argument("--compare", type=Path, help="Results of a previous run.")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    run()  # Warm up bytecode caches.
+
+    durations: List[int] = []
+    imported: Set[str] = set()
+    for _ in range(args.rounds):
+        duration, packages = run()
+        durations.append(duration)
+        imported |= packages
+
+    scenarios: Dict[str, Dict[str, float]] = {
+        "import": {
+            "min_us": min(durations),
+            "p50_us": statistics.median(durations),
+        }
+    }
+
+    print(f"ddtrace_asgi import time: {scenarios['import']['p50_us']:.0f} us (p50)")
+    print(f"Imported: {', '.join(sorted(imported)) or 'none of ' + ', '.join(WATCHED)}")
+
+    save(
+        args.output,
+        {
+            "environment": environment(),
+            "imported": sorted(imported),
+            "scenarios": scenarios,
+        },
+    )
+    print(f"Results written to {args.output}")
+
+    if args.compare is not None:
+        regressions = compare(
+            load(args.compare)["scenarios"],
+            scenarios,
+            max_regression=args.max_regression,
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+"""
+Throughput of `TraceMiddleware` across worker processes.
+
+Serves the test applications with uvicorn and N workers, with the tracer of each
+worker pointed at a local fake Datadog Agent that decodes and counts trace
+payloads. Concurrent keep-alive traffic is driven from separate client processes,
+and throughput, latency percentiles, agent payload size and dropped traces are
+reported for each application and worker count, with and without the middleware.
+
+Usage:
+
+    python -m benchmarks.loadtest [--workers N [N ...]] [--duration SECONDS]
+        [--connections N] [--writer {agent,batched}] [--compare PATH]
+
+Results are written to `.benchmarks/loadtest/<version>.json` (not tracked) by
+default. Results of releases are recorded with
+`--output benchmarks/results/loadtest/<version>.json`, so that later runs can be
+compared against them. Throughput depends on the number of cores of the machine:
+only compare runs made on the same machine.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from ddtrace import Tracer
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+import ddtrace_asgi
+from tests.utils.agent import FakeAgent
+from tests.utils.fixtures import create_app
+
+from .utils import compare, default_output, environment, load, save, summarize
+
+APPLICATIONS = ("raw", "starlette", "fastapi")
+WRITERS = ("agent", "batched")
+# Counts of requests and traces grow with throughput, so they are not compared.
+COMPARED = ("throughput_rps", "p50_us", "p99_us", "payload_bytes_per_trace")
+
+# NOTE: workers are configured through the environment, as uvicorn imports the
+# application by name in each worker process.
+ENV_APPLICATION = "LOADTEST_APPLICATION"
+ENV_AGENT_PORT = "LOADTEST_AGENT_PORT"
+ENV_WRITER = "LOADTEST_WRITER"
+ENV_STATS_DIR = "LOADTEST_STATS_DIR"
+
+
+class App:
+    """
+    The application served by each worker.
+
+    It is built on the `lifespan` startup event, and the trace writer is flushed on
+    the shutdown event, after which statistics of the worker are written to
+    `<stats dir>/<pid>.json`.
+    """
+
+    def __init__(self) -> None:
+        self._app: Optional[ASGIApp] = None
+        self._tracer: Optional[Tracer] = None
+        self._requests = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    self._startup()
+                    await send({"type": "lifespan.startup.complete"})
+                else:
+                    self._shutdown()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        assert self._app is not None
+        self._requests += 1
+        await self._app(scope, receive, send)
+
+    def _startup(self) -> None:
+        application = os.environ[ENV_APPLICATION]
+        port = os.environ.get(ENV_AGENT_PORT)
+        if port is None:
+            self._app = create_app(application)
+            return
+
+        tracer = Tracer()
+        tracer.configure(hostname="127.0.0.1", port=int(port))
+        if os.environ[ENV_WRITER] == "batched":
+            ddtrace_asgi.BatchedWriter.install(tracer)
+        self._tracer = tracer
+        self._app = create_app(
+            application, middleware=[(ddtrace_asgi.TraceMiddleware, {"tracer": tracer})]
+        )
+
+    def _shutdown(self) -> None:
+        dropped = 0
+        if self._tracer is not None:
+            writer = self._tracer.writer
+            if isinstance(writer, ddtrace_asgi.BatchedWriter):
+                writer.stop(timeout=10)
+                dropped = writer.dropped_traces
+            else:
+                # NOTE: the agent writer flushes its queue when joined after a stop.
+                writer.stop()
+                writer.join(timeout=10)
+                dropped = writer._trace_queue.dropped
+
+        stats = {"requests": self._requests, "dropped_traces": dropped}
+        path = Path(os.environ[ENV_STATS_DIR]) / f"{os.getpid()}.json"
+        path.write_text(json.dumps(stats))
+
+
+app = App()
+
+
+async def drive(
+    url: str, connections: int, warmup: float, duration: float
+) -> Tuple[List[float], int]:
+    """
+    Send requests over `connections` keep-alive connections for `warmup` seconds,
+    then `duration` seconds, and return the latencies measured after the warm up
+    along with the number of failed requests.
+    """
+    latencies: List[float] = []
+    errors = 0
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    async with httpx.AsyncClient() as client:
+
+        async def connection() -> None:
+            nonlocal errors
+            while True:
+                sent = time.perf_counter()
+                if sent >= deadline:
+                    return
+                try:
+                    response = await client.get(url)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if response.status_code != 200:
+                    errors += 1
+                elif sent >= measure_from:
+                    latencies.append(time.perf_counter() - sent)
+
+        await asyncio.gather(*(connection() for _ in range(connections)))
+
+    return latencies, errors
+
+
+def run_client(args: Tuple[str, int, float, float]) -> Tuple[List[float], int]:
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(drive(*args))
+    finally:
+        loop.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, server: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except (httpx.HTTPError, OSError):
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Server did not start within {timeout}s")
+
+
+def measure(
+    application: str,
+    workers: int,
+    traced: bool,
+    args: argparse.Namespace,
+    pool: Any,
+) -> Dict[str, Any]:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/"
+
+    with FakeAgent(keep_traces=False) as agent, tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update(
+            {ENV_APPLICATION: application, ENV_WRITER: args.writer, ENV_STATS_DIR: tmp}
+        )
+        if traced:
+            env[ENV_AGENT_PORT] = str(agent.port)
+
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "benchmarks.loadtest:app",
+                "--host=127.0.0.1",
+                f"--port={port}",
+                f"--workers={workers}",
+                "--lifespan=on",
+                "--loop=asyncio",
+                "--log-level=warning",
+                "--no-access-log",
+            ],
+            env=env,
+        )
+        try:
+            wait_until_ready(url, server)
+            connections = max(1, args.connections // args.clients)
+            results = pool.map(
+                run_client,
+                [(url, connections, args.warmup, args.duration)] * args.clients,
+            )
+        finally:
+            # NOTE: uvicorn forwards the interrupt to workers, which then shut down
+            # gracefully. Workers that get a second signal would exit right away.
+            if server.poll() is None:
+                server.send_signal(signal.SIGINT)
+                server.wait(timeout=30)
+
+        stats = [json.loads(path.read_text()) for path in Path(tmp).glob("*.json")]
+        requests = sum(worker["requests"] for worker in stats)
+        dropped = sum(worker["dropped_traces"] for worker in stats)
+        if traced:
+            agent.wait_for_traces(requests - dropped)
+
+        latencies = [latency for result in results for latency in result[0]]
+        scenario: Dict[str, Any] = {
+            "throughput_rps": len(latencies) / args.duration,
+            "errors": sum(result[1] for result in results),
+            "requests": requests,
+            "worker_requests": sorted(worker["requests"] for worker in stats),
+            "traces": agent.trace_count,
+            "dropped_traces": dropped,
+            "payloads": len(agent.payloads),
+            "payload_bytes": agent.payload_size,
+            "payload_bytes_per_trace": (
+                agent.payload_size / agent.trace_count if agent.trace_count else 0
+            ),
+        }
+        scenario.update(summarize(latencies))
+        return scenario
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-a", "--application", choices=APPLICATIONS, action="append", dest="apps"
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds.")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds.")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=2, help="Client processes.")
+    parser.add_argument("--writer", choices=WRITERS, default="agent")
+    parser.add_argument("--output", type=Path, default=default_output("loadtest"))
+    parser.add_argument("--compare", type=Path, help="Results of a previous run.")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    scenarios: Dict[str, Dict[str, Any]] = {}
+    print(
+        f"{'scenario':<20} {'req/s':>10} {'p50 us':>10} {'p99 us':>10} "
+        f"{'errors':>7} {'traces':>8} {'dropped':>8} {'bytes/trace':>12}"
+    )
+
+    # NOTE: clients run in their own processes, so that they do not compete with
+    # the harness for a single core.
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.clients) as pool:
+        for application in args.apps or APPLICATIONS:
+            for workers in args.workers:
+                for traced in (False, True):
+                    name = f"{application}/{workers}w/{'on' if traced else 'off'}"
+                    results = measure(application, workers, traced, args, pool)
+                    scenarios[name] = results
+                    print(
+                        f"{name:<20} {results['throughput_rps']:>10.0f} "
+                        f"{results['p50_us']:>10.0f} {results['p99_us']:>10.0f} "
+                        f"{results['errors']:>7} {results['traces']:>8} "
+                        f"{results['dropped_traces']:>8} "
+                        f"{results['payload_bytes_per_trace']:>12.0f}"
+                    )
+
+    save(
+        args.output,
+        {
+            "environment": environment(),
+            "cpu_count": os.cpu_count(),
+            "writer": args.writer,
+            "duration": args.duration,
+            "connections": args.connections,
+            "scenarios": scenarios,
+        },
+    )
+    print(f"Results written to {args.output}")
+
+    if args.compare is not None:
+        regressions = compare(
+            load(args.compare)["scenarios"],
+            {
+                name: {metric: results[metric] for metric in COMPARED}
+                for name, results in scenarios.items()
+            },
+            higher_is_better=("throughput_rps",),
+            max_regression=args.max_regression,
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
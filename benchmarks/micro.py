@@ -0,0 +1,130 @@
+"""
+Micro-benchmarks of the request path: operations that `TraceMiddleware` does in
+bulk or from caches, against the ddtrace calls they replace.
+
+* `static_tags_<N>`: applying N static tags to a span, with `StaticTags.apply()`
+  rather than `Span.set_tags()`.
+* `error_capture`: recording a repeated exception (with a cause) on a span, with a
+  warm `ErrorCapture` cache rather than `Span.set_exc_info()`.
+
+Usage:
+
+    python -m benchmarks.micro [--number N] [--compare PATH]
+
+Results are written to `.benchmarks/micro/<version>.json` (not tracked) by default.
+Results of releases are recorded with
+`--output benchmarks/results/micro/<version>.json`, so that later runs can be
+compared against them.
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ddtrace.constants import ANALYTICS_SAMPLE_RATE_KEY
+from ddtrace.context import Context
+from ddtrace.span import Span
+
+from ddtrace_asgi._errors import ErrorCapture
+from ddtrace_asgi._tags import StaticTags
+
+from .utils import compare, default_output, environment, load, save
+
+# The ddtrace call, and the equivalent operation of `ddtrace_asgi`.
+Pair = Tuple[Callable[[], None], Callable[[], None]]
+
+
+def static_tags(count: int) -> Pair:
+    tags: Dict[str, Any] = {f"tag{index}": f"value{index}" for index in range(count)}
+    tags[ANALYTICS_SAMPLE_RATE_KEY] = 1.0
+    static = StaticTags(tags)
+
+    def set_tags() -> None:
+        Span(tracer=None, name="test").set_tags(tags)
+
+    def apply() -> None:
+        static.apply(Span(tracer=None, name="test"))
+
+    return set_tags, apply
+
+
+def fail() -> None:
+    try:
+        raise RuntimeError("Oops")
+    except RuntimeError as exc:
+        raise ValueError("Oops") from exc
+
+
+def error_capture() -> Pair:
+    try:
+        fail()
+    except ValueError as error:
+        exc = error
+    capture = ErrorCapture()
+
+    def set_exc_info() -> None:
+        span = Span(tracer=None, name="test", context=Context())
+        span.set_exc_info(type(exc), exc, exc.__traceback__)
+
+    def cached() -> None:
+        capture.capture(Span(tracer=None, name="test", context=Context()), exc, 0)
+
+    return set_exc_info, cached
+
+
+BENCHMARKS: Dict[str, Callable[[], Pair]] = {
+    "static_tags_10": lambda: static_tags(10),
+    "static_tags_20": lambda: static_tags(20),
+    "error_capture": error_capture,
+}
+
+
+def measure(func: Callable[[], None], number: int) -> float:
+    """
+    Return the duration of a call to `func`, in microseconds (best of 5 rounds).
+    """
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=1000)
+    parser.add_argument("--output", type=Path, default=default_output("micro"))
+    parser.add_argument("--compare", type=Path, help="Results of a previous run.")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    scenarios: Dict[str, Dict[str, float]] = {}
+    print(f"{'benchmark':<20} {'ddtrace us':>12} {'ddtrace_asgi us':>16}")
+    for name, setup in BENCHMARKS.items():
+        baseline, optimized = setup()
+        scenarios[name] = {
+            "ddtrace_us": measure(baseline, args.number),
+            "ddtrace_asgi_us": measure(optimized, args.number),
+        }
+        print(
+            f"{name:<20} {scenarios[name]['ddtrace_us']:>12.2f} "
+            f"{scenarios[name]['ddtrace_asgi_us']:>16.2f}"
+        )
+
+    save(args.output, {"environment": environment(), "scenarios": scenarios})
+    print(f"Results written to {args.output}")
+
+    if args.compare is not None:
+        regressions = compare(
+            load(args.compare)["scenarios"],
+            scenarios,
+            max_regression=args.max_regression,
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+Per-request overhead of `TraceMiddleware`.
+
+Drives the test applications in-process (no HTTP server, no network) with and
+without the middleware, and reports latency percentiles, memory allocated per
+request and throughput for each scenario. With the middleware, the overhead the
+middleware measures itself (see `measure_overhead`) is reported too, as a check
+that the numbers charted in production agree with the benchmark.
+
+Usage:
+
+    python -m benchmarks.overhead [--requests N] [--compare PATH]
+
+Results are written to `.benchmarks/overhead/<version>.json` (not tracked) by
+default. Results of releases are recorded with
+`--output benchmarks/results/overhead/<version>.json`, so that later runs can be
+compared against them.
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from starlette.types import ASGIApp, Message
+
+import ddtrace_asgi
+from tests.utils.config import override_http_config
+from tests.utils.fixtures import create_app
+from tests.utils.tracer import DummyTracer, DummyWriter
+
+from .utils import compare, default_output, environment, load, save, summarize
+
+APPLICATIONS = ("raw", "starlette", "fastapi")
+RESPONSES = {"single": "/", "stream": "/stream/"}
+
+# A realistic set of request headers, as sent by browsers and proxies.
+REQUEST_HEADERS = [
+    (b"host", b"testserver"),
+    (b"user-agent", b"Mozilla/5.0 (X11; Linux x86_64; rv:70.0) Gecko/20100101"),
+    (b"accept", b"text/html,application/xhtml+xml,application/xml;q=0.9"),
+    (b"accept-language", b"en-US,en;q=0.5"),
+    (b"accept-encoding", b"gzip, deflate, br"),
+    (b"connection", b"keep-alive"),
+    (b"cache-control", b"no-cache"),
+    (b"pragma", b"no-cache"),
+    (b"x-request-id", b"f058ebd6-02f7-4d3f-942e-904344e8cde5"),
+    (b"x-forwarded-for", b"203.0.113.195, 70.41.3.18"),
+    (b"x-forwarded-proto", b"https"),
+    (b"x-real-ip", b"203.0.113.195"),
+] + [(b"x-custom-%d" % i, b"value-%d" % i) for i in range(18)]
+
+TRACE_HEADERS = [
+    (b"x-datadog-trace-id", b"1234"),
+    (b"x-datadog-parent-id", b"5678"),
+    (b"x-datadog-sampling-priority", b"1"),
+]
+
+CAPTURED_HEADERS = ["x-request-id", "user-agent", "content-type"]
+
+
+class BenchmarkWriter(DummyWriter):
+    """
+    A `DummyWriter` that skips encoding.
+
+    In production, encoding happens in the agent writer's background thread, so it
+    is not part of the per-request cost we want to measure here.
+    """
+
+    def write(
+        self, spans: Optional[List[Any]] = None, services: Optional[List[Any]] = None
+    ) -> None:
+        if spans:
+            self.spans += spans
+            self.traces.append(spans)
+
+
+class BenchmarkTracer(DummyTracer):
+    def _update_writer(self) -> None:
+        self.writer = BenchmarkWriter(
+            hostname=self.writer.api.hostname,
+            port=self.writer.api.port,
+            filters=self.writer._filters,
+            priority_sampler=self.writer._priority_sampler,
+        )
+
+
+class Scenario(NamedTuple):
+    application: str
+    response: str
+    middleware: bool
+    distributed_tracing: bool
+    header_capture: bool
+
+    @property
+    def key(self) -> str:
+        if not self.middleware:
+            return f"{self.application}/{self.response}/off"
+        options = [
+            "dt" if self.distributed_tracing else "no-dt",
+            "headers" if self.header_capture else "no-headers",
+        ]
+        return f"{self.application}/{self.response}/on/{'/'.join(options)}"
+
+
+def get_scenarios() -> Iterator[Scenario]:
+    for application, response in itertools.product(APPLICATIONS, RESPONSES):
+        yield Scenario(application, response, False, False, False)
+        for distributed_tracing, header_capture in itertools.product(
+            (False, True), (False, True)
+        ):
+            yield Scenario(
+                application, response, True, distributed_tracing, header_capture
+            )
+
+
+def build(
+    scenario: Scenario, measure_overhead: bool = False
+) -> Tuple[ASGIApp, Optional[DummyTracer]]:
+    if not scenario.middleware:
+        return create_app(scenario.application), None
+
+    tracer = BenchmarkTracer()
+    options = {
+        "tracer": tracer,
+        "service": "benchmark",
+        "distributed_tracing": scenario.distributed_tracing,
+        "measure_overhead": measure_overhead,
+    }
+    app = create_app(
+        scenario.application, middleware=[(ddtrace_asgi.TraceMiddleware, options)]
+    )
+    return app, tracer
+
+
+def make_scope(scenario: Scenario) -> Dict[str, Any]:
+    headers = list(REQUEST_HEADERS)
+    if scenario.distributed_tracing:
+        headers += TRACE_HEADERS
+    return {
+        "type": "http",
+        "http_version": "1.1",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 12345),
+        "root_path": "",
+        "method": "GET",
+        "path": RESPONSES[scenario.response],
+        "query_string": b"page=2&sort=desc",
+        "headers": headers,
+    }
+
+
+async def receive() -> Message:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message: Message) -> None:
+    pass
+
+
+async def request(app: ASGIApp, scope: Dict[str, Any]) -> None:
+    # NOTE: applications and middleware may mutate the scope.
+    await app(dict(scope), receive, send)
+
+
+def flush(tracer: Optional[DummyTracer]) -> None:
+    if tracer is not None:
+        tracer.writer.pop()
+        tracer.writer.pop_traces()
+
+
+async def measure(
+    scenario: Scenario, requests: int, concurrency: int
+) -> Dict[str, float]:
+    app, tracer = build(scenario)
+    scope = make_scope(scenario)
+
+    # Warm up caches, imports and lazily-built structures.
+    for _ in range(min(requests, 200)):
+        await request(app, scope)
+    flush(tracer)
+
+    # Latency: sequential requests.
+    durations: List[float] = []
+    gc.collect()
+    for _ in range(requests):
+        start = time.perf_counter()
+        await request(app, scope)
+        durations.append(time.perf_counter() - start)
+        flush(tracer)
+
+    # Memory: peak traced memory allocated while processing a request.
+    # NOTE: `clear_traces()` also resets the peak.
+    peaks: List[int] = []
+    tracemalloc.start()
+    try:
+        for _ in range(min(requests, 500)):
+            tracemalloc.clear_traces()
+            await request(app, scope)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak)
+            flush(tracer)
+    finally:
+        tracemalloc.stop()
+
+    # Throughput: concurrent requests on a single event loop.
+    start = time.perf_counter()
+    for _ in range(requests // concurrency):
+        await asyncio.gather(*(request(app, scope) for _ in range(concurrency)))
+        flush(tracer)
+    elapsed = time.perf_counter() - start
+
+    results = summarize(durations)
+    results["alloc_peak_bytes"] = sorted(peaks)[len(peaks) // 2]
+    results["throughput_rps"] = (requests // concurrency) * concurrency / elapsed
+    if scenario.middleware:
+        results["self_measured_us"] = await measure_self(scenario, requests)
+    return results
+
+
+async def measure_self(scenario: Scenario, requests: int) -> float:
+    """
+    Return the mean overhead per request, as measured by the middleware itself.
+    """
+    app, tracer = build(scenario, measure_overhead=True)
+    scope = make_scope(scenario)
+    for _ in range(min(requests, 200)):
+        await request(app, scope)
+    flush(tracer)
+
+    before = ddtrace_asgi.get_overhead_stats()
+    for _ in range(requests):
+        await request(app, scope)
+        flush(tracer)
+    after = ddtrace_asgi.get_overhead_stats()
+
+    total_ns = sum(after[key] - before[key] for key in ("pre_app_ns", "post_app_ns"))
+    return total_ns / (after["requests"] - before["requests"]) / 1e3
+
+
+def report(scenarios: Dict[str, Dict[str, float]]) -> None:
+    header = (
+        f"{'scenario':<42} {'p50 us':>9} {'p99 us':>9} {'overhead us':>12} "
+        f"{'self us':>9} {'alloc B':>9} {'req/s':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for key, results in scenarios.items():
+        baseline = scenarios.get("/".join(key.split("/")[:2] + ["off"]), results)
+        overhead = results["p50_us"] - baseline["p50_us"]
+        self_measured = results.get("self_measured_us", 0.0)
+        print(
+            f"{key:<42} {results['p50_us']:>9.1f} {results['p99_us']:>9.1f} "
+            f"{overhead:>12.1f} {self_measured:>9.1f} "
+            f"{results['alloc_peak_bytes']:>9.0f} {results['throughput_rps']:>9.0f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("-k", dest="match", default="", help="Filter scenarios.")
+    parser.add_argument("--output", type=Path, default=default_output("overhead"))
+    parser.add_argument("--compare", type=Path, help="Results of a previous run.")
+    parser.add_argument("--max-regression", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    loop = asyncio.get_event_loop()
+    scenarios: Dict[str, Dict[str, float]] = {}
+
+    for scenario in get_scenarios():
+        if args.match not in scenario.key:
+            continue
+        with override_http_config(
+            "asgi", CAPTURED_HEADERS if scenario.header_capture else []
+        ):
+            scenarios[scenario.key] = loop.run_until_complete(
+                measure(scenario, args.requests, args.concurrency)
+            )
+
+    report(scenarios)
+
+    results = {
+        "environment": environment(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "scenarios": scenarios,
+    }
+    save(args.output, results)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare is not None:
+        regressions = compare(
+            load(args.compare)["scenarios"],
+            scenarios,
+            higher_is_better=["throughput_rps"],
+            max_regression=args.max_regression,
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
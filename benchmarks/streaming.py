@@ -0,0 +1,113 @@
+"""
+Per-chunk overhead of `TraceMiddleware` on streaming responses.
+
+Streams a large number of small `http.response.body` messages (as SSE endpoints or
+chunked downloads do) through a raw ASGI app, with and without the middleware.
+
+Usage:
+
+    python -m benchmarks.streaming [--chunks N] [--compare PATH]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import ddtrace_asgi
+
+from .overhead import BenchmarkTracer, receive, send
+from .utils import compare, default_output, environment, load, save, summarize
+
+
+def create_app(chunks: int) -> ASGIApp:
+    chunk = b"data: " + b"x" * 64 + b"\n\n"
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream")],
+            }
+        )
+        for _ in range(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    return app
+
+
+async def measure(app: ASGIApp, chunks: int, rounds: int) -> Dict[str, float]:
+    scope: Message = {
+        "type": "http",
+        "method": "GET",
+        "path": "/events",
+        "query_string": b"",
+        "headers": [(b"host", b"testserver"), (b"accept", b"text/event-stream")],
+    }
+
+    await app(dict(scope), receive, send)  # Warm up.
+
+    durations: List[float] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await app(dict(scope), receive, send)
+        durations.append((time.perf_counter() - start) / chunks)
+
+    return summarize(durations)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--output", type=Path, default=default_output("streaming"))
+    parser.add_argument("--compare", type=Path, help="Results of a previous run.")
+    parser.add_argument("--max-regression", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    loop = asyncio.get_event_loop()
+    tracer = BenchmarkTracer()
+    apps: Dict[str, ASGIApp] = {
+        "off": create_app(args.chunks),
+        "on": ddtrace_asgi.TraceMiddleware(create_app(args.chunks), tracer=tracer),
+    }
+
+    scenarios = {
+        name: loop.run_until_complete(measure(app, args.chunks, args.rounds))
+        for name, app in apps.items()
+    }
+
+    print(f"{'scenario':<10} {'p50 us/chunk':>14} {'p99 us/chunk':>14}")
+    for name, results in scenarios.items():
+        print(f"{name:<10} {results['p50_us']:>14.3f} {results['p99_us']:>14.3f}")
+    overhead = scenarios["on"]["p50_us"] - scenarios["off"]["p50_us"]
+    print(f"\nOverhead: {overhead:.3f} us/chunk")
+
+    save(
+        args.output,
+        {"environment": environment(), "chunks": args.chunks, "scenarios": scenarios},
+    )
+    print(f"Results written to {args.output}")
+
+    if args.compare is not None:
+        regressions = compare(
+            load(args.compare)["scenarios"],
+            scenarios,
+            max_regression=args.max_regression,
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import json
+import math
+import platform
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import ddtrace
+
+import ddtrace_asgi
+
+# NOTE: results of releases are committed to `benchmarks/results/`, so that later
+# runs can be compared against them. Local runs are written elsewhere by default, as
+# the development tree has the version of the last release.
+LOCAL_RESULTS_DIR = Path(__file__).parent.parent / ".benchmarks"
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return math.nan
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(durations: Sequence[float]) -> Dict[str, float]:
+    # NOTE: durations are in seconds, summaries are in microseconds.
+    return {
+        "mean_us": sum(durations) / len(durations) * 1e6,
+        "p50_us": percentile(durations, 50) * 1e6,
+        "p90_us": percentile(durations, 90) * 1e6,
+        "p99_us": percentile(durations, 99) * 1e6,
+    }
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "ddtrace_asgi": ddtrace_asgi.__version__,
+        "ddtrace": ddtrace.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+    }
+
+
+def default_output(name: str) -> Path:
+    return LOCAL_RESULTS_DIR / name / f"{ddtrace_asgi.__version__}.json"
+
+
+def save(path: Path, results: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+def load(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text())
+
+
+def compare(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    *,
+    higher_is_better: Sequence[str] = (),
+    max_regression: float,
+) -> List[str]:
+    """
+    Return a list of human-readable regressions of `current` against `baseline`.
+    """
+    regressions = []
+
+    for scenario, metrics in sorted(current.items()):
+        reference = baseline.get(scenario)
+        if reference is None:
+            continue
+
+        for metric, value in sorted(metrics.items()):
+            previous = reference.get(metric)
+            if not previous or not isinstance(value, (int, float)):
+                continue
+
+            change = (value - previous) / previous
+            if metric in higher_is_better:
+                change = -change
+
+            if change > max_regression:
+                regressions.append(
+                    f"{scenario}: {metric} {previous:.1f} -> {value:.1f} "
+                    f"({change:+.1%})"
+                )
+
+    return regressions
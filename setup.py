@@ -30,7 +30,11 @@ setup(
     package_dir={"": "src"},
     include_package_data=True,
     zip_safe=False,
-    install_requires=["ddtrace", "starlette==0.*", "deprecation==2.*"],
+    install_requires=[
+        "ddtrace",
+        "deprecation==2.*",
+        "contextvars==2.*; python_version<'3.7'",
+    ],
     python_requires=">=3.6",
     license="BSD",
     classifiers=[
@@ -1,4 +1,13 @@
 from .__version__ import __version__
+from ._breakdown import TimingMiddleware
 from ._middleware import TraceMiddleware
+from ._overhead import get_overhead_stats
+from ._writer import BatchedWriter
 
-__all__ = ["__version__", "TraceMiddleware"]
+__all__ = [
+    "__version__",
+    "BatchedWriter",
+    "TimingMiddleware",
+    "TraceMiddleware",
+    "get_overhead_stats",
+]
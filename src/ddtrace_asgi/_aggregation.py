@@ -0,0 +1,168 @@
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ._compat import perf_counter_ns
+from ._histogram import Histogram
+
+logger = logging.getLogger("ddtrace_asgi")
+
+Key = Tuple[str, str]
+Sink = Callable[[List[Dict[str, Any]]], None]
+
+QUANTILES = (("p50_ns", 0.5), ("p90_ns", 0.9), ("p99_ns", 0.99))
+# Resource of requests recorded once `max_keys` keys are tracked.
+OTHER_RESOURCE = "other"
+
+
+def get_status_class(status_code: Optional[int], error: bool) -> str:
+    if status_code is None:
+        # NOTE: ASGI servers respond with a 500 to apps that raise before responding.
+        return "5xx" if error else "unknown"
+    return "%dxx" % (status_code // 100)
+
+
+class _Buffer:
+    __slots__ = ("histograms",)
+
+    def __init__(self) -> None:
+        self.histograms: Dict[Key, Histogram] = {}
+
+
+class LatencyAggregator:
+    """
+    Aggregate request latencies per resource and status class, in process.
+
+    Each thread records into its own buffer of fixed-memory histograms, so that
+    recording takes no lock. Buffers are swapped out and merged when flushing, which
+    happens on the first request recorded after `flush_interval` seconds, and the
+    merged summaries are passed to `sink`.
+
+    Each buffer tracks at most `max_keys` keys between flushes: further resources
+    (e.g. raw paths of applications that have no route templates) are recorded as
+    `other`, so that memory stays bounded.
+
+    `sink` is called on the request path: it should hand data off (e.g. to a queue or
+    a DogStatsD client) rather than do blocking I/O. Errors it raises are logged.
+    """
+
+    def __init__(
+        self,
+        sink: Sink,
+        flush_interval: float = 10.0,
+        relative_accuracy: float = 0.01,
+        max_buckets: int = 2048,
+        max_keys: int = 1000,
+    ) -> None:
+        self._sink = sink
+        self._max_keys = max_keys
+        self._flush_interval_ns = int(flush_interval * 1e9)
+        self._relative_accuracy = relative_accuracy
+        self._max_buckets = max_buckets
+        self._local = threading.local()
+        self._buffers: List[_Buffer] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._deadline_ns = perf_counter_ns() + self._flush_interval_ns
+        _aggregators.add(self)
+
+    def _get_buffer(self) -> _Buffer:
+        try:
+            return self._local.buffer
+        except AttributeError:
+            buffer = self._local.buffer = _Buffer()
+            with self._lock:
+                self._buffers.append(buffer)
+            return buffer
+
+    def record(
+        self,
+        resource: str,
+        status_code: Optional[int],
+        error: bool,
+        now_ns: int,
+        duration_ns: int,
+    ) -> None:
+        key = (resource, get_status_class(status_code, error))
+        histograms = self._get_buffer().histograms
+        histogram = histograms.get(key)
+        if histogram is None and len(histograms) >= self._max_keys:
+            key = (OTHER_RESOURCE, key[1])
+            histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(
+                self._relative_accuracy, self._max_buckets
+            )
+        histogram.add(duration_ns)
+
+        if now_ns >= self._deadline_ns:
+            self.flush(now_ns)
+
+    def flush(self, now_ns: int) -> None:
+        if not self._flush_lock.acquire(blocking=False):
+            return  # Another thread is flushing.
+
+        try:
+            self._deadline_ns = now_ns + self._flush_interval_ns
+            with self._lock:
+                buffers = list(self._buffers)
+
+            merged: Dict[Key, Histogram] = {}
+            for buffer in buffers:
+                # NOTE: swapping the dict is atomic, so writers need no lock. A sample
+                # recorded by another thread during the swap may be lost.
+                histograms, buffer.histograms = buffer.histograms, {}
+                for key, histogram in histograms.items():
+                    existing = merged.get(key)
+                    if existing is None:
+                        merged[key] = histogram
+                    else:
+                        existing.merge(histogram)
+        finally:
+            self._flush_lock.release()
+
+        if merged:
+            # NOTE: the sink runs on the request path, and must not fail the request.
+            try:
+                self._sink(
+                    [summarize(key, histogram) for key, histogram in merged.items()]
+                )
+            except Exception:
+                logger.exception("Failed to pass latency summaries to the sink")
+
+    def _reset(self) -> None:
+        # Data recorded by the parent process belongs to the parent process.
+        self._local = threading.local()
+        self._buffers = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._deadline_ns = perf_counter_ns() + self._flush_interval_ns
+
+
+def summarize(key: Key, histogram: Histogram) -> Dict[str, Any]:
+    resource, status_class = key
+    summary: Dict[str, Any] = {
+        "resource": resource,
+        "status_class": status_class,
+        "count": histogram.count,
+        "sum_ns": histogram.sum,
+        "max_ns": histogram.max,
+    }
+    for name, q in QUANTILES:
+        summary[name] = histogram.quantile(q)
+    return summary
+
+
+_aggregators: "weakref.WeakSet[LatencyAggregator]" = weakref.WeakSet()
+
+
+def _reset_at_fork() -> None:
+    for aggregator in _aggregators:
+        aggregator._reset()
+
+
+if hasattr(os, "register_at_fork"):  # pragma: no branch
+    # NOTE: Python 3.7+.
+    os.register_at_fork(after_in_child=_reset_at_fork)
@@ -0,0 +1,136 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from ddtrace import Tracer
+from ddtrace.span import Span
+
+from ._compat import perf_counter_ns
+from ._types import ASGIApp, Receive, Scope, Send
+
+SCOPE_KEY = "ddtrace_asgi.breakdown"
+
+
+class _Layer:
+    __slots__ = ("name", "depth", "enter_ns", "exit_ns")
+
+    def __init__(self, name: str, depth: int, enter_ns: int) -> None:
+        self.name = name
+        self.depth = depth
+        self.enter_ns = enter_ns
+        self.exit_ns: Optional[int] = None
+
+
+class Breakdown:
+    """
+    Collect when each `TimingMiddleware` layer of a request was entered and exited.
+
+    Only timestamps are collected while the request is handled. They are turned into
+    metrics on the request span by `record()`, and into child spans by `trace()`, once
+    the request is over.
+    """
+
+    __slots__ = ("_origin_ns", "app_start_ns", "_layers", "_depth")
+
+    def __init__(self, origin_ns: int) -> None:
+        # NOTE: the request span started at `origin_ns`, which anchors timestamps to
+        # the wall clock.
+        self._origin_ns = origin_ns
+        self.app_start_ns = origin_ns
+        self._layers: List[_Layer] = []
+        self._depth = 0
+
+    def enter(self, name: str) -> _Layer:
+        layer = _Layer(name, self._depth, perf_counter_ns())
+        self._depth += 1
+        self._layers.append(layer)
+        return layer
+
+    def exit(self, layer: _Layer) -> None:
+        layer.exit_ns = perf_counter_ns()
+        self._depth -= 1
+
+    def _get_layers(self) -> List[_Layer]:
+        # NOTE: layers may be left running, e.g. by a background task.
+        return [layer for layer in self._layers if layer.exit_ns is not None]
+
+    def record(self, span: Span) -> None:
+        layers = self._get_layers()
+        if not layers:
+            return
+
+        span.set_metric(
+            "asgi.time_to_route_ns", layers[-1].enter_ns - self.app_start_ns
+        )
+
+        durations: Dict[str, int] = {}
+        self_durations: Dict[str, int] = {}
+        for index, layer in enumerate(layers):
+            assert layer.exit_ns is not None
+            duration = layer.exit_ns - layer.enter_ns
+            self_duration = duration
+            for inner in layers[index + 1 :]:
+                if inner.depth <= layer.depth:
+                    break
+                if inner.depth == layer.depth + 1:
+                    assert inner.exit_ns is not None
+                    self_duration -= inner.exit_ns - inner.enter_ns
+            durations[layer.name] = durations.get(layer.name, 0) + duration
+            self_durations[layer.name] = (
+                self_durations.get(layer.name, 0) + self_duration
+            )
+
+        for name, duration in durations.items():
+            span.set_metric("asgi.layer.%s.duration_ns" % name, duration)
+            span.set_metric("asgi.layer.%s.self_ns" % name, self_durations[name])
+
+    def trace(self, tracer: Tracer, span: Span) -> None:
+        """
+        Create an `asgi.layer` span per layer, under the (unfinished) request span.
+        """
+        parents = [span]
+        children: List[Tuple[Span, float]] = []
+        for layer in self._get_layers():
+            assert layer.exit_ns is not None
+            del parents[layer.depth + 1 :]
+            child = tracer.start_span(
+                "asgi.layer", child_of=parents[-1], resource=layer.name
+            )
+            # NOTE: timestamps are set through the public API of spans, in seconds.
+            child.start = span.start + (layer.enter_ns - self._origin_ns) / 1e9
+            parents.append(child)
+            children.append(
+                (child, child.start + (layer.exit_ns - layer.enter_ns) / 1e9)
+            )
+
+        # NOTE: finish inner layers first, so that the current span of the context
+        # ends up being the request span again.
+        for child, finish_time in reversed(children):
+            child.finish(finish_time)
+
+
+class TimingMiddleware:
+    """
+    Time the wrapped application as a layer of the request, for `TraceMiddleware`
+    with `timing_breakdown=True`. Does nothing otherwise.
+    """
+
+    def __init__(self, app: ASGIApp, name: str) -> None:
+        self.app = app
+        self.name = name
+
+    @property
+    def routes(self) -> Any:
+        # NOTE: Starlette `Mount`s look up the routes of the mounted application,
+        # e.g. to build resource names and URLs.
+        return getattr(self.app, "routes", None)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        breakdown: Optional[Breakdown] = scope.get(SCOPE_KEY)
+        if breakdown is None:
+            await self.app(scope, receive, send)
+            return
+
+        layer = breakdown.enter(self.name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            breakdown.exit(layer)
@@ -0,0 +1,11 @@
+try:
+    from time import perf_counter_ns
+except ImportError:  # pragma: no cover
+    # Python 3.6.
+    from time import perf_counter
+
+    def perf_counter_ns() -> int:
+        return int(perf_counter() * 1e9)
+
+
+__all__ = ["perf_counter_ns"]
@@ -0,0 +1,60 @@
+from typing import AbstractSet, Dict, FrozenSet, Optional, Tuple
+
+from ddtrace.constants import ANALYTICS_SAMPLE_RATE_KEY
+from ddtrace.settings import IntegrationConfig
+
+from ._headers import HeaderCapture
+from ._tags import StaticTags
+
+Settings = Tuple[Optional[float], bool, FrozenSet[str]]
+
+
+def get_whitelist(integration_config: IntegrationConfig) -> AbstractSet[str]:
+    # Mirrors `IntegrationConfig.header_is_traced()`: the integration whitelist takes
+    # precedence over the global one.
+    http_config = integration_config.http
+    if not http_config.is_header_tracing_configured:
+        http_config = integration_config.global_config._http
+    return http_config._whitelist_headers
+
+
+def read_settings(integration_config: IntegrationConfig) -> Settings:
+    return (
+        integration_config.get_analytics_sample_rate(use_global_config=True),
+        bool(integration_config.get("trace_query_string")),
+        frozenset(get_whitelist(integration_config)),
+    )
+
+
+class ConfigSnapshot:
+    """
+    The settings of a middleware, read once from `ddtrace.config.asgi`.
+
+    Request handling only uses plain attribute access on a snapshot, instead of
+    lookups through ddtrace settings objects. Snapshots are immutable: a new one is
+    built whenever settings must be read again.
+    """
+
+    __slots__ = (
+        "settings",
+        "trace_query_string",
+        "headers",
+        "service",
+        "tags",
+    )
+
+    def __init__(
+        self, integration_config: IntegrationConfig, service: str, tags: Dict[str, str]
+    ) -> None:
+        self.settings = read_settings(integration_config)
+        analytics_sample_rate, trace_query_string, whitelist = self.settings
+        self.trace_query_string = trace_query_string
+        self.headers = HeaderCapture(whitelist)
+        self.service = service
+        # NOTE: user tags take precedence over the analytics sample rate.
+        self.tags = StaticTags(
+            {ANALYTICS_SAMPLE_RATE_KEY: analytics_sample_rate, **tags}
+        )
+
+    def is_stale(self, integration_config: IntegrationConfig) -> bool:
+        return read_settings(integration_config) != self.settings
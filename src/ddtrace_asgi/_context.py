@@ -0,0 +1,41 @@
+from contextvars import ContextVar
+from typing import Optional
+
+from ddtrace import Tracer
+from ddtrace.context import Context
+
+_request_context: "ContextVar[Optional[Context]]" = ContextVar(
+    "ddtrace_asgi.request_context", default=None
+)
+
+
+def get_request_context() -> Optional[Context]:
+    """
+    Return the tracing context of the enclosing request, if any.
+    """
+    return _request_context.get()
+
+
+class ActiveRequest:
+    """
+    Make the tracing context of a request current, until `close()` is called.
+
+    The context is set in a context variable owned by this package, so that nested
+    middleware parent their spans to the enclosing request, and activated in the
+    ddtrace context provider, so that spans created by handlers are children of the
+    request span. Both are restored on `close()`, so that no context leaks into
+    requests subsequently handled by the same task.
+    """
+
+    __slots__ = ("_provider", "_previous", "_token")
+
+    def __init__(self, tracer: Tracer, context: Context) -> None:
+        provider = tracer.context_provider
+        self._provider = provider
+        self._previous = provider.active() if provider._has_active_context() else None
+        self._token = _request_context.set(context)
+        provider.activate(context)
+
+    def close(self) -> None:
+        _request_context.reset(self._token)
+        self._provider.activate(self._previous)
@@ -1,11 +1,19 @@
-from typing import Dict
+import shlex
+from typing import Dict, List
 
 import deprecation
-from starlette.datastructures import CommaSeparatedStrings
 
 from .._utils import parse_tags_from_list
 
 
+def _split_comma_separated(value: str) -> List[str]:
+    # Same parsing as `starlette.datastructures.CommaSeparatedStrings`.
+    splitter = shlex.shlex(value, posix=True)
+    splitter.whitespace = ","
+    splitter.whitespace_split = True
+    return [item.strip() for item in splitter]
+
+
 @deprecation.deprecated(
     deprecated_in="0.4.0",
     removed_in="0.5.0",
@@ -15,4 +23,4 @@ from .._utils import parse_tags_from_list
     ),
 )
 def parse_tags_from_string(value: str) -> Dict[str, str]:
-    return parse_tags_from_list(CommaSeparatedStrings(value))
+    return parse_tags_from_list(_split_comma_separated(value))
@@ -0,0 +1,167 @@
+import hashlib
+import traceback
+from typing import Any, List, Optional, Tuple
+
+from ddtrace.ext import errors
+from ddtrace.span import Span
+
+from ._sampling import TokenBucket
+from ._utils import LRUCache
+
+# NOTE: same as `Span.set_exc_info()`.
+STACK_LIMIT = 20
+# NOTE: same as `traceback.format_exception()`.
+CAUSE_MESSAGE = (
+    "\nThe above exception was the direct cause of the following exception:\n\n"
+)
+CONTEXT_MESSAGE = (
+    "\nDuring handling of the above exception, another exception occurred:\n\n"
+)
+
+Fingerprint = Tuple[Any, ...]
+Chain = List[Tuple[BaseException, str]]
+
+
+def _get_chain(exc: BaseException) -> Chain:
+    """
+    Return `exc` and the exceptions it was raised from, outermost first, along with
+    the message that separates each of them from the exception it was raised from in
+    formatted stacks (or `''`).
+    """
+    chain: Chain = []
+    seen = set()
+    current: Optional[BaseException] = exc
+
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        inner: Optional[BaseException] = None
+        message = ""
+        if current.__cause__ is not None:
+            inner, message = current.__cause__, CAUSE_MESSAGE
+        elif not current.__suppress_context__:
+            inner, message = current.__context__, CONTEXT_MESSAGE
+        if inner is None or id(inner) in seen:
+            message = ""
+        chain.append((current, message))
+        current = inner
+
+    return chain
+
+
+def _get_key(chain: Chain) -> Fingerprint:
+    key: List[Any] = []
+    for exc, _ in chain:
+        key.append(type(exc))
+        tb = exc.__traceback__
+        while tb is not None:
+            key.append((tb.tb_frame.f_code.co_filename, tb.tb_lineno))
+            tb = tb.tb_next
+    return tuple(key)
+
+
+def get_fingerprint(exc: BaseException) -> Fingerprint:
+    """
+    Identify an exception by its type and the code locations of its traceback,
+    including the exceptions it was raised from.
+    """
+    return _get_key(_get_chain(exc))
+
+
+def _to_hex(fingerprint: Fingerprint) -> str:
+    # NOTE: built-in hashes of strings are randomized per process, and fingerprints
+    # should be the same across processes and restarts.
+    parts = [
+        (
+            "%s.%s" % (part.__module__, part.__qualname__)
+            if isinstance(part, type)
+            else "%s:%d" % part
+        )
+        for part in fingerprint
+    ]
+    return hashlib.blake2b("\n".join(parts).encode(), digest_size=8).hexdigest()
+
+
+def _format_traceback(exc: BaseException) -> str:
+    if exc.__traceback__ is None:
+        return ""
+    return "Traceback (most recent call last):\n" + "".join(
+        traceback.format_tb(exc.__traceback__, limit=STACK_LIMIT)
+    )
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "type", "tracebacks", "budget", "suppressed")
+
+    def __init__(
+        self,
+        fingerprint: Fingerprint,
+        chain: Chain,
+        budget: Optional[TokenBucket],
+    ) -> None:
+        exc_type = type(chain[0][0])
+        self.fingerprint = _to_hex(fingerprint)
+        self.type = "%s.%s" % (exc_type.__module__, exc_type.__name__)
+        # Only tracebacks are cached, as exceptions with the same fingerprint have
+        # the same ones. Messages may differ for every occurrence.
+        self.tracebacks = [_format_traceback(exc) for exc, _ in chain]
+        self.budget = budget
+        self.suppressed = 0
+
+    def format_stack(self, chain: Chain) -> str:
+        parts = []
+        for (exc, message), formatted in reversed(list(zip(chain, self.tracebacks))):
+            parts.append(message)
+            parts.append(formatted)
+            parts.extend(traceback.format_exception_only(type(exc), exc))
+        return "".join(parts)
+
+
+class ErrorCapture:
+    """
+    Set error tags on request spans, like `Span.set_exc_info()`, but cheaper under
+    error storms.
+
+    Exceptions are fingerprinted by type and code locations, and the formatted
+    tracebacks (of the exception and of those it was raised from) are cached per
+    fingerprint, in an LRU cache of `cache_size` entries. Exception messages are
+    formatted for every occurrence.
+
+    With a `stack_rate`, stacks are recorded at most that many times per second per
+    fingerprint. Other occurrences only get the error type, message and fingerprint,
+    and are counted in the `error.suppressed_duplicates` metric of the next span
+    that records the stack.
+    """
+
+    def __init__(
+        self, cache_size: int = 256, stack_rate: Optional[float] = None
+    ) -> None:
+        self._cache: LRUCache[Fingerprint, _Entry] = LRUCache(cache_size)
+        self._stack_rate = stack_rate
+
+    def capture(self, span: Span, exc: BaseException, now_ns: int) -> None:
+        chain = _get_chain(exc)
+        key = _get_key(chain)
+        entry = self._cache.get(key)
+        if entry is None:
+            budget = (
+                TokenBucket(self._stack_rate, now_ns)
+                if self._stack_rate is not None
+                else None
+            )
+            entry = _Entry(key, chain, budget)
+            self._cache.set(key, entry)
+
+        span.error = 1
+        meta = span.meta
+        meta[errors.ERROR_TYPE] = entry.type
+        meta[errors.ERROR_MSG] = str(exc)
+        meta["error.fingerprint"] = entry.fingerprint
+
+        if entry.budget is not None and not entry.budget.take(now_ns):
+            entry.suppressed += 1
+            return
+
+        meta[errors.ERROR_STACK] = entry.format_stack(chain)
+        if entry.suppressed:
+            span.set_metric("error.suppressed_duplicates", entry.suppressed)
+            entry.suppressed = 0
@@ -0,0 +1,69 @@
+import fnmatch
+import re
+from typing import List, Optional, Pattern, Sequence, Union
+
+PathRule = Union[str, Pattern[str]]
+
+_GLOB_CHARS = frozenset("*?[")
+_INLINE_FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.VERBOSE: "x"}
+
+
+def _to_group(pattern: Pattern[str]) -> str:
+    # Keep the flags of each pattern local to its own group.
+    flags = "".join(
+        char for flag, char in _INLINE_FLAGS.items() if pattern.flags & flag
+    )
+    return "(?%s:%s)" % (flags, pattern.pattern)
+
+
+class Exclusion:
+    """
+    Decide whether a request bypasses tracing, based on its method and path.
+
+    Path rules are either:
+
+    * Exact paths, e.g. `'/health'`.
+    * Prefixes, i.e. a single trailing wildcard, e.g. `'/static/*'`.
+    * Shell-style globs, e.g. `'/users/*/avatar'`.
+    * Compiled regular expressions, matched from the start of the path.
+
+    Rules are compiled once into a set of exact paths, a tuple of prefixes and a
+    single combined regex, so that checking a request is at most three lookups.
+    """
+
+    def __init__(
+        self, paths: Sequence[PathRule] = (), methods: Sequence[str] = ()
+    ) -> None:
+        exact = set()
+        prefixes = []
+        patterns: List[str] = []
+
+        for rule in paths:
+            if not isinstance(rule, str):
+                patterns.append(_to_group(rule))
+            elif not _GLOB_CHARS.intersection(rule):
+                exact.add(rule)
+            elif rule.endswith("*") and not _GLOB_CHARS.intersection(rule[:-1]):
+                prefixes.append(rule[:-1])
+            else:
+                patterns.append(fnmatch.translate(rule))
+
+        self._methods = frozenset(method.upper() for method in methods)
+        self._exact = frozenset(exact)
+        # NOTE: `str.startswith()` accepts a tuple of prefixes, and does the
+        # matching in C -- faster than walking a trie in Python.
+        self._prefixes = tuple(prefixes)
+        self._regex: Optional[Pattern[str]] = (
+            re.compile("|".join(patterns)) if patterns else None
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self._methods or self._exact or self._prefixes or self._regex)
+
+    def __call__(self, method: str, path: str) -> bool:
+        return (
+            method in self._methods
+            or path in self._exact
+            or (bool(self._prefixes) and path.startswith(self._prefixes))
+            or (self._regex is not None and self._regex.match(path) is not None)
+        )
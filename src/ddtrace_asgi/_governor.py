@@ -0,0 +1,106 @@
+import logging
+import random
+from typing import Optional
+
+from ddtrace.context import Context
+
+from ._compat import perf_counter_ns
+from ._lag import LoopLagMonitor
+from ._sampling import _check_rate
+
+logger = logging.getLogger("ddtrace_asgi")
+
+LEVEL_FULL = 0
+LEVEL_NO_HEADERS = 1
+LEVEL_NO_URL = 2
+LEVEL_SAMPLED = 3
+LEVEL_OFF = 4
+
+LEVEL_NAMES = ("full", "no_headers", "no_url", "sampled", "off")
+
+
+class Governor:
+    """
+    Degrade what the middleware captures when the process is overloaded, and restore
+    it once load falls.
+
+    Every `interval` seconds, event loop lag (as sampled by `monitor`, in seconds)
+    and the overhead of the middleware (the share of time spent in the middleware
+    itself, between 0 and 1) are compared to their thresholds. When either is over
+    its threshold, the capture level goes down one stage:
+
+    * `no_headers`: request and response headers are not captured.
+    * `no_url`: the URL and query string are not captured either.
+    * `sampled`: only `sample_rate` of requests are traced.
+    * `off`: requests are passed through, untraced.
+
+    When both are under half their threshold, the capture level goes back up one
+    stage.
+    """
+
+    def __init__(
+        self,
+        monitor: Optional[LoopLagMonitor],
+        lag_threshold: Optional[float] = None,
+        overhead_threshold: Optional[float] = None,
+        interval: float = 1.0,
+        sample_rate: float = 0.1,
+    ) -> None:
+        self._monitor = monitor
+        self._lag_threshold_ns = (
+            None if lag_threshold is None else int(lag_threshold * 1e9)
+        )
+        self._overhead_threshold = overhead_threshold
+        self._interval_ns = int(interval * 1e9)
+        self.sample_rate = _check_rate(sample_rate)
+        self.level = LEVEL_FULL
+        self.deadline_ns = 0
+        self._last_update_ns = perf_counter_ns()
+        self._overhead_ns = 0
+
+    def record(self, overhead_ns: int) -> None:
+        self._overhead_ns += overhead_ns
+
+    def sample(self, rate: float, context: Optional[Context]) -> float:
+        """
+        Return the rate a request was kept with at the `sampled` level, or 0 if it
+        should be dropped.
+        """
+        if context is not None and context.sampling_priority is not None:
+            return rate
+        if random.random() < self.sample_rate:
+            return rate * self.sample_rate
+        return 0.0
+
+    def update(self, now_ns: int) -> None:
+        self.deadline_ns = now_ns + self._interval_ns
+
+        lag_ns = self._monitor.lag_ns if self._monitor is not None else 0
+        elapsed_ns = now_ns - self._last_update_ns
+        overhead = self._overhead_ns / elapsed_ns if elapsed_ns > 0 else 0.0
+        self._last_update_ns = now_ns
+        self._overhead_ns = 0
+
+        overloaded = False
+        relieved = True
+        for value, threshold in (
+            (lag_ns, self._lag_threshold_ns),
+            (overhead, self._overhead_threshold),
+        ):
+            if threshold is not None:
+                overloaded = overloaded or value > threshold
+                relieved = relieved and value < threshold / 2
+
+        if overloaded and self.level < LEVEL_OFF:
+            self.level += 1
+        elif relieved and self.level > LEVEL_FULL:
+            self.level -= 1
+        else:
+            return
+
+        logger.info(
+            "Tracing capture level is now %r (loop lag: %.1fms, overhead: %.1f%%)",
+            LEVEL_NAMES[self.level],
+            lag_ns / 1e6,
+            overhead * 100,
+        )
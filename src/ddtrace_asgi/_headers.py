@@ -0,0 +1,42 @@
+from typing import AbstractSet, Dict, Iterable, Sequence
+
+from ddtrace.http.headers import REQUEST, RESPONSE, _normalize_tag_name
+from ddtrace.span import Span
+
+RawHeaders = Iterable[Sequence[bytes]]
+
+
+class HeaderCapture:
+    """
+    Store whitelisted request and response headers as span tags.
+
+    The header whitelist is compiled into a mapping of raw (lowercase, bytes) header
+    names to tag names, so that storing headers is a single pass over the raw ASGI
+    headers with one dict lookup per header.
+    """
+
+    def __init__(self, whitelist: AbstractSet[str]) -> None:
+        self._request_tags = {
+            name.encode("latin-1"): _normalize_tag_name(REQUEST, name)
+            for name in whitelist
+        }
+        self._response_tags = {
+            name.encode("latin-1"): _normalize_tag_name(RESPONSE, name)
+            for name in whitelist
+        }
+
+    def store_request_headers(self, headers: RawHeaders, span: Span) -> None:
+        self._store(self._request_tags, headers, span)
+
+    def store_response_headers(self, headers: RawHeaders, span: Span) -> None:
+        self._store(self._response_tags, headers, span)
+
+    def _store(self, tags: Dict[bytes, str], headers: RawHeaders, span: Span) -> None:
+        if not tags:
+            return
+
+        # NOTE: ASGI header names are lowercase.
+        for name, value in headers:
+            tag = tags.get(name)
+            if tag is not None:
+                span.set_tag(tag, value.decode("latin-1"))
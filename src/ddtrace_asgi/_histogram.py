@@ -0,0 +1,71 @@
+import math
+from typing import Dict
+
+
+class Histogram:
+    """
+    A fixed-memory histogram of non-negative values.
+
+    Values are counted in logarithmically-sized buckets (as in DDSketch), so that
+    quantiles are accurate within `relative_accuracy` with at most `max_buckets`
+    buckets. Values below 1 share a single bucket.
+    """
+
+    __slots__ = ("_log_gamma", "_max_buckets", "_buckets", "count", "sum", "max")
+
+    def __init__(
+        self, relative_accuracy: float = 0.01, max_buckets: int = 2048
+    ) -> None:
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(gamma)
+        self._max_buckets = max_buckets
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+        index = math.ceil(math.log(value) / self._log_gamma) if value > 1 else 0
+        buckets = self._buckets
+        buckets[index] = buckets.get(index, 0) + 1
+        if len(buckets) > self._max_buckets:
+            self._collapse()
+
+    def merge(self, other: "Histogram") -> None:
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        buckets = self._buckets
+        for index, count in other._buckets.items():
+            buckets[index] = buckets.get(index, 0) + count
+        while len(buckets) > self._max_buckets:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        # Merge the lowest bucket into the next one: high quantiles matter most.
+        buckets = self._buckets
+        lowest = min(buckets)
+        count = buckets.pop(lowest)
+        buckets[min(buckets)] += count
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen > rank:
+                break
+
+        if index == 0:
+            return 0.0
+        # Middle of the bucket, in terms of relative error.
+        gamma = math.exp(self._log_gamma)
+        return min(2 * gamma**index / (gamma + 1), self.max)
@@ -0,0 +1,44 @@
+import asyncio
+from typing import Optional
+
+
+class LoopLagMonitor:
+    """
+    Measure the lag of an event loop: how late a callback scheduled to run every
+    `interval` seconds actually runs.
+
+    Lag is sampled by a timer callback, rather than measured on the request path.
+    `sampled` tells whether `lag_ns` holds a sample taken since the monitor started.
+    """
+
+    def __init__(self, interval: float = 0.1) -> None:
+        self._interval = interval
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self.lag_ns = 0
+        self.sampled = False
+
+    @property
+    def running(self) -> bool:
+        return self._handle is not None
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        if self._handle is not None:
+            return
+        self.sampled = False
+        self._schedule(asyncio.get_event_loop() if loop is None else loop)
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self.sampled = False
+
+    def _schedule(self, loop: asyncio.AbstractEventLoop) -> None:
+        expected = loop.time() + self._interval
+        self._handle = loop.call_at(expected, self._check, loop, expected)
+
+    def _check(self, loop: asyncio.AbstractEventLoop, expected: float) -> None:
+        # NOTE: callbacks may run slightly early, within the clock resolution.
+        self.lag_ns = max(0, int((loop.time() - expected) * 1e9))
+        self.sampled = True
+        self._schedule(loop)
@@ -1,17 +1,43 @@
+import math
 from typing import Mapping, Optional, Sequence, Union
 
 from ddtrace import Tracer, tracer as global_tracer
-from ddtrace.constants import ANALYTICS_SAMPLE_RATE_KEY
-from ddtrace.ext import http as http_tags
-from ddtrace.http import store_request_headers, store_response_headers
-from ddtrace.propagation.http import HTTPPropagator
+from ddtrace.constants import SAMPLE_RATE_METRIC_KEY
+from ddtrace.context import Context
+from ddtrace.ext import http as http_tags, priority
 from ddtrace.settings import config
-from starlette.datastructures import Headers
-from starlette.requests import Request
-from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ddtrace.span import Span
 
-from ._deprecated.utils import parse_tags_from_string
+from ._aggregation import LatencyAggregator, Sink
+from ._breakdown import SCOPE_KEY as BREAKDOWN_SCOPE_KEY, Breakdown
+from ._compat import perf_counter_ns
+from ._config import ConfigSnapshot
+from ._context import ActiveRequest, get_request_context
+from ._errors import ErrorCapture
+from ._exclusion import Exclusion, PathRule
+from ._governor import (
+    LEVEL_NAMES,
+    LEVEL_NO_HEADERS,
+    LEVEL_NO_URL,
+    LEVEL_OFF,
+    LEVEL_SAMPLED,
+    Governor,
+)
+from ._headers import HeaderCapture
+from ._lag import LoopLagMonitor
+from ._overhead import overhead
+from ._propagation import Propagator
+from ._receive import TracingReceive
+from ._resources import Normalizer, ResourceNamer
+from ._sampling import HeadSampler, TailSampler, drop_trace
+from ._scope import get_url
+from ._send import StatusSend, TracingSend
+from ._tags import TagBuffer
+from ._types import ASGIApp, Message, Receive, Scope, Send
 from ._utils import parse_tags_from_list
+from ._websocket import WebSocketStats
+
+NO_HEADERS = HeaderCapture(frozenset())
 
 
 class TraceMiddleware:
@@ -23,6 +49,31 @@ class TraceMiddleware:
         service: str = "asgi",
         tags: Union[Mapping[str, str], Sequence[str]] = None,
         distributed_tracing: bool = True,
+        propagation_styles: Sequence[str] = ("datadog",),
+        resource_normalizers: Sequence[Normalizer] = (),
+        resource_cache_size: int = 1024,
+        head_sample_rate: Optional[float] = None,
+        head_sample_rules: Optional[Mapping[str, float]] = None,
+        exclude: Sequence[PathRule] = (),
+        exclude_methods: Sequence[str] = (),
+        trace_websockets: bool = False,
+        config_check_interval: Optional[float] = 1.0,
+        latency_sink: Optional[Sink] = None,
+        latency_flush_interval: float = 10.0,
+        latency_max_keys: int = 1000,
+        tail_sample_rate: Optional[float] = None,
+        tail_latency_threshold: Optional[float] = None,
+        tail_latency_rules: Optional[Mapping[str, float]] = None,
+        tail_sample_budget: float = 100.0,
+        measure_overhead: bool = False,
+        timing_breakdown: bool = False,
+        error_cache_size: int = 256,
+        error_stack_rate: Optional[float] = None,
+        governor_lag_threshold: Optional[float] = None,
+        governor_overhead_threshold: Optional[float] = None,
+        governor_interval: float = 1.0,
+        governor_sample_rate: float = 0.1,
+        load_metrics: bool = False,
     ) -> None:
         if tracer is None:
             tracer = global_tracer
@@ -30,6 +81,10 @@ class TraceMiddleware:
         if tags is None:
             tags = []
         if isinstance(tags, str):
+            # NOTE: imported lazily, so that importing the middleware does not import
+            # the `deprecation` package.
+            from ._deprecated.utils import parse_tags_from_string
+
             tags = parse_tags_from_string(tags)
         elif isinstance(tags, list):
             tags = parse_tags_from_list(tags)
@@ -40,74 +95,446 @@ class TraceMiddleware:
         self.tracer = tracer
         self.service = service
         self.tags = tags
-        self._distributed_tracing = distributed_tracing
+        self._propagator = (
+            Propagator(propagation_styles) if distributed_tracing else None
+        )
+        self._resources = ResourceNamer(
+            app, normalizers=resource_normalizers, cache_size=resource_cache_size
+        )
+        exclusion = Exclusion(exclude, exclude_methods)
+        self._exclusion = exclusion if exclusion else None
+        self._sampler: Optional[HeadSampler] = None
+        if head_sample_rate is not None or head_sample_rules:
+            self._sampler = HeadSampler(
+                1.0 if head_sample_rate is None else head_sample_rate,
+                head_sample_rules,
+            )
+        self._trace_websockets = trace_websockets
+        self._tail_sampler: Optional[TailSampler] = None
+        if (
+            tail_sample_rate is not None
+            or tail_latency_threshold is not None
+            or tail_latency_rules
+        ):
+            self._tail_sampler = TailSampler(
+                0.0 if tail_sample_rate is None else tail_sample_rate,
+                latency_threshold=tail_latency_threshold,
+                latency_rules=tail_latency_rules,
+                budget=tail_sample_budget,
+            )
+        self._latency = (
+            LatencyAggregator(
+                latency_sink,
+                flush_interval=latency_flush_interval,
+                max_keys=latency_max_keys,
+            )
+            if latency_sink is not None
+            else None
+        )
+        self._measure_overhead = measure_overhead
+        self._timing_breakdown = timing_breakdown
+        self._errors = ErrorCapture(error_cache_size, error_stack_rate)
+        self._load_metrics = load_metrics
+        self._inflight = 0
+        self._lag_monitor = (
+            LoopLagMonitor()
+            if governor_lag_threshold is not None or load_metrics
+            else None
+        )
+        self._governor: Optional[Governor] = None
+        if (
+            governor_lag_threshold is not None
+            or governor_overhead_threshold is not None
+        ):
+            self._governor = Governor(
+                self._lag_monitor,
+                lag_threshold=governor_lag_threshold,
+                overhead_threshold=governor_overhead_threshold,
+                interval=governor_interval,
+                sample_rate=governor_sample_rate,
+            )
+        self._config_check_interval_ns = (
+            math.inf
+            if config_check_interval is None
+            else int(config_check_interval * 1e9)
+        )
+        self.reload_config()
+
+    def reload_config(self) -> None:
+        """
+        Read settings from `ddtrace.config.asgi` (and the `service` and `tags` of the
+        middleware) again.
+        """
+        self._config = ConfigSnapshot(config.asgi, self.service, self.tags)
+        self._config_deadline_ns = perf_counter_ns() + self._config_check_interval_ns
+
+    def _check_config(self, now_ns: int) -> None:
+        # NOTE: ddtrace settings carry no version, so look for changes periodically.
+        if self._config.is_stale(config.asgi):
+            self.reload_config()
+        else:
+            self._config_deadline_ns = now_ns + self._config_check_interval_ns
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         scope["ddtrace_asgi.tracer"] = self.tracer
 
+        if scope["type"] == "websocket" and self._trace_websockets:
+            await self._call_websocket(scope, receive, send)
+            return
+
+        if scope["type"] == "lifespan" and self._lag_monitor is not None:
+            await self._call_lifespan(scope, receive, send)
+            return
+
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
 
-        request = Request(scope=scope, receive=receive)
+        # NOTE: read everything straight from the scope. Starlette `Headers` are only
+        # built when propagation or header capture actually needs them.
         try:
-            request_headers = request.headers
-            method = request.method
-            url = request.url
+            method: str = scope["method"]
+            path: str = scope["path"]
+            raw_headers = scope["headers"]
         except KeyError:
             # ASGI message is invalid - most likely missing the 'headers' or 'method'
             # fields.
             await self.app(scope, receive, send)
             return
 
-        # Make sure we don't use potentially unsafe request attributes after this point.
-        del request
+        if self._exclusion is not None and self._exclusion(method, path):
+            await self._call_untraced(scope, receive, send)
+            return
+
+        start_ns = perf_counter_ns()
+        if start_ns >= self._config_deadline_ns:
+            self._check_config(start_ns)
+        snapshot = self._config
+
+        governor = self._governor
+        level = 0
+        if governor is not None:
+            if start_ns >= governor.deadline_ns:
+                self._update_governor(governor, start_ns)
+            level = governor.level
+            if level >= LEVEL_OFF:
+                await self._call_untraced(scope, receive, send)
+                return
+
+        path = scope.get("root_path", "") + path
+
+        query_string: bytes = scope.get("query_string", b"")
 
-        if self._distributed_tracing:
-            propagator = HTTPPropagator()
-            context = propagator.extract(request_headers)
-            if context.trace_id:
-                self.tracer.context_provider.activate(context)
+        context: Optional[Context] = None
+        if self._propagator is not None:
+            context = self._propagator.extract(raw_headers)
 
-        resource = "%s %s" % (method, url.path)
-        span = self.tracer.trace(
-            name="asgi.request",
-            service=self.service,
+        sample_rate = 1.0
+        if self._sampler is not None:
+            sample_rate = self._sampler.sample(method, path, context)
+        if level >= LEVEL_SAMPLED and sample_rate:
+            assert governor is not None
+            sample_rate = governor.sample(sample_rate, context)
+        if not sample_rate:
+            await self._call_dropped(
+                scope, receive, send, context, snapshot, method, path, start_ns
+            )
+            return
+
+        resource = self._resources.get(scope, method, path)
+        # NOTE: parent the span explicitly, rather than to whatever context happens to
+        # be active in the ddtrace context provider.
+        span = self.tracer.start_span(
+            "asgi.request",
+            child_of=context if context is not None else get_request_context(),
+            service=snapshot.service,
             resource=resource,
             span_type=http_tags.TYPE,
         )
+        breakdown: Optional[Breakdown] = None
+        if self._timing_breakdown:
+            breakdown = scope[BREAKDOWN_SCOPE_KEY] = Breakdown(perf_counter_ns())
 
-        span.set_tag(
-            ANALYTICS_SAMPLE_RATE_KEY,
-            config.asgi.get_analytics_sample_rate(use_global_config=True),
-        )
-        span.set_tag(http_tags.METHOD, method)
-        span.set_tag(http_tags.URL, str(url))
-        if config.asgi.get("trace_query_string"):
-            span.set_tag(http_tags.QUERY_STRING, url.query)
+        if self._sampler is not None or level >= LEVEL_SAMPLED:
+            if context is None or context.sampling_priority is None:
+                span.context.sampling_priority = priority.AUTO_KEEP
+            if sample_rate < 1:
+                span.set_metric(SAMPLE_RATE_METRIC_KEY, sample_rate)
 
-        span.set_tags(self.tags)
+        # NOTE: these tags are known to be strings, so skip `Span.set_tag()`. Static
+        # tags are applied last, so that user tags take precedence.
+        meta = span.meta
+        meta[http_tags.METHOD] = method
+        if level < LEVEL_NO_URL:
+            meta[http_tags.URL] = get_url(scope, path, query_string)
+            if snapshot.trace_query_string:
+                meta[http_tags.QUERY_STRING] = query_string.decode("latin-1")
+        if governor is not None:
+            meta["asgi.governor.level"] = LEVEL_NAMES[level]
+        load_metrics = self._load_metrics
+        if load_metrics:
+            self._start_load_metrics()
+            span.metrics["asgi.inflight_requests"] = self._inflight
+
+        snapshot.tags.apply(span)
 
         # NOTE: any request header set in the future will not be stored in the span.
-        store_request_headers(request_headers, span, config.asgi)
+        headers = snapshot.headers if level < LEVEL_NO_HEADERS else NO_HEADERS
+        headers.store_request_headers(raw_headers, span)
+
+        active = ActiveRequest(self.tracer, span.context)
+        scope["ddtrace_asgi.context"] = span.context
+        scope["ddtrace_asgi.span"] = span
+        tags = scope["ddtrace_asgi.tags"] = TagBuffer()
+
+        measure_overhead = self._measure_overhead or governor is not None
+        tracing_receive = TracingReceive(receive)
+        tracing_send = TracingSend(send, span, headers, start_ns, measure_overhead)
+        if measure_overhead:
+            pre_app_ns = perf_counter_ns() - start_ns
+        if breakdown is not None:
+            breakdown.app_start_ns = perf_counter_ns()
+        try:
+            await self.app(scope, tracing_receive, tracing_send)
+        except BaseException as exc:
+            self._errors.capture(span, exc, perf_counter_ns())
+            raise exc from None
+        finally:
+            if measure_overhead:
+                post_app_start_ns = perf_counter_ns()
+            if load_metrics:
+                self._record_load(span)
+            tracing_receive.record(span)
+            tracing_send.record(span)
+            tags.flush(span)
+            if self._measure_overhead:
+                # NOTE: the span is sent once finished, so the time spent finishing
+                # it is only counted in the process-wide totals.
+                span.set_metric("asgi.overhead.pre_app_ns", pre_app_ns)
+                span.set_metric(
+                    "asgi.overhead.post_app_ns",
+                    perf_counter_ns() - post_app_start_ns + tracing_send.overhead_ns,
+                )
+            self._finish(span, resource, tracing_send.status_code, start_ns, breakdown)
+            active.close()
+            if measure_overhead:
+                post_app_ns = (
+                    perf_counter_ns() - post_app_start_ns + tracing_send.overhead_ns
+                )
+                if self._measure_overhead:
+                    overhead.add(pre_app_ns, post_app_ns)
+                if governor is not None:
+                    governor.record(pre_app_ns + post_app_ns)
+
+    async def _call_untraced(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # NOTE: handlers use the scope API whether or not the request is traced.
+        # There is no span nor context, and queued tags are discarded.
+        scope["ddtrace_asgi.context"] = None
+        scope["ddtrace_asgi.span"] = None
+        scope["ddtrace_asgi.tags"] = TagBuffer()
+        await self.app(scope, receive, send)
+
+    def _start_load_metrics(self) -> None:
+        self._inflight += 1
+        # NOTE: for applications and servers that do not run the lifespan protocol,
+        # loop lag is sampled from the event loop of the first request.
+        monitor = self._lag_monitor
+        assert monitor is not None
+        if not monitor.running:
+            monitor.start()
+
+    def _record_load(self, span: Span) -> None:
+        self._inflight -= 1
+        # NOTE: the latest sample, i.e. lag at most a sampling interval ago.
+        monitor = self._lag_monitor
+        assert monitor is not None
+        if monitor.sampled:
+            span.metrics["asgi.loop_lag_ns"] = monitor.lag_ns
+
+    def _update_governor(self, governor: Governor, now_ns: int) -> None:
+        # NOTE: loop lag is sampled from the event loop of the first request.
+        if self._lag_monitor is not None and not self._lag_monitor.running:
+            self._lag_monitor.start()
+        governor.update(now_ns)
+
+    def _finish(
+        self,
+        span: Span,
+        resource: str,
+        status_code: Optional[int],
+        start_ns: int,
+        breakdown: Optional[Breakdown],
+    ) -> None:
+        if breakdown is not None:
+            breakdown.record(span)
 
-        async def send_with_tracing(message: Message) -> None:
-            span = self.tracer.current_span()
+        if self._tail_sampler is None and self._latency is None:
+            if breakdown is not None:
+                self._trace_breakdown(breakdown, span)
+            span.finish()
+            return
+
+        end_ns = perf_counter_ns()
+        duration_ns = end_ns - start_ns
+        error = bool(span.error)
+
+        if self._tail_sampler is not None:
+            reason = self._tail_sampler.sample(
+                resource, status_code, error, end_ns, duration_ns
+            )
+            if reason is None:
+                drop_trace(span)
+            else:
+                span.meta["tail_sampling.reason"] = reason
+                if reason != "rate":
+                    span.context.sampling_priority = priority.USER_KEEP
+
+        if breakdown is not None:
+            self._trace_breakdown(breakdown, span)
+        span.finish()
+
+        if self._latency is not None:
+            self._latency.record(resource, status_code, error, end_ns, duration_ns)
+
+    def _trace_breakdown(self, breakdown: Breakdown, span: Span) -> None:
+        # NOTE: layer spans are only created for traces that are kept.
+        sampling_priority = span.context.sampling_priority
+        if span.sampled and (sampling_priority is None or sampling_priority > 0):
+            breakdown.trace(self.tracer, span)
+
+    async def _call_lifespan(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # NOTE: sample loop lag on the event loop that serves requests, for as long as
+        # the application runs.
+        monitor = self._lag_monitor
+        assert monitor is not None
+
+        async def lifespan_receive() -> Message:
+            message = await receive()
+            message_type = message.get("type")
+            if message_type == "lifespan.startup":
+                monitor.start()
+            elif message_type == "lifespan.shutdown":
+                monitor.stop()
+            return message
+
+        try:
+            await self.app(scope, lifespan_receive, send)
+        finally:
+            monitor.stop()
+
+    async def _call_dropped(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        context: Optional[Context],
+        snapshot: ConfigSnapshot,
+        method: str,
+        path: str,
+        start_ns: int,
+    ) -> None:
+        # Only set up what downstream code needs to propagate the decision: a
+        # placeholder span that is never sampled, hence never sent to the agent, and
+        # which child spans inherit the sampling decision from.
+        if context is None:
+            context = Context()
+        if context.sampling_priority is None:
+            context.sampling_priority = priority.AUTO_REJECT
+
+        span = Span(
+            self.tracer,
+            "asgi.request",
+            service=snapshot.service,
+            trace_id=context.trace_id,
+            parent_id=context.span_id,
+        )
+        span.sampled = False
+        context.add_span(span)
+        active = ActiveRequest(self.tracer, context)
+        scope["ddtrace_asgi.context"] = context
+        scope["ddtrace_asgi.span"] = span
+        # NOTE: queued tags are discarded along with the span.
+        scope["ddtrace_asgi.tags"] = TagBuffer()
+
+        # NOTE: dropped requests are in flight too.
+        load_metrics = self._load_metrics
+        if load_metrics:
+            self._inflight += 1
 
-            if span and message.get("type") == "http.response.start":
-                if "status" in message:
-                    status_code: int = message["status"]
-                    span.set_tag(http_tags.STATUS_CODE, str(status_code))
-                if "headers" in message:
-                    response_headers = Headers(raw=message["headers"])
-                    store_response_headers(response_headers, span, config.asgi)
+        if self._latency is None:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                if load_metrics:
+                    self._inflight -= 1
+                span.finish()
+                active.close()
+            return
+
+        # NOTE: latencies are aggregated for dropped requests too. The resource is
+        # named before calling the application, which may rewrite the scope path.
+        resource = self._resources.get(scope, method, path)
+        status_send = StatusSend(send)
+        error = True
+        try:
+            await self.app(scope, receive, status_send)
+            error = False
+        finally:
+            if load_metrics:
+                self._inflight -= 1
+            span.finish()
+            active.close()
+            end_ns = perf_counter_ns()
+            self._latency.record(
+                resource, status_send.status_code, error, end_ns, end_ns - start_ns
+            )
+
+    async def _call_websocket(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # NOTE: a single span covers the whole connection. Messages are aggregated
+        # into metrics on that span, rather than traced individually.
+        try:
+            path: str = scope["path"]
+            raw_headers = scope["headers"]
+        except KeyError:
+            await self.app(scope, receive, send)
+            return
+
+        method = "WEBSOCKET"
+        if self._exclusion is not None and self._exclusion(method, path):
+            await self._call_untraced(scope, receive, send)
+            return
+
+        path = scope.get("root_path", "") + path
+
+        context: Optional[Context] = None
+        if self._propagator is not None:
+            context = self._propagator.extract(raw_headers)
+
+        snapshot = self._config
+        span = self.tracer.start_span(
+            "asgi.websocket",
+            child_of=context if context is not None else get_request_context(),
+            service=snapshot.service,
+            resource=self._resources.get(scope, method, path),
+            span_type=http_tags.TYPE,
+        )
+        span.meta[http_tags.URL] = get_url(scope, path, scope.get("query_string", b""))
+        snapshot.tags.apply(span)
+        snapshot.headers.store_request_headers(raw_headers, span)
 
-            await send(message)
+        active = ActiveRequest(self.tracer, span.context)
+        scope["ddtrace_asgi.context"] = span.context
+        scope["ddtrace_asgi.span"] = span
+        tags = scope["ddtrace_asgi.tags"] = TagBuffer()
 
+        stats = WebSocketStats(receive, send)
         try:
-            await self.app(scope, receive, send_with_tracing)
+            await self.app(scope, stats.receive, stats.send)
         except BaseException as exc:
-            span.set_traceback()
+            self._errors.capture(span, exc, perf_counter_ns())
             raise exc from None
         finally:
+            stats.record(span)
+            tags.flush(span)
             span.finish()
+            active.close()
@@ -0,0 +1,51 @@
+import os
+import threading
+from typing import Dict
+
+
+class OverheadCounter:
+    """
+    Process-wide totals of the time spent in the middleware itself, split between
+    the time before the application is called and the time after it returns.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def add(self, pre_app_ns: int, post_app_ns: int) -> None:
+        with self._lock:
+            self._requests += 1
+            self._pre_app_ns += pre_app_ns
+            self._post_app_ns += post_app_ns
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "pre_app_ns": self._pre_app_ns,
+                "post_app_ns": self._post_app_ns,
+            }
+
+    def _reset(self) -> None:
+        # Time spent by the parent process belongs to the parent process.
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._pre_app_ns = 0
+        self._post_app_ns = 0
+
+
+overhead = OverheadCounter()
+
+
+def get_overhead_stats() -> Dict[str, int]:
+    """
+    Return the number of requests traced with `measure_overhead=True` in this
+    process, and the total time (in nanoseconds) the middleware spent on them before
+    (`pre_app_ns`) and after (`post_app_ns`) calling the application.
+    """
+    return overhead.get_stats()
+
+
+if hasattr(os, "register_at_fork"):  # pragma: no branch
+    # NOTE: Python 3.7+.
+    os.register_at_fork(after_in_child=overhead._reset)
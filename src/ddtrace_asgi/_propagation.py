@@ -0,0 +1,170 @@
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Sequence
+
+from ddtrace.context import Context
+from ddtrace.ext import priority
+from ddtrace.propagation.http import (
+    HTTP_HEADER_ORIGIN,
+    HTTP_HEADER_PARENT_ID,
+    HTTP_HEADER_SAMPLING_PRIORITY,
+    HTTP_HEADER_TRACE_ID,
+    HTTPPropagator,
+)
+
+Headers = Dict[str, str]
+Extractor = Callable[[Headers], Optional[Context]]
+
+B3_HEADER_SINGLE = "b3"
+B3_HEADER_TRACE_ID = "x-b3-traceid"
+B3_HEADER_SPAN_ID = "x-b3-spanid"
+B3_HEADER_SAMPLED = "x-b3-sampled"
+B3_HEADER_FLAGS = "x-b3-flags"
+W3C_HEADER_TRACEPARENT = "traceparent"
+
+B3_SAMPLING_PRIORITIES = {
+    "0": priority.AUTO_REJECT,
+    "false": priority.AUTO_REJECT,
+    "1": priority.AUTO_KEEP,
+    "true": priority.AUTO_KEEP,
+    "d": priority.USER_KEEP,
+}
+
+
+def _to_id(value: str) -> int:
+    # Datadog IDs are 64-bit: keep the lower 64 bits of 128-bit IDs.
+    return int(value[-16:], 16)
+
+
+_datadog_propagator = HTTPPropagator()
+
+
+def extract_datadog(headers: Headers) -> Optional[Context]:
+    context = _datadog_propagator.extract(headers)
+    return context if context.trace_id else None
+
+
+def extract_b3(headers: Headers) -> Optional[Context]:
+    if B3_HEADER_SINGLE in headers:
+        # Format: {TraceId}-{SpanId}-{SamplingState}-{ParentSpanId}, where the last
+        # two fields are optional.
+        fields = headers[B3_HEADER_SINGLE].split("-")
+        if len(fields) < 2:
+            # Sampling decision only, e.g. 'b3: 0'.
+            return None
+        trace_id, span_id = fields[:2]
+        sampled = fields[2] if len(fields) > 2 else None
+    else:
+        trace_id = headers.get(B3_HEADER_TRACE_ID, "")
+        span_id = headers.get(B3_HEADER_SPAN_ID, "")
+        sampled = headers.get(B3_HEADER_SAMPLED)
+        if headers.get(B3_HEADER_FLAGS) == "1":
+            sampled = "d"
+
+    try:
+        context = Context(
+            trace_id=_to_id(trace_id),
+            span_id=_to_id(span_id),
+            sampling_priority=B3_SAMPLING_PRIORITIES.get(sampled or ""),
+        )
+    except ValueError:
+        return None
+
+    return context if context.trace_id else None
+
+
+def extract_tracecontext(headers: Headers) -> Optional[Context]:
+    # Format: {version}-{trace-id}-{parent-id}-{trace-flags}
+    # See: https://www.w3.org/TR/trace-context/#traceparent-header
+    traceparent = headers.get(W3C_HEADER_TRACEPARENT)
+    if traceparent is None:
+        return None
+
+    fields = traceparent.strip().split("-")
+    if len(fields) < 4 or fields[0] == "ff":
+        return None
+
+    _, trace_id, span_id, flags = fields[:4]
+    if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+        return None
+
+    try:
+        sampled = int(flags, 16) & 0x01
+        context = Context(
+            trace_id=_to_id(trace_id),
+            span_id=_to_id(span_id),
+            sampling_priority=priority.AUTO_KEEP if sampled else priority.AUTO_REJECT,
+        )
+    except ValueError:
+        return None
+
+    return context if context.trace_id and context.span_id else None
+
+
+STYLES: Dict[str, FrozenSet[str]] = {
+    "datadog": frozenset(
+        (
+            HTTP_HEADER_TRACE_ID,
+            HTTP_HEADER_PARENT_ID,
+            HTTP_HEADER_SAMPLING_PRIORITY,
+            HTTP_HEADER_ORIGIN,
+        )
+    ),
+    "b3": frozenset(
+        (
+            B3_HEADER_SINGLE,
+            B3_HEADER_TRACE_ID,
+            B3_HEADER_SPAN_ID,
+            B3_HEADER_SAMPLED,
+            B3_HEADER_FLAGS,
+        )
+    ),
+    "tracecontext": frozenset((W3C_HEADER_TRACEPARENT,)),
+}
+
+EXTRACTORS: Dict[str, Extractor] = {
+    "datadog": extract_datadog,
+    "b3": extract_b3,
+    "tracecontext": extract_tracecontext,
+}
+
+
+class Propagator:
+    """
+    Extract a distributed tracing context from raw ASGI headers.
+
+    Raw headers are first scanned for the headers of the enabled propagation styles,
+    so that requests carrying no such headers skip extraction altogether.
+    Styles are tried in order, and the first one that yields a context wins.
+    """
+
+    def __init__(self, styles: Sequence[str] = ("datadog",)) -> None:
+        for style in styles:
+            if style not in STYLES:
+                raise ValueError(
+                    f"Unknown propagation style: {style!r} "
+                    f"(expected one of {', '.join(STYLES)})"
+                )
+
+        self._extractors = [EXTRACTORS[style] for style in styles]
+        self._header_names = frozenset(
+            name.encode("latin-1") for style in styles for name in STYLES[style]
+        )
+
+    def extract(self, headers: Iterable[Sequence[bytes]]) -> Optional[Context]:
+        found: Optional[Headers] = None
+
+        # NOTE: ASGI header names are lowercase.
+        for name, value in headers:
+            if name in self._header_names:
+                if found is None:
+                    found = {}
+                found[name.decode("latin-1")] = value.decode("latin-1")
+
+        if found is None:
+            return None
+
+        for extract in self._extractors:
+            context = extract(found)
+            if context is not None:
+                return context
+
+        return None
@@ -0,0 +1,27 @@
+from ddtrace.span import Span
+
+from ._types import Message, Receive
+
+
+class TracingReceive:
+    """
+    Wrap an ASGI `receive` callable to count the request body bytes of a request.
+
+    Body chunks are only measured as they stream through, so that memory use stays
+    flat regardless of the size of the request body.
+    """
+
+    __slots__ = ("_receive", "_body_bytes")
+
+    def __init__(self, receive: Receive) -> None:
+        self._receive = receive
+        self._body_bytes = 0
+
+    async def __call__(self) -> Message:
+        message = await self._receive()
+        if message.get("type") == "http.request":
+            self._body_bytes += len(message.get("body", b""))
+        return message
+
+    def record(self, span: Span) -> None:
+        span.set_metric("http.request.body.bytes", self._body_bytes)
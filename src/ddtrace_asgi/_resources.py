@@ -0,0 +1,92 @@
+import re
+import sys
+from typing import Any, Dict, Optional, Pattern, Sequence, Tuple, Union
+
+from ._types import Scope
+from ._utils import LRUCache
+
+Normalizer = Tuple[Union[str, Pattern[str]], str]
+
+
+def get_starlette_routes(app: Any) -> Optional[Sequence[Any]]:
+    """
+    Return the routes of Starlette (or FastAPI) applications and routers, or `None`
+    for other applications.
+    """
+    # NOTE: an application can only be a Starlette one if Starlette was imported.
+    routing = sys.modules.get("starlette.routing")
+    if routing is None:
+        return None
+    applications = sys.modules.get("starlette.applications")
+    if isinstance(app, routing.Router) or (
+        applications is not None and isinstance(app, applications.Starlette)
+    ):
+        return app.routes
+    return None
+
+
+class ResourceNamer:
+    """
+    Build the resource name of request spans, e.g. 'GET /users/{user_id}'.
+
+    Uses the path template of the matching route for Starlette-based applications,
+    and the request path rewritten by `normalizers` otherwise. A normalizer is a
+    `(pattern, replacement)` pair, applied with `re.sub()`.
+
+    Resource names are cached by application, method and path (and host, for
+    applications with `Host` routes), so that the hot path is a single cache lookup.
+    """
+
+    def __init__(
+        self, app: Any, normalizers: Sequence[Normalizer] = (), cache_size: int = 1024
+    ) -> None:
+        self._app = app
+        self._normalizers = [
+            (re.compile(pattern), replacement) for pattern, replacement in normalizers
+        ]
+        self._cache: LRUCache[Tuple[int, str, str, str], str] = LRUCache(cache_size)
+        # Whether each application has `Host` routes, by id.
+        self._host_routing: Dict[int, bool] = {}
+
+    def get(self, scope: Scope, method: str, path: str) -> str:
+        # NOTE: Starlette sets 'app' in the scope before running the middleware stack.
+        # Templates depend on it, e.g. for middleware shared by several applications.
+        app = scope.get("app", self._app)
+        key = (id(app), method, path, self._get_host(app, scope))
+        resource = self._cache.get(key)
+        if resource is None:
+            resource = "%s %s" % (method, self._get_path_template(app, scope, path))
+            self._cache.set(key, resource)
+        return resource
+
+    def _get_host(self, app: Any, scope: Scope) -> str:
+        # NOTE: templates of `Host` routes depend on the host header of the request.
+        host_routing = self._host_routing.get(id(app))
+        if host_routing is None:
+            routes = get_starlette_routes(app)
+            host_routing = False
+            if routes is not None:
+                from ._starlette import has_host_routes
+
+                host_routing = has_host_routes(routes)
+            self._host_routing[id(app)] = host_routing
+
+        if host_routing:
+            for name, value in scope.get("headers", ()):
+                if name == b"host":
+                    return value.decode("latin-1")
+        return ""
+
+    def _get_path_template(self, app: Any, scope: Scope, path: str) -> str:
+        routes = get_starlette_routes(app)
+        if routes is not None:
+            from ._starlette import get_route_template
+
+            template = get_route_template(routes, scope)
+            if template is not None:
+                return scope.get("root_path", "") + template
+
+        for pattern, replacement in self._normalizers:
+            path = pattern.sub(replacement, path)
+
+        return path
@@ -0,0 +1,150 @@
+import fnmatch
+import random
+import re
+from typing import List, Mapping, Optional, Pattern, Tuple
+
+from ddtrace.context import Context
+from ddtrace.span import Span
+
+from ._compat import perf_counter_ns
+
+
+def _check_rate(rate: float) -> float:
+    if not 0 <= rate <= 1:
+        raise ValueError(f"Sample rates must be between 0 and 1 (got {rate!r})")
+    return rate
+
+
+class HeadSampler:
+    """
+    Decide whether to keep or drop a request before any span work happens.
+
+    `rules` map `'<METHOD> <PATH>'` patterns to sample rates, where both parts accept
+    shell-style wildcards, e.g. `{'GET /health': 0, '* /api/*': 0.5}`. The first
+    matching rule wins, and `rate` applies to requests that match no rule.
+
+    Requests that carry a sampling priority from an upstream service keep it.
+    """
+
+    def __init__(
+        self, rate: float = 1.0, rules: Optional[Mapping[str, float]] = None
+    ) -> None:
+        self._rate = _check_rate(rate)
+        self._rules: List[Tuple[Pattern[str], float]] = []
+
+        for rule, rule_rate in (rules or {}).items():
+            method, _, path = rule.partition(" ")
+            if not path:
+                raise ValueError(
+                    f"Sampling rules must be formatted as '<METHOD> <PATH>' "
+                    f"(got {rule!r})"
+                )
+            pattern = re.compile(
+                fnmatch.translate(f"{method.upper()} {path}"), flags=re.DOTALL
+            )
+            self._rules.append((pattern, _check_rate(rule_rate)))
+
+    def get_rate(self, method: str, path: str) -> float:
+        if self._rules:
+            key = "%s %s" % (method, path)
+            for pattern, rate in self._rules:
+                if pattern.match(key):
+                    return rate
+        return self._rate
+
+    def sample(self, method: str, path: str, context: Optional[Context]) -> float:
+        """
+        Return the rate a request was kept with, or 0 if it should be dropped.
+        """
+        if context is not None and context.sampling_priority is not None:
+            return 1.0 if context.sampling_priority > 0 else 0.0
+
+        rate = self.get_rate(method, path)
+        if rate >= 1 or random.random() < rate:
+            return rate
+        return 0.0
+
+
+class TokenBucket:
+    """
+    Allow at most `rate` events per second, with bursts of up to `rate` events (or
+    a single event, for rates under 1).
+    """
+
+    __slots__ = ("_rate", "_burst", "_tokens", "_last_ns")
+
+    def __init__(self, rate: float, now_ns: int) -> None:
+        self._rate = rate
+        self._burst = max(rate, 1.0) if rate > 0 else 0.0
+        self._tokens = self._burst
+        self._last_ns = now_ns
+
+    def take(self, now_ns: int) -> bool:
+        elapsed_ns = now_ns - self._last_ns
+        self._last_ns = now_ns
+        self._tokens = min(self._burst, self._tokens + elapsed_ns * self._rate / 1e9)
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class TailSampler:
+    """
+    Decide whether to keep or drop a trace once its request is over.
+
+    Requests that failed (raised an exception, or responded with a 5xx status) or
+    were slow (took longer than the threshold of their resource in `latency_rules`,
+    or `latency_threshold` otherwise, in seconds) are kept, within a `budget` of
+    traces per second. Other requests, and requests over budget, are kept with
+    probability `rate`.
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        latency_threshold: Optional[float] = None,
+        latency_rules: Optional[Mapping[str, float]] = None,
+        budget: float = 100.0,
+    ) -> None:
+        self._rate = _check_rate(rate)
+        self._threshold_ns = (
+            None if latency_threshold is None else int(latency_threshold * 1e9)
+        )
+        self._rules_ns = {
+            resource: int(threshold * 1e9)
+            for resource, threshold in (latency_rules or {}).items()
+        }
+        self._budget = TokenBucket(budget, perf_counter_ns())
+
+    def sample(
+        self,
+        resource: str,
+        status_code: Optional[int],
+        error: bool,
+        now_ns: int,
+        duration_ns: int,
+    ) -> Optional[str]:
+        """
+        Return why a trace should be kept, or `None` if it should be dropped.
+        """
+        reason: Optional[str] = None
+        if error or (status_code is not None and status_code >= 500):
+            reason = "error"
+        else:
+            threshold_ns = self._rules_ns.get(resource, self._threshold_ns)
+            if threshold_ns is not None and duration_ns >= threshold_ns:
+                reason = "slow"
+
+        if reason is not None and self._budget.take(now_ns):
+            return reason
+        if self._rate and (self._rate >= 1 or random.random() < self._rate):
+            return "rate"
+        return None
+
+
+def drop_trace(span: Span) -> None:
+    # NOTE: ddtrace only sends traces that have at least one sampled span. Spans of
+    # the local trace are buffered in the context until the trace is complete.
+    for trace_span in span.context._trace:
+        trace_span.sampled = False
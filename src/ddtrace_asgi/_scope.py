@@ -0,0 +1,40 @@
+from typing import Optional
+
+from ._types import Scope
+
+DEFAULT_PORTS = {"http": 80, "https": 443, "ws": 80, "wss": 443}
+
+
+def get_host_header(scope: Scope) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == b"host":
+            return value.decode("latin-1")
+    return None
+
+
+def get_url(scope: Scope, path: str, query_string: bytes) -> str:
+    """
+    Build the full URL of a request straight from the ASGI scope.
+
+    Equivalent to `str(starlette.requests.Request(scope).url)`, minus the parsing.
+    """
+    scheme = scope.get("scheme", "http")
+    host = get_host_header(scope)
+
+    if host is not None:
+        url = "%s://%s%s" % (scheme, host, path)
+    else:
+        server = scope.get("server")
+        if server is None:
+            url = path
+        else:
+            host, port = server
+            if port == DEFAULT_PORTS.get(scheme):
+                url = "%s://%s%s" % (scheme, host, path)
+            else:
+                url = "%s://%s:%s%s" % (scheme, host, port, path)
+
+    if query_string:
+        url += "?" + query_string.decode("latin-1")
+
+    return url
@@ -0,0 +1,114 @@
+from typing import Optional
+
+from ddtrace.ext import http as http_tags
+from ddtrace.span import Span
+
+from ._compat import perf_counter_ns
+from ._headers import HeaderCapture
+from ._types import Message, Send
+
+STATUS_CODES = {status_code: str(status_code) for status_code in range(100, 600)}
+
+
+class TracingSend:
+    """
+    Wrap an ASGI `send` callable to record response information on a request span.
+
+    Only the first `http.response.start` message is inspected. Subsequent messages,
+    e.g. `http.response.body` chunks of a streaming response, are only counted:
+    body sizes and timestamps are accumulated, and recorded by `record()`.
+
+    With `measure_overhead`, the time spent handling `http.response.start` is
+    stored in `overhead_ns`.
+    """
+
+    __slots__ = (
+        "_send",
+        "_span",
+        "_headers",
+        "_started",
+        "status_code",
+        "_start_ns",
+        "_body_bytes",
+        "_first_byte_ns",
+        "_last_byte_ns",
+        "_measure_overhead",
+        "overhead_ns",
+    )
+
+    def __init__(
+        self,
+        send: Send,
+        span: Span,
+        headers: HeaderCapture,
+        start_ns: int,
+        measure_overhead: bool = False,
+    ) -> None:
+        self._send = send
+        self._span = span
+        self._headers = headers
+        self._started = False
+        self.status_code: Optional[int] = None
+        self._start_ns = start_ns
+        self._body_bytes = 0
+        self._first_byte_ns: Optional[int] = None
+        self._last_byte_ns: Optional[int] = None
+        self._measure_overhead = measure_overhead
+        self.overhead_ns = 0
+
+    async def __call__(self, message: Message) -> None:
+        message_type = message.get("type")
+        if message_type == "http.response.body":
+            # NOTE: only the size of the body is read, the body itself is never
+            # copied nor kept around.
+            self._body_bytes += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                self._last_byte_ns = perf_counter_ns()
+        elif not self._started and message_type == "http.response.start":
+            self._started = True
+            self._first_byte_ns = perf_counter_ns()
+            self._on_response_start(message)
+            if self._measure_overhead:
+                self.overhead_ns = perf_counter_ns() - self._first_byte_ns
+        await self._send(message)
+
+    def _on_response_start(self, message: Message) -> None:
+        span = self._span
+        if "status" in message:
+            status_code: int = message["status"]
+            self.status_code = status_code
+            span.set_tag(
+                http_tags.STATUS_CODE,
+                STATUS_CODES.get(status_code) or str(status_code),
+            )
+        if "headers" in message:
+            self._headers.store_response_headers(message["headers"], span)
+
+    def record(self, span: Span) -> None:
+        span.set_metric("http.response.body.bytes", self._body_bytes)
+        if self._first_byte_ns is not None:
+            span.set_metric(
+                "http.response.ttfb_ns", self._first_byte_ns - self._start_ns
+            )
+        if self._last_byte_ns is not None:
+            span.set_metric(
+                "http.response.ttlb_ns", self._last_byte_ns - self._start_ns
+            )
+
+
+class StatusSend:
+    """
+    Wrap an ASGI `send` callable to remember the response status code, and nothing
+    else.
+    """
+
+    __slots__ = ("_send", "status_code")
+
+    def __init__(self, send: Send) -> None:
+        self._send = send
+        self.status_code: Optional[int] = None
+
+    async def __call__(self, message: Message) -> None:
+        if self.status_code is None and message.get("type") == "http.response.start":
+            self.status_code = message.get("status")
+        await self._send(message)
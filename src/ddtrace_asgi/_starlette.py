@@ -0,0 +1,65 @@
+"""
+Starlette-specific helpers.
+
+NOTE: this module must only be imported once a Starlette application was detected.
+"""
+
+from typing import Any, Optional, Sequence
+
+from starlette.routing import Host, Match
+from starlette.types import Scope
+
+
+def get_route_template(routes: Sequence[Any], scope: Scope) -> Optional[str]:
+    """
+    Return the path template of the route that handles a request, e.g.
+    '/users/{user_id}', or `None` if no route matches.
+
+    Routes of mounted applications and routers are resolved recursively.
+    """
+    partial = None
+
+    for route in routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return _get_template(route, {**scope, **child_scope})
+        if match == Match.PARTIAL and partial is None:
+            # E.g. the path matches but the method doesn't. Starlette would respond
+            # with a '405 Method Not Allowed', which we still attribute to the route.
+            partial = route, child_scope
+
+    if partial is not None:
+        route, child_scope = partial
+        return _get_template(route, {**scope, **child_scope})
+
+    return None
+
+
+def has_host_routes(routes: Sequence[Any]) -> bool:
+    """
+    Return whether `routes`, or the routes of mounted applications and routers,
+    contain `Host` routes, which match requests on the host header.
+    """
+    for route in routes:
+        if isinstance(route, Host):
+            return True
+        inner = getattr(route, "routes", None)
+        if inner is not None and has_host_routes(inner):
+            return True
+    return False
+
+
+def _get_template(route: Any, scope: Scope) -> str:
+    # NOTE: `Host` routes have no path.
+    path = getattr(route, "path", "")
+
+    if not hasattr(route, "routes"):
+        # `Route` or `WebSocketRoute`.
+        return path
+
+    # `Mount` or `Host`: resolve the routes of the wrapped application, if any.
+    routes = route.routes
+    template = get_route_template(routes, scope) if routes is not None else None
+    if template is None:
+        return path + "/{path:path}"
+    return path + template
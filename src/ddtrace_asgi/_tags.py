@@ -0,0 +1,67 @@
+from typing import Any, Dict, Mapping, Optional
+
+from ddtrace.context import Context
+from ddtrace.span import Span
+
+
+class StaticTags:
+    """
+    Tags that are set on every span, processed once by `Span.set_tag()`.
+
+    The tags are set on a template span, whose `meta`, `metrics` and sampling
+    priority are kept, so that applying the tags to a span is a bulk update that
+    follows the tagging rules of the installed ddtrace release.
+    """
+
+    __slots__ = ("meta", "metrics", "sampling_priority")
+
+    def __init__(self, tags: Mapping[str, Any]) -> None:
+        template = Span(tracer=None, name="template", context=Context())
+        for key, value in tags.items():
+            template.set_tag(key, value)
+
+        self.meta: Dict[str, str] = dict(template.meta)
+        self.metrics: Dict[str, float] = dict(template.metrics)
+        self.sampling_priority: Optional[int] = template.context.sampling_priority
+
+    def apply(self, span: Span) -> None:
+        if self.meta:
+            span.meta.update(self.meta)
+        if self.metrics:
+            span.metrics.update(self.metrics)
+        if self.sampling_priority is not None:
+            span.context.sampling_priority = self.sampling_priority
+
+
+class TagBuffer:
+    """
+    Tags and metrics queued by downstream code, set on the request span once, when
+    it finishes.
+
+    Queueing is a dict assignment, so that handlers can add many tags without
+    looking up the current span nor going through `Span.set_tag()` each time.
+    """
+
+    __slots__ = ("_tags", "_metrics")
+
+    def __init__(self) -> None:
+        self._tags: Dict[str, Any] = {}
+        self._metrics: Dict[str, float] = {}
+
+    def set_tag(self, key: str, value: Any) -> None:
+        self._tags[key] = value
+
+    def set_tags(self, tags: Mapping[str, Any]) -> None:
+        self._tags.update(tags)
+
+    def set_metric(self, key: str, value: float) -> None:
+        self._metrics[key] = value
+
+    def flush(self, span: Span) -> None:
+        if self._tags:
+            span.set_tags(self._tags)
+            self._tags = {}
+        if self._metrics:
+            for key, value in self._metrics.items():
+                span.set_metric(key, value)
+            self._metrics = {}
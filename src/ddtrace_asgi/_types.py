@@ -0,0 +1,11 @@
+from typing import Any, Awaitable, Callable, MutableMapping
+
+# NOTE: same definitions as `starlette.types`, so that the middleware does not need
+# to import Starlette.
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
@@ -1,4 +1,8 @@
-from typing import Dict, Sequence
+from collections import OrderedDict
+from typing import Dict, Generic, Optional, Sequence, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
 
 
 def parse_tags_from_list(tags: Sequence[str]) -> Dict[str, str]:
@@ -9,3 +13,32 @@ def parse_tags_from_list(tags: Sequence[str]) -> Dict[str, str]:
         parsed[name] = value
 
     return parsed
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A mapping that holds at most `maxsize` items, evicting least recently used ones.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: "OrderedDict[K, V]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> Optional[V]:
+        try:
+            value = self._data[key]
+        except KeyError:
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
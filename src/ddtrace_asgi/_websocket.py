@@ -0,0 +1,94 @@
+from ddtrace.span import Span
+
+from ._compat import perf_counter_ns
+from ._histogram import Histogram
+from ._types import Message, Receive, Send
+
+QUANTILES = (("p50", 0.5), ("p99", 0.99))
+
+
+def _get_size(message: Message) -> int:
+    data = message.get("bytes")
+    if data is not None:
+        return len(data)
+    text = message.get("text")
+    if text is not None:
+        return len(text.encode("utf-8"))
+    return 0
+
+
+class WebSocketStats:
+    """
+    Wrap the ASGI `receive` and `send` callables of a websocket connection, to
+    aggregate message statistics that are recorded as metrics on the connection span.
+
+    Time spent in `receive` is recorded as a wait rather than a latency: it mostly
+    measures how long the client stayed idle before sending its next message.
+    """
+
+    __slots__ = (
+        "_receive",
+        "_send",
+        "messages_received",
+        "messages_sent",
+        "bytes_received",
+        "bytes_sent",
+        "receive_wait",
+        "send_latency",
+        "close_code",
+    )
+
+    def __init__(self, receive: Receive, send: Send) -> None:
+        self._receive = receive
+        self._send = send
+        self.messages_received = 0
+        self.messages_sent = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.receive_wait = Histogram()
+        self.send_latency = Histogram()
+        self.close_code = None
+
+    async def receive(self) -> Message:
+        start = perf_counter_ns()
+        message = await self._receive()
+        self.receive_wait.add(perf_counter_ns() - start)
+
+        message_type = message.get("type")
+        if message_type == "websocket.receive":
+            self.messages_received += 1
+            self.bytes_received += _get_size(message)
+        elif message_type == "websocket.disconnect":
+            self.close_code = message.get("code", 1000)
+
+        return message
+
+    async def send(self, message: Message) -> None:
+        start = perf_counter_ns()
+        await self._send(message)
+        self.send_latency.add(perf_counter_ns() - start)
+
+        message_type = message.get("type")
+        if message_type == "websocket.send":
+            self.messages_sent += 1
+            self.bytes_sent += _get_size(message)
+        elif message_type == "websocket.close":
+            self.close_code = message.get("code", 1000)
+
+    def record(self, span: Span) -> None:
+        span.set_metric("websocket.messages.received", self.messages_received)
+        span.set_metric("websocket.messages.sent", self.messages_sent)
+        span.set_metric("websocket.bytes.received", self.bytes_received)
+        span.set_metric("websocket.bytes.sent", self.bytes_sent)
+        if self.close_code is not None:
+            span.set_metric("websocket.close_code", self.close_code)
+
+        for name, histogram in (
+            ("receive.wait_ns", self.receive_wait),
+            ("send.latency_ns", self.send_latency),
+        ):
+            if not histogram.count:
+                continue
+            for suffix, q in QUANTILES:
+                span.set_metric(f"websocket.{name}.{suffix}", histogram.quantile(q))
+            span.set_metric(f"websocket.{name}.max", histogram.max)
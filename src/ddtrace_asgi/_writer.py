@@ -0,0 +1,229 @@
+import collections
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+from ddtrace import Tracer
+from ddtrace.api import API
+from ddtrace.span import Span
+
+logger = logging.getLogger("ddtrace_asgi")
+
+Trace = List[Span]
+
+
+class BatchedWriter:
+    """
+    A trace writer that buffers finished traces in a bounded buffer, and sends them
+    to the Datadog Agent in batches, from a background thread.
+
+    Writing a trace (which happens on the event loop, when a request span finishes)
+    is a single append. Traces are encoded and sent in bulk by the background thread,
+    every `flush_interval` seconds or as soon as `batch_size` traces are buffered.
+    When the buffer holds `capacity` traces, new traces are dropped and counted in
+    `dropped_traces`, so that memory stays bounded during traffic spikes.
+
+    In processes forked after the writer was created, the buffer and statistics are
+    reset and the background thread is started again.
+    """
+
+    def __init__(
+        self,
+        hostname: str = "localhost",
+        port: int = 8126,
+        *,
+        capacity: int = 10000,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+        filters: Optional[Sequence[Any]] = None,
+        priority_sampler: Any = None,
+    ) -> None:
+        self.api = API(hostname, port, priority_sampling=priority_sampler is not None)
+        self._capacity = capacity
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._filters = filters
+        self._priority_sampler = priority_sampler
+        self._set_rates: Optional[Callable[[Dict[str, float]], None]] = None
+        if priority_sampler is not None:
+            # NOTE: renamed in ddtrace 0.33.
+            self._set_rates = (
+                getattr(priority_sampler, "update_rate_by_service_sample_rates", None)
+                or priority_sampler.set_sample_rate_by_service
+            )
+        self._buffer: Deque[Trace] = collections.deque()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._lock = threading.Lock()
+
+        self.written_traces = 0
+        self.dropped_traces = 0
+        self.sent_traces = 0
+        self.failed_traces = 0
+
+        self._start()
+        _writers.add(self)
+
+    @classmethod
+    def install(cls, tracer: Tracer, **kwargs: Any) -> "BatchedWriter":
+        """
+        Replace the writer of `tracer`, keeping its agent address, filters and
+        priority sampler.
+        """
+        writer = tracer.writer
+        kwargs.setdefault("hostname", writer.api.hostname)
+        kwargs.setdefault("port", writer.api.port)
+        kwargs.setdefault("filters", writer._filters)
+        kwargs.setdefault("priority_sampler", writer._priority_sampler)
+        new_writer = cls(**kwargs)
+        stop = getattr(writer, "stop", None)
+        if stop is not None:
+            stop()
+        tracer.writer = new_writer
+        return new_writer
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buffered_traces": len(self._buffer),
+            "written_traces": self.written_traces,
+            "dropped_traces": self.dropped_traces,
+            "sent_traces": self.sent_traces,
+            "failed_traces": self.failed_traces,
+        }
+
+    def write(self, spans: Optional[Trace] = None, services: Any = None) -> None:
+        if not spans:
+            return
+
+        buffer = self._buffer
+        if len(buffer) >= self._capacity:
+            self.dropped_traces += 1
+            return
+
+        buffer.append(spans)
+        self.written_traces += 1
+        if len(buffer) >= self._batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """
+        Send all buffered traces, in the calling thread.
+        """
+        # NOTE: the lock only serializes flushes, writers never take it.
+        with self._lock:
+            while self._buffer:
+                batch = self._pop_batch()
+                try:
+                    self._send(batch)
+                except Exception:
+                    # NOTE: e.g. traces that cannot be encoded. The batch is lost.
+                    self.dropped_traces += len(batch)
+                    logger.exception("Failed to send traces to the Datadog Agent")
+
+    def recreate(self) -> "BatchedWriter":
+        """
+        Called by the tracer, the first time it starts a span in a forked process.
+        """
+        # NOTE: the writer was reset when the process forked already.
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background thread, after sending all buffered traces.
+        """
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="ddtrace_asgi.BatchedWriter", daemon=True
+        )
+        self._thread.start()
+
+    def _restart(self) -> None:
+        # NOTE: only the forking thread survives a fork. Traces buffered by the parent
+        # process are sent by the parent process.
+        self._buffer = collections.deque()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self.written_traces = 0
+        self.dropped_traces = 0
+        self.sent_traces = 0
+        self.failed_traces = 0
+        if not self._stopped:
+            self._start()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            self.flush()
+        self.flush()
+
+    def _update_rates(
+        self, response: Any, set_rates: Callable[[Dict[str, float]], None]
+    ) -> None:
+        # NOTE: traces were sent already, so a bad response only loses the rates.
+        try:
+            body = response.get_json()
+            if body and "rate_by_service" in body:
+                set_rates(body["rate_by_service"])
+        except Exception:
+            logger.exception("Failed to update sample rates from the Datadog Agent")
+
+    def _pop_batch(self) -> List[Trace]:
+        buffer = self._buffer
+        batch = []
+        for _ in range(min(self._batch_size, len(buffer))):
+            batch.append(buffer.popleft())
+        return batch
+
+    def _apply_filters(self, traces: List[Trace]) -> List[Trace]:
+        if not self._filters:
+            return traces
+
+        filtered = []
+        for trace in traces:
+            for trace_filter in self._filters:
+                trace = trace_filter.process_trace(trace)
+                if trace is None:
+                    break
+            if trace is not None:
+                filtered.append(trace)
+        return filtered
+
+    def _send(self, traces: List[Trace]) -> None:
+        traces = self._apply_filters(traces)
+        if not traces:
+            return
+
+        failed = False
+        for response in self.api.send_traces(traces):
+            if isinstance(response, Exception) or response.status >= 400:
+                failed = True
+                logger.error("Failed to send traces to the Datadog Agent: %r", response)
+            elif self._set_rates is not None:
+                self._update_rates(response, self._set_rates)
+
+        # NOTE: payloads of a batch are not tracked individually.
+        if failed:
+            self.failed_traces += len(traces)
+        else:
+            self.sent_traces += len(traces)
+
+
+_writers: "weakref.WeakSet[BatchedWriter]" = weakref.WeakSet()
+
+
+def _restart_at_fork() -> None:
+    for writer in _writers:
+        writer._restart()
+
+
+if hasattr(os, "register_at_fork"):  # pragma: no branch
+    # NOTE: Python 3.7+.
+    os.register_at_fork(after_in_child=_restart_at_fork)
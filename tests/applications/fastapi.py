@@ -1,11 +1,18 @@
-from typing import NoReturn, Sequence, Tuple
+from typing import AsyncIterator, NoReturn, Sequence, Tuple
 
 from ddtrace import Tracer
 from fastapi import FastAPI
 from starlette.requests import Request
-from starlette.responses import PlainTextResponse
+from starlette.responses import PlainTextResponse, StreamingResponse
 from starlette.types import ASGIApp
 
+STREAM_CHUNKS = 10
+
+
+async def stream_chunks() -> AsyncIterator[bytes]:
+    for _ in range(STREAM_CHUNKS):
+        yield b"Hello"
+
 
 def create_app(middleware: Sequence[Tuple[type, dict]]) -> ASGIApp:
     app = FastAPI()
@@ -21,6 +28,10 @@ def create_app(middleware: Sequence[Tuple[type, dict]]) -> ASGIApp:
             span.set_tag("hello", "world")
             return "Hello, child!"
 
+    @app.get("/stream/")
+    async def stream() -> StreamingResponse:
+        return StreamingResponse(stream_chunks(), media_type="text/plain")
+
     @app.get("/exception/")
     async def exception() -> NoReturn:
         raise RuntimeError("Oops")
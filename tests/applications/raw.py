@@ -3,6 +3,8 @@ from typing import Sequence, Tuple
 from ddtrace import Tracer
 from starlette.types import ASGIApp, Receive, Scope, Send
 
+STREAM_CHUNKS = 10
+
 
 async def home(scope: Scope, receive: Receive, send: Send) -> None:
     assert scope["type"] == "http"
@@ -31,6 +33,20 @@ async def child(scope: Scope, receive: Receive, send: Send) -> None:
         await send({"type": "http.response.body", "body": b"Hello, child!"})
 
 
+async def stream(scope: Scope, receive: Receive, send: Send) -> None:
+    assert scope["type"] == "http"
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [[b"content-type", b"text/plain"]],
+        }
+    )
+    for _ in range(STREAM_CHUNKS):
+        await send({"type": "http.response.body", "body": b"Hello", "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
 async def exception(scope: Scope, receive: Receive, send: Send) -> None:
     exc = RuntimeError("Oops")
     await send(
@@ -48,6 +64,8 @@ def create_app(middleware: Sequence[Tuple[type, dict]]) -> ASGIApp:
     async def app(scope: Scope, receive: Receive, send: Send) -> None:
         if scope["path"] == "/child/":
             await child(scope, receive, send)
+        elif scope["path"] == "/stream/":
+            await stream(scope, receive, send)
         elif scope["path"] == "/exception/":
             await exception(scope, receive, send)
         else:
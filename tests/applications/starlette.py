@@ -1,13 +1,15 @@
-from typing import NoReturn, Sequence, Tuple
+from typing import AsyncIterator, NoReturn, Sequence, Tuple
 
 from ddtrace import Tracer
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
 from starlette.requests import Request
-from starlette.responses import PlainTextResponse, Response
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
 from starlette.routing import Route
 from starlette.types import ASGIApp
 
+STREAM_CHUNKS = 10
+
 
 async def home(request: Request) -> Response:
     return PlainTextResponse("Hello, world!")
@@ -20,6 +22,15 @@ async def child(request: Request) -> Response:
         return PlainTextResponse("Hello, child!")
 
 
+async def stream_chunks() -> AsyncIterator[bytes]:
+    for _ in range(STREAM_CHUNKS):
+        yield b"Hello"
+
+
+async def stream(request: Request) -> Response:
+    return StreamingResponse(stream_chunks(), media_type="text/plain")
+
+
 async def exception(request: Request) -> NoReturn:
     raise RuntimeError("Oops")
 
@@ -27,6 +38,7 @@ async def exception(request: Request) -> NoReturn:
 routes = [
     Route("/", home),
     Route("/child/", child),
+    Route("/stream/", stream),
     Route("/exception/", exception),
 ]
 
@@ -0,0 +1,241 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Mount, Route
+from starlette.types import Receive, Scope, Send
+
+import ddtrace_asgi
+from ddtrace_asgi._aggregation import (
+    LatencyAggregator,
+    _reset_at_fork,
+    get_status_class,
+)
+from tests.utils.fixtures import create_app
+from tests.utils.tracer import DummyTracer
+
+Summaries = List[Dict[str, Any]]
+
+
+@pytest.mark.parametrize(
+    "status_code, error, expected",
+    [(200, False, "2xx"), (404, False, "4xx"), (503, True, "5xx")]
+    + [(None, True, "5xx"), (None, False, "unknown")],
+)
+def test_status_class(status_code: Optional[int], error: bool, expected: str) -> None:
+    assert get_status_class(status_code, error) == expected
+
+
+def test_aggregate() -> None:
+    flushed: List[Summaries] = []
+    aggregator = LatencyAggregator(flushed.append, flush_interval=60)
+
+    def work() -> None:
+        for duration in range(1, 101):
+            aggregator.record("GET /", 200, False, 0, duration * 1000)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    aggregator.record("GET /", 500, False, 0, 1000)
+    assert flushed == []
+
+    aggregator.flush(0)
+    [summaries] = flushed
+    by_key = {(s["resource"], s["status_class"]): s for s in summaries}
+    assert set(by_key) == {("GET /", "2xx"), ("GET /", "5xx")}
+
+    summary = by_key["GET /", "2xx"]
+    assert summary["count"] == 400
+    assert summary["sum_ns"] == 4 * 5050 * 1000
+    assert summary["max_ns"] == 100_000
+    assert summary["p50_ns"] == pytest.approx(50_000, rel=0.02)
+    assert summary["p90_ns"] == pytest.approx(90_000, rel=0.02)
+    assert summary["p99_ns"] == pytest.approx(99_000, rel=0.02)
+
+    # Buffers are emptied on flush.
+    aggregator.flush(0)
+    assert len(flushed) == 1
+
+
+def test_flush_interval() -> None:
+    flushed: List[Summaries] = []
+    aggregator = LatencyAggregator(flushed.append, flush_interval=0)
+    aggregator.record("GET /", 200, False, aggregator._deadline_ns, 1000)
+    aggregator.record("GET /", 200, False, aggregator._deadline_ns, 1000)
+    assert [[s["count"] for s in summaries] for summaries in flushed] == [[1], [1]]
+
+
+def test_concurrent_flush() -> None:
+    flushed: List[Summaries] = []
+    aggregator = LatencyAggregator(flushed.append)
+    aggregator.record("GET /", 200, False, 0, 1000)
+
+    with aggregator._flush_lock:
+        aggregator.flush(0)
+    assert flushed == []
+
+    aggregator.flush(0)
+    assert len(flushed) == 1
+
+
+def test_max_keys() -> None:
+    flushed: List[Summaries] = []
+    aggregator = LatencyAggregator(flushed.append, max_keys=2)
+    for path in ("/a", "/b", "/c", "/d"):
+        aggregator.record(f"GET {path}", 200, False, 0, 1000)
+    aggregator.record("GET /a", 200, False, 0, 1000)
+    aggregator.record("GET /e", 500, True, 0, 1000)
+
+    aggregator.flush(0)
+    [summaries] = flushed
+    assert [(s["resource"], s["status_class"], s["count"]) for s in summaries] == [
+        ("GET /a", "2xx", 2),
+        ("GET /b", "2xx", 1),
+        ("other", "2xx", 2),
+        ("other", "5xx", 1),
+    ]
+
+
+def test_sink_error(caplog: Any) -> None:
+    def sink(summaries: Summaries) -> None:
+        raise RuntimeError("Oops")
+
+    aggregator = LatencyAggregator(sink)
+    aggregator.record("GET /", 200, False, 0, 1000)
+    aggregator.flush(0)
+    assert "Failed to pass latency summaries to the sink" in caplog.text
+
+
+def test_reset_at_fork() -> None:
+    flushed: List[Summaries] = []
+    aggregator = LatencyAggregator(flushed.append)
+    aggregator.record("GET /", 200, False, 0, 1000)
+
+    _reset_at_fork()
+    aggregator.flush(0)
+    assert flushed == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("head_sample_rate", [None, 0])
+async def test_middleware(
+    application: str, tracer: DummyTracer, head_sample_rate: Optional[float]
+) -> None:
+    flushed: List[Summaries] = []
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {
+                    "tracer": tracer,
+                    "head_sample_rate": head_sample_rate,
+                    "latency_sink": flushed.append,
+                    "latency_flush_interval": 0,
+                },
+            )
+        ],
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/")
+        assert r.status_code == 200
+        with pytest.raises(RuntimeError):
+            await client.get("http://testserver/exception/")
+
+    summaries = [summary for summaries in flushed for summary in summaries]
+    assert [(s["resource"], s["status_class"], s["count"]) for s in summaries] == [
+        ("GET /", "2xx", 1),
+        ("GET /exception/", "5xx", 1),
+    ]
+    assert summaries[0]["max_ns"] > 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("head_sample_rate", [None, 0])
+async def test_middleware_no_response(
+    tracer: DummyTracer, head_sample_rate: Optional[float]
+) -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        raise RuntimeError("Oops")
+
+    flushed: List[Summaries] = []
+    app = ddtrace_asgi.TraceMiddleware(
+        app,
+        tracer=tracer,
+        head_sample_rate=head_sample_rate,
+        latency_sink=flushed.append,
+        latency_flush_interval=0,
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        with pytest.raises(RuntimeError):
+            await client.get("http://testserver/")
+
+    [[summary]] = flushed
+    assert summary["status_class"] == "5xx"
+
+
+@pytest.mark.asyncio
+async def test_middleware_mount(tracer: DummyTracer) -> None:
+    async def endpoint(request: Request) -> Response:
+        return PlainTextResponse("Hello, world!")
+
+    flushed: List[Summaries] = []
+    app = ddtrace_asgi.TraceMiddleware(
+        Starlette(routes=[Mount("/api", routes=[Route("/items/{item_id}", endpoint)])]),
+        tracer=tracer,
+        head_sample_rate=0,
+        latency_sink=flushed.append,
+        latency_flush_interval=0,
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/api/items/1")
+        assert r.status_code == 200
+        # Kept by the upstream service, and named from the cache.
+        headers = {
+            "x-datadog-trace-id": "1234",
+            "x-datadog-parent-id": "5678",
+            "x-datadog-sampling-priority": "2",
+        }
+        r = await client.get("http://testserver/api/items/1", headers=headers)
+        assert r.status_code == 200
+
+    summaries = [summary for summaries in flushed for summary in summaries]
+    assert {summary["resource"] for summary in summaries} == {
+        "GET /api/items/{item_id}"
+    }
+    [span] = tracer.writer.pop()
+    assert span.resource == "GET /api/items/{item_id}"
+
+
+@pytest.mark.asyncio
+async def test_middleware_sink_error(application: str, tracer: DummyTracer) -> None:
+    def sink(summaries: Summaries) -> None:
+        raise RuntimeError("Oops")
+
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {"tracer": tracer, "latency_sink": sink, "latency_flush_interval": 0},
+            )
+        ],
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/")
+        assert r.status_code == 200
+
+    [span] = tracer.writer.pop()
+    assert span.finished
+    assert tracer.current_span() is None
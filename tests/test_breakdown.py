@@ -0,0 +1,174 @@
+from typing import Any, Dict, Optional
+
+import httpx
+import pytest
+from ddtrace.context import Context
+from ddtrace.span import Span
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Mount, Route, Router
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+import ddtrace_asgi
+from ddtrace_asgi._breakdown import Breakdown
+from tests.utils.asgi import mock_http_scope, mock_receive, mock_send
+from tests.utils.tracer import DummyTracer
+
+
+def make_span() -> Span:
+    return Span(tracer=None, name="test", context=Context())
+
+
+def test_record() -> None:
+    breakdown = Breakdown(0)
+    breakdown.app_start_ns = 100
+    outer = breakdown.enter("outer")
+    inner = breakdown.enter("inner")
+    breakdown.exit(inner)
+    again = breakdown.enter("inner")
+    breakdown.exit(again)
+    breakdown.exit(outer)
+    # Left running, e.g. by a background task.
+    breakdown.enter("background")
+
+    # Use predictable timestamps.
+    outer.enter_ns, outer.exit_ns = 200, 1200
+    inner.enter_ns, inner.exit_ns = 300, 600
+    again.enter_ns, again.exit_ns = 700, 800
+
+    span = make_span()
+    breakdown.record(span)
+    assert span.metrics == {
+        "asgi.time_to_route_ns": 600,
+        "asgi.layer.outer.duration_ns": 1000,
+        "asgi.layer.outer.self_ns": 600,
+        "asgi.layer.inner.duration_ns": 400,
+        "asgi.layer.inner.self_ns": 400,
+    }
+
+
+def test_record_nothing() -> None:
+    span = make_span()
+    Breakdown(0).record(span)
+    assert span.metrics == {}
+
+
+def create_app(tracer: DummyTracer, **options: Any) -> ASGIApp:
+    async def user(request: Request) -> Response:
+        return PlainTextResponse("Hello, user!")
+
+    async def error(request: Request) -> Response:
+        raise RuntimeError("Oops")
+
+    api = Router(routes=[Route("/users/{user_id}", user), Route("/error/", error)])
+    return Starlette(
+        routes=[Mount("/api", app=ddtrace_asgi.TimingMiddleware(api, name="api"))],
+        middleware=[
+            Middleware(ddtrace_asgi.TraceMiddleware, tracer=tracer, **options),
+            Middleware(ddtrace_asgi.TimingMiddleware, name="outer"),
+        ],
+    )
+
+
+@pytest.mark.asyncio
+async def test_middleware(tracer: DummyTracer) -> None:
+    app = create_app(tracer, timing_breakdown=True)
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/api/users/42")
+        assert r.status_code == 200
+
+    spans = tracer.writer.pop()
+    assert [(span.name, span.resource) for span in spans] == [
+        ("asgi.request", "GET /api/users/{user_id}"),
+        ("asgi.layer", "outer"),
+        ("asgi.layer", "api"),
+    ]
+    request_span, outer_span, api_span = spans
+    assert outer_span.parent_id == request_span.span_id
+    assert api_span.parent_id == outer_span.span_id
+    assert request_span.start <= outer_span.start <= api_span.start
+
+    # NOTE: span timestamps are set in seconds, i.e. to within a microsecond.
+    metrics = request_span.metrics
+    assert 0 < metrics["asgi.time_to_route_ns"]
+    assert metrics["asgi.layer.outer.duration_ns"] == pytest.approx(
+        outer_span.duration_ns, abs=1000
+    )
+    assert metrics["asgi.layer.api.duration_ns"] == pytest.approx(
+        api_span.duration_ns, abs=1000
+    )
+    assert metrics["asgi.layer.outer.self_ns"] == pytest.approx(
+        outer_span.duration_ns - api_span.duration_ns, abs=2000
+    )
+    assert metrics["asgi.layer.api.self_ns"] == pytest.approx(
+        api_span.duration_ns, abs=1000
+    )
+
+
+@pytest.mark.asyncio
+async def test_exception(tracer: DummyTracer) -> None:
+    app = create_app(tracer, timing_breakdown=True)
+
+    async with httpx.AsyncClient(app=app) as client:
+        with pytest.raises(RuntimeError):
+            await client.get("http://testserver/api/error/")
+
+    spans = tracer.writer.pop()
+    assert [span.resource for span in spans] == ["GET /api/error/", "outer", "api"]
+    assert spans[0].error
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options, headers",
+    [
+        # Dropped by tail-based sampling.
+        ({"tail_sample_rate": 0}, {}),
+        # Rejected upstream.
+        ({}, {"x-datadog-trace-id": "1234", "x-datadog-sampling-priority": "0"}),
+    ],
+)
+async def test_dropped(
+    tracer: DummyTracer, options: Dict[str, Any], headers: Dict[str, str]
+) -> None:
+    app = create_app(tracer, timing_breakdown=True, **options)
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/api/users/42", headers=headers)
+        assert r.status_code == 200
+
+    # No layer span was created.
+    spans = tracer.writer.pop()
+    assert [span.name for span in spans] in ([], ["asgi.request"])
+    for span in spans:
+        assert "asgi.layer.api.duration_ns" in span.metrics
+
+
+@pytest.mark.asyncio
+async def test_disabled(tracer: DummyTracer) -> None:
+    app = create_app(tracer)
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/api/users/42")
+        assert r.status_code == 200
+
+    [span] = tracer.writer.pop()
+    assert not any(key.startswith("asgi.layer.") for key in span.metrics)
+
+
+@pytest.mark.asyncio
+async def test_standalone() -> None:
+    received: Optional[Scope] = None
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        nonlocal received
+        received = scope
+
+    scope = dict(mock_http_scope)
+    wrapper = ddtrace_asgi.TimingMiddleware(app, name="app")
+    await wrapper(scope, mock_receive, mock_send)
+    assert received is scope
+    assert wrapper.routes is None
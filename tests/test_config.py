@@ -0,0 +1,106 @@
+import time
+
+import httpx
+import pytest
+from ddtrace import config
+from ddtrace.constants import ANALYTICS_SAMPLE_RATE_KEY
+from ddtrace.ext import http as http_ext
+from ddtrace.span import Span
+from starlette.types import ASGIApp
+
+import ddtrace_asgi
+from ddtrace_asgi._config import ConfigSnapshot, get_whitelist
+from tests.utils.config import override_config, override_http_config
+from tests.utils.fixtures import create_app
+from tests.utils.tracer import DummyTracer
+
+
+def test_snapshot() -> None:
+    with override_config("asgi", trace_query_string=True, analytics_enabled=True):
+        with override_http_config("asgi", trace_headers=["x-request-id"]):
+            snapshot = ConfigSnapshot(config.asgi, "test", {"env": "testing"})
+
+    assert snapshot.trace_query_string
+    assert snapshot.service == "test"
+    assert snapshot.tags.meta == {"env": "testing"}
+    assert snapshot.tags.metrics == {ANALYTICS_SAMPLE_RATE_KEY: 1.0}
+
+    span = Span(tracer=None, name="test")
+    snapshot.headers.store_request_headers([(b"x-request-id", b"abc123")], span)
+    assert span.meta == {"http.request.headers.x-request-id": "abc123"}
+
+    assert snapshot.is_stale(config.asgi)
+    assert not ConfigSnapshot(config.asgi, "test", {}).is_stale(config.asgi)
+
+
+def test_global_whitelist() -> None:
+    whitelist = config._http._whitelist_headers
+    original = set(whitelist)
+    config.trace_headers(["content-type"])
+    try:
+        assert get_whitelist(config.asgi) == {"content-type"}
+
+        # Integration whitelist takes precedence.
+        with override_http_config("asgi", trace_headers=["x-request-id"]):
+            assert get_whitelist(config.asgi) == {"x-request-id"}
+    finally:
+        whitelist.clear()
+        whitelist.update(original)
+
+
+async def get_span(app: ASGIApp, tracer: DummyTracer) -> Span:
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/?foo=bar")
+    assert r.status_code == 200
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    [span] = traces[0]
+    return span
+
+
+@pytest.mark.asyncio
+async def test_reload_config(tracer: DummyTracer) -> None:
+    app = ddtrace_asgi.TraceMiddleware(
+        create_app("raw"), tracer=tracer, config_check_interval=None
+    )
+
+    with override_config("asgi", trace_query_string=True, analytics_enabled=True):
+        # Settings changes go unnoticed...
+        span = await get_span(app, tracer)
+        assert span.get_tag(http_ext.QUERY_STRING) is None
+        assert span.get_metric(ANALYTICS_SAMPLE_RATE_KEY) is None
+
+        # ...until settings are reloaded.
+        app.service = "reloaded"
+        app.reload_config()
+        span = await get_span(app, tracer)
+        assert span.service == "reloaded"
+        assert span.get_tag(http_ext.QUERY_STRING) == "foo=bar"
+        assert span.get_metric(ANALYTICS_SAMPLE_RATE_KEY) == 1.0
+
+
+@pytest.mark.asyncio
+async def test_config_check_interval(tracer: DummyTracer) -> None:
+    app = create_app(
+        "raw",
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {"tracer": tracer, "config_check_interval": 0.01},
+            )
+        ],
+    )
+
+    span = await get_span(app, tracer)
+    assert span.get_tag(http_ext.QUERY_STRING) is None
+
+    with override_config("asgi", trace_query_string=True):
+        time.sleep(0.01)
+        span = await get_span(app, tracer)
+        assert span.get_tag(http_ext.QUERY_STRING) == "foo=bar"
+
+        # No changes.
+        time.sleep(0.01)
+        span = await get_span(app, tracer)
+        assert span.get_tag(http_ext.QUERY_STRING) == "foo=bar"
@@ -0,0 +1,119 @@
+import asyncio
+import random
+from typing import Dict, List
+
+import pytest
+from ddtrace import Tracer
+from ddtrace.context import Context
+from ddtrace.span import Span
+from starlette.types import Message, Receive, Scope, Send
+
+import ddtrace_asgi
+from ddtrace_asgi._context import get_request_context
+from tests.utils.asgi import mock_receive
+from tests.utils.tracer import DummyTracer
+
+REQUESTS = 2000
+
+
+def make_scope(request_id: int, distributed: bool) -> Scope:
+    headers = [(b"x-request-id", str(request_id).encode())]
+    if distributed:
+        headers += [
+            (b"x-datadog-trace-id", str(request_id + 1).encode()),
+            (b"x-datadog-parent-id", b"42"),
+        ]
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": f"/{request_id}",
+        "query_string": b"",
+        "headers": headers,
+    }
+
+
+async def send(message: Message) -> None:
+    await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests(tracer: DummyTracer) -> None:
+    background: List[asyncio.Task] = []
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        tracer: Tracer = scope["ddtrace_asgi.tracer"]
+        request_id = dict(scope["headers"])[b"x-request-id"].decode()
+
+        for _ in range(random.randint(0, 3)):
+            await asyncio.sleep(0)
+            with tracer.trace("handler") as span:
+                span.set_tag("request_id", request_id)
+                await asyncio.sleep(0)
+
+        # Outlives the request.
+        async def task(span: Span) -> None:
+            with span:
+                await asyncio.sleep(random.random() / 100)
+
+        span = tracer.start_span("background", child_of=scope["ddtrace_asgi.context"])
+        span.set_tag("request_id", request_id)
+        background.append(asyncio.ensure_future(task(span)))
+
+        await send({"type": "http.response.start", "status": 200})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = ddtrace_asgi.TraceMiddleware(app, tracer=tracer)
+
+    async def client(index: int) -> None:
+        # Sequential requests in the same task must not leak into each other.
+        for request_id in (2 * index, 2 * index + 1):
+            await app(make_scope(request_id, request_id % 2 == 0), mock_receive, send)
+        assert get_request_context() is None
+        assert tracer.current_span() is None
+
+    await asyncio.gather(*(client(index) for index in range(REQUESTS // 2)))
+    await asyncio.gather(*background)
+
+    spans = tracer.writer.pop()
+    requests: Dict[str, Span] = {
+        span.resource.split("/")[-1]: span
+        for span in spans
+        if span.name == "asgi.request"
+    }
+    assert len(requests) == REQUESTS
+
+    for request_id, span in requests.items():
+        if int(request_id) % 2 == 0:
+            assert span.trace_id == int(request_id) + 1
+            assert span.parent_id == 42
+        else:
+            assert span.parent_id is None
+
+    children = [span for span in spans if span.name != "asgi.request"]
+    assert len(children) >= REQUESTS
+    for child in children:
+        parent = requests[child.get_tag("request_id")]
+        assert child.parent_id == parent.span_id
+        assert child.trace_id == parent.trace_id
+
+
+@pytest.mark.asyncio
+async def test_nested_middleware(tracer: DummyTracer) -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": 200})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = ddtrace_asgi.TraceMiddleware(app, tracer=tracer, service="inner")
+    app = ddtrace_asgi.TraceMiddleware(app, tracer=tracer, service="outer")
+
+    # A stale context must not be picked up.
+    tracer.context_provider.activate(Context(trace_id=1, span_id=2))
+
+    await app(make_scope(0, distributed=False), mock_receive, send)
+
+    spans = {span.service: span for span in tracer.writer.pop()}
+    assert spans["outer"].parent_id is None
+    assert spans["inner"].parent_id == spans["outer"].span_id
+    assert spans["inner"].trace_id == spans["outer"].trace_id
+    assert tracer.context_provider.active().trace_id == 1
+    tracer.context_provider.activate(None)
@@ -1,6 +1,8 @@
 import pytest
+from starlette.datastructures import CommaSeparatedStrings
 
 import ddtrace_asgi
+from ddtrace_asgi._utils import parse_tags_from_list
 
 from .utils.fixtures import create_app
 
@@ -17,3 +19,13 @@ def test_deprecated_string_tags(tags: str) -> None:
 def test_deprecated_middleware_module() -> None:
     with pytest.deprecated_call():
         from ddtrace_asgi.middleware import TraceMiddleware  # noqa
+
+
+@pytest.mark.parametrize(
+    "tags", ["env:testing", "env:testing, version:1.0", "'note:a, b',env:testing", ""]
+)
+def test_deprecated_string_tags_parsing(tags: str) -> None:
+    app = create_app("raw")
+    with pytest.deprecated_call():
+        middleware = ddtrace_asgi.TraceMiddleware(app, tags=tags)
+    assert middleware.tags == parse_tags_from_list(CommaSeparatedStrings(tags))
@@ -0,0 +1,202 @@
+from typing import Callable, Dict, List
+
+import httpx
+import pytest
+from ddtrace.context import Context
+from ddtrace.span import Span
+
+import ddtrace_asgi
+from ddtrace_asgi._errors import ErrorCapture, get_fingerprint
+from tests.utils.fixtures import create_app
+from tests.utils.tracer import DummyTracer
+
+
+def make_span() -> Span:
+    return Span(tracer=None, name="test", context=Context())
+
+
+def fail(message: str) -> None:
+    raise RuntimeError(message)
+
+
+def fail_elsewhere(message: str) -> None:
+    raise RuntimeError(message)
+
+
+def catch(func: Callable[[str], None], message: str = "Oops") -> Exception:
+    try:
+        func(message)
+    except Exception as exc:
+        return exc
+    raise AssertionError("Did not raise")  # pragma: no cover
+
+
+def reraise(message: str) -> None:
+    try:
+        fail(message)
+    except RuntimeError as exc:
+        raise ValueError(message) from exc
+
+
+def reraise_in_handler(message: str) -> None:
+    try:
+        fail(message)
+    except RuntimeError:
+        raise ValueError(message)
+
+
+def raise_from_new(message: str) -> None:
+    # NOTE: the cause was never raised, hence has no traceback.
+    raise ValueError(message) from KeyError(message)
+
+
+def reraise_suppressed(message: str) -> None:
+    try:
+        fail(message)
+    except RuntimeError:
+        raise ValueError(message) from None
+
+
+def test_fingerprint() -> None:
+    assert get_fingerprint(catch(fail, "a")) == get_fingerprint(catch(fail, "b"))
+    assert get_fingerprint(catch(fail)) != get_fingerprint(catch(fail_elsewhere))
+
+    fingerprints = {
+        get_fingerprint(catch(func))
+        for func in (fail, reraise, reraise_in_handler, reraise_suppressed)
+    }
+    assert len(fingerprints) == 4
+    # Suppressed contexts are ignored.
+    assert len(get_fingerprint(catch(reraise_suppressed))) < len(
+        get_fingerprint(catch(reraise))
+    )
+
+
+def test_fingerprint_cycle() -> None:
+    exc = catch(reraise_in_handler)
+    assert exc.__context__ is not None
+    exc.__context__.__context__ = exc
+    assert get_fingerprint(exc)
+
+
+@pytest.mark.parametrize(
+    "func", [fail, reraise, reraise_in_handler, reraise_suppressed, raise_from_new]
+)
+@pytest.mark.parametrize("cache_size", [0, 256])
+def test_same_as_set_exc_info(func: Callable[[str], None], cache_size: int) -> None:
+    capture = ErrorCapture(cache_size)
+
+    for message in ("first", "second"):
+        exc = catch(func, message)
+        expected = make_span()
+        expected.set_exc_info(type(exc), exc, exc.__traceback__)
+        span = make_span()
+        capture.capture(span, exc, 0)
+
+        assert span.error == 1
+        fingerprint = span.meta.pop("error.fingerprint")
+        assert len(fingerprint) == 16
+        assert span.meta == expected.meta
+
+
+def test_chained_messages() -> None:
+    def lookup(name: str) -> None:
+        users: Dict[str, str] = {}
+        try:
+            users[name]
+        except KeyError as exc:
+            raise RuntimeError("Lookup failed") from exc
+
+    capture = ErrorCapture()
+    first, second = make_span(), make_span()
+    capture.capture(first, catch(lookup, "alice"), 0)
+    capture.capture(second, catch(lookup, "bob"), 0)
+
+    assert first.meta["error.fingerprint"] == second.meta["error.fingerprint"]
+    assert "KeyError: 'alice'" in first.meta["error.stack"]
+    assert "KeyError: 'bob'" in second.meta["error.stack"]
+    assert "alice" not in second.meta["error.stack"]
+
+
+def test_cycle() -> None:
+    exc = catch(reraise_in_handler)
+    assert exc.__context__ is not None
+    exc.__context__.__context__ = exc
+
+    expected = make_span()
+    expected.set_exc_info(type(exc), exc, exc.__traceback__)
+    span = make_span()
+    ErrorCapture().capture(span, exc, 0)
+    assert span.meta["error.stack"] == expected.meta["error.stack"]
+
+
+def test_fingerprint_tag() -> None:
+    capture = ErrorCapture()
+    first, second, other = make_span(), make_span(), make_span()
+    capture.capture(first, catch(fail, "a"), 0)
+    capture.capture(second, catch(fail, "b"), 0)
+    capture.capture(other, catch(fail_elsewhere), 0)
+    assert first.meta["error.fingerprint"] == second.meta["error.fingerprint"]
+    assert first.meta["error.fingerprint"] != other.meta["error.fingerprint"]
+    # Stable across caches, hence across processes.
+    span = make_span()
+    ErrorCapture().capture(span, catch(fail), 0)
+    assert span.meta["error.fingerprint"] == first.meta["error.fingerprint"]
+
+
+def test_stack_rate() -> None:
+    capture = ErrorCapture(stack_rate=1)
+    spans: List[Span] = []
+    for now_ns in (0, 0, 0, 1_000_000_000, 1_000_000_000):
+        span = make_span()
+        capture.capture(span, catch(fail), now_ns)
+        spans.append(span)
+
+    assert ["error.stack" in span.meta for span in spans] == [
+        True,
+        False,
+        False,
+        True,
+        False,
+    ]
+    for span in spans:
+        assert span.error == 1
+        assert span.meta["error.type"] == "builtins.RuntimeError"
+        assert span.meta["error.msg"] == "Oops"
+    assert [span.metrics.get("error.suppressed_duplicates") for span in spans] == [
+        None,
+        None,
+        None,
+        2,
+        None,
+    ]
+
+    # Rates apply per fingerprint.
+    span = make_span()
+    capture.capture(span, catch(fail_elsewhere), 0)
+    assert "error.stack" in span.meta
+
+
+@pytest.mark.asyncio
+async def test_middleware(application: str, tracer: DummyTracer) -> None:
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {"tracer": tracer, "error_stack_rate": 0.001},
+            )
+        ],
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await client.get("http://testserver/exception/")
+
+    first, second = [trace[0] for trace in tracer.writer.pop_traces()]
+    assert first.error == second.error == 1
+    assert first.meta["error.msg"] == second.meta["error.msg"] == "Oops"
+    assert first.meta["error.fingerprint"] == second.meta["error.fingerprint"]
+    assert "RuntimeError: Oops" in first.meta["error.stack"]
+    assert "error.stack" not in second.meta
@@ -0,0 +1,87 @@
+import re
+
+import httpx
+import pytest
+from starlette.types import Receive, Scope, Send
+
+import ddtrace_asgi
+from ddtrace_asgi._exclusion import Exclusion
+from tests.utils.fixtures import create_app
+from tests.utils.tracer import DummyTracer
+
+
+@pytest.mark.parametrize(
+    "method, path, excluded",
+    [
+        ("GET", "/health", True),
+        ("GET", "/health/", False),
+        ("GET", "/static/css/main.css", True),
+        ("GET", "/static", False),
+        ("GET", "/users/42/avatar", True),
+        ("GET", "/users/42/profile", False),
+        ("GET", "/metrics", True),
+        ("GET", "/METRICS/json", True),
+        ("GET", "/v2/metrics", False),
+        ("OPTIONS", "/users", True),
+        ("GET", "/users", False),
+    ],
+)
+def test_exclusion(method: str, path: str, excluded: bool) -> None:
+    exclusion = Exclusion(
+        paths=[
+            "/health",
+            "/static/*",
+            "/users/*/avatar",
+            re.compile(r"/metrics(/.*)?$", re.IGNORECASE),
+        ],
+        methods=["options"],
+    )
+    assert exclusion
+    assert exclusion(method, path) is excluded
+
+
+def test_empty() -> None:
+    assert not Exclusion()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options",
+    [{"exclude": ["/child/"]}, {"exclude": ["/ch*"]}, {"exclude_methods": ["GET"]}],
+)
+async def test_excluded_requests(
+    application: str, tracer: DummyTracer, options: dict
+) -> None:
+    app = create_app(
+        application,
+        middleware=[(ddtrace_asgi.TraceMiddleware, {"tracer": tracer, **options})],
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/child/")
+
+    assert r.status_code == 200
+    assert r.text == "Hello, child!"
+
+    # Only the span created by the endpoint is sent.
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    assert [span.name for span in traces[0]] == ["asgi.request.child"]
+
+
+@pytest.mark.asyncio
+async def test_excluded_scope(tracer: DummyTracer) -> None:
+    async def health(scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["ddtrace_asgi.span"] is None
+        assert scope["ddtrace_asgi.context"] is None
+        scope["ddtrace_asgi.tags"].set_tag("health", "ok")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = ddtrace_asgi.TraceMiddleware(health, tracer=tracer, exclude=["/health"])
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/health")
+
+    assert r.status_code == 200
+    assert tracer.writer.pop_traces() == []
@@ -0,0 +1,198 @@
+import asyncio
+import time
+from typing import List, Optional
+
+import httpx
+import pytest
+from ddtrace.context import Context
+from ddtrace.span import Span
+from starlette.types import Receive, Scope, Send
+
+import ddtrace_asgi
+from ddtrace_asgi._governor import (
+    LEVEL_FULL,
+    LEVEL_NO_HEADERS,
+    LEVEL_NO_URL,
+    LEVEL_OFF,
+    LEVEL_SAMPLED,
+    Governor,
+)
+from ddtrace_asgi._lag import LoopLagMonitor
+from tests.utils.config import override_http_config
+from tests.utils.fixtures import create_app
+from tests.utils.tracer import DummyTracer
+
+
+@pytest.mark.asyncio
+async def test_lag_monitor() -> None:
+    monitor = LoopLagMonitor(interval=0.01)
+    assert not monitor.running
+    monitor.start()
+    monitor.start()
+    assert monitor.running
+    assert not monitor.sampled
+
+    await asyncio.sleep(0.02)
+    assert monitor.sampled
+    assert monitor.lag_ns < 50_000_000
+    time.sleep(0.05)  # Block the event loop.
+    await asyncio.sleep(0.001)
+    assert monitor.lag_ns > 20_000_000
+
+    monitor.stop()
+    monitor.stop()
+    assert not monitor.running
+    assert not monitor.sampled
+
+
+def test_levels() -> None:
+    monitor = LoopLagMonitor()
+    governor = Governor(monitor, lag_threshold=0.01, overhead_threshold=0.1)
+    governor._last_update_ns = 0
+    levels: List[int] = []
+
+    def update(lag_ms: float, overhead: float = 0) -> None:
+        # Updates happen every second.
+        monitor.lag_ns = int(lag_ms * 1e6)
+        governor.record(int(overhead * 0.4e9))
+        governor.record(int(overhead * 0.6e9))
+        governor.update((len(levels) + 1) * 1_000_000_000)
+        levels.append(governor.level)
+
+    for _ in range(5):
+        update(lag_ms=20)
+    # Between thresholds: stay put.
+    update(lag_ms=8, overhead=0.08)
+    update(lag_ms=1, overhead=0.08)
+    # Relieved.
+    update(lag_ms=1, overhead=0.01)
+    update(lag_ms=1)
+    # Overhead alone.
+    update(lag_ms=1, overhead=0.15)
+    for _ in range(5):
+        update(lag_ms=1)
+
+    assert levels == [
+        LEVEL_NO_HEADERS,
+        LEVEL_NO_URL,
+        LEVEL_SAMPLED,
+        LEVEL_OFF,
+        LEVEL_OFF,
+        LEVEL_OFF,
+        LEVEL_OFF,
+        LEVEL_SAMPLED,
+        LEVEL_NO_URL,
+        LEVEL_SAMPLED,
+        LEVEL_NO_URL,
+        LEVEL_NO_HEADERS,
+        LEVEL_FULL,
+        LEVEL_FULL,
+        LEVEL_FULL,
+    ]
+
+
+def test_sample() -> None:
+    assert Governor(None, sample_rate=1).sample(0.5, None) == 0.5
+    assert Governor(None, sample_rate=0).sample(0.5, None) == 0
+    # Upstream sampling decisions are kept.
+    context = Context(trace_id=1234, sampling_priority=0)
+    assert Governor(None, sample_rate=0).sample(0.5, context) == 0.5
+
+    with pytest.raises(ValueError):
+        Governor(None, sample_rate=2)
+
+
+async def get(app: ddtrace_asgi.TraceMiddleware, tracer: DummyTracer) -> Optional[Span]:
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/?q=1", headers={"x-request-id": "1234"})
+        assert r.status_code == 200
+    spans = tracer.writer.pop()
+    return spans[0] if spans else None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("level", range(LEVEL_OFF + 1))
+async def test_middleware_levels(tracer: DummyTracer, level: int) -> None:
+    app = ddtrace_asgi.TraceMiddleware(
+        create_app("raw"),
+        tracer=tracer,
+        governor_overhead_threshold=1,
+        governor_sample_rate=0,
+    )
+    assert app._governor is not None
+    app._governor.level = level
+    app._governor.deadline_ns = 2**63
+
+    with override_http_config("asgi", ["x-request-id", "content-type"]):
+        app.reload_config()
+        span = await get(app, tracer)
+
+    if level >= LEVEL_SAMPLED:
+        assert span is None
+        return
+
+    assert span is not None
+    level_names = ["full", "no_headers", "no_url"]
+    assert span.get_tag("asgi.governor.level") == level_names[level]
+    assert span.get_tag("http.method") == "GET"
+    assert (span.get_tag("http.url") is not None) == (level < LEVEL_NO_URL)
+    assert (span.get_tag("http.request.headers.x-request-id") is not None) == (
+        level < LEVEL_NO_HEADERS
+    )
+    assert (span.get_tag("http.response.headers.content-type") is not None) == (
+        level < LEVEL_NO_HEADERS
+    )
+
+
+@pytest.mark.asyncio
+async def test_middleware(tracer: DummyTracer) -> None:
+    app = ddtrace_asgi.TraceMiddleware(
+        create_app("raw"),
+        tracer=tracer,
+        governor_lag_threshold=10,
+        governor_overhead_threshold=1e-9,
+        governor_interval=0,
+        governor_sample_rate=1,
+    )
+    assert app._governor is not None
+    assert app._lag_monitor is not None
+
+    try:
+        levels = []
+        for _ in range(6):
+            span = await get(app, tracer)
+            levels.append(span.get_tag("asgi.governor.level") if span else None)
+        # Nothing is measured while requests are passed through.
+        assert levels == ["full", "no_headers", "no_url", "sampled", None, "sampled"]
+        assert app._lag_monitor.running
+
+        # Load falls.
+        # NOTE: overhead is a fraction of the time elapsed since the last update, which
+        # is mostly spent in the middleware itself here.
+        app._governor._overhead_threshold = 10
+        levels = []
+        for _ in range(3):
+            span = await get(app, tracer)
+            levels.append(span.get_tag("asgi.governor.level") if span else None)
+        assert levels == ["no_url", "no_headers", "full"]
+    finally:
+        app._lag_monitor.stop()
+
+
+@pytest.mark.asyncio
+async def test_off_scope(tracer: DummyTracer) -> None:
+    async def handler(scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["ddtrace_asgi.span"] is None
+        assert scope["ddtrace_asgi.context"] is None
+        scope["ddtrace_asgi.tags"].set_tag("hello", "world")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = ddtrace_asgi.TraceMiddleware(
+        handler, tracer=tracer, governor_overhead_threshold=1
+    )
+    assert app._governor is not None
+    app._governor.level = LEVEL_OFF
+    app._governor.deadline_ns = 2**63
+
+    assert await get(app, tracer) is None
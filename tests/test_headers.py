@@ -0,0 +1,26 @@
+from ddtrace.span import Span
+
+from ddtrace_asgi._headers import HeaderCapture
+
+raw_headers = [(b"x-request-id", b"abc123"), (b"content-type", b"text/plain")]
+
+
+def test_store_headers() -> None:
+    headers = HeaderCapture({"x-request-id"})
+
+    span = Span(tracer=None, name="test")
+    headers.store_request_headers(raw_headers, span)
+    headers.store_response_headers(raw_headers, span)
+    assert span.meta == {
+        "http.request.headers.x-request-id": "abc123",
+        "http.response.headers.x-request-id": "abc123",
+    }
+
+
+def test_empty_whitelist() -> None:
+    headers = HeaderCapture(set())
+
+    span = Span(tracer=None, name="test")
+    headers.store_request_headers(raw_headers, span)
+    headers.store_response_headers(raw_headers, span)
+    assert span.meta == {}
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from ddtrace_asgi._histogram import Histogram
+
+
+def test_quantiles() -> None:
+    rng = random.Random(42)
+    values = sorted(rng.lognormvariate(10, 1) for _ in range(10000))
+
+    histogram = Histogram(relative_accuracy=0.01)
+    for value in values:
+        histogram.add(value)
+
+    assert histogram.count == len(values)
+    assert histogram.sum == pytest.approx(sum(values))
+    assert histogram.max == values[-1]
+    for q in 0.5, 0.9, 0.99:
+        expected = values[int(q * (len(values) - 1))]
+        assert histogram.quantile(q) == pytest.approx(expected, rel=0.02)
+
+
+def test_empty() -> None:
+    assert Histogram().quantile(0.5) == 0
+
+
+def test_small_values() -> None:
+    histogram = Histogram()
+    histogram.add(0)
+    histogram.add(0.5)
+    histogram.add(1000)
+    assert histogram.quantile(0.5) == 0
+    assert histogram.quantile(1) == pytest.approx(1000, rel=0.01)
+
+
+def test_max_buckets() -> None:
+    histogram = Histogram(max_buckets=8)
+    for value in range(1, 1001):
+        histogram.add(value)
+    assert len(histogram._buckets) == 8
+    assert histogram.quantile(0.99) == pytest.approx(990, rel=0.01)
+
+
+def test_merge() -> None:
+    a = Histogram(max_buckets=8)
+    b = Histogram(max_buckets=8)
+    for value in range(1, 501):
+        a.add(value)
+    for value in range(501, 1001):
+        b.add(value)
+
+    a.merge(b)
+    assert a.count == 1000
+    assert a.max == 1000
+    assert len(a._buckets) == 8
+    assert a.quantile(0.99) == pytest.approx(990, rel=0.01)
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+
+
+def test_no_starlette_import() -> None:
+    # Run in a fresh interpreter: Starlette is already imported by the test suite.
+    code = (
+        "import asyncio\n"
+        "import sys\n"
+        "import ddtrace_asgi\n"
+        "from ddtrace_asgi import TraceMiddleware\n"
+        "from tests.utils.tracer import DummyTracer\n"
+        "async def app(scope, receive, send):\n"
+        "    await send({'type': 'http.response.start', 'status': 200})\n"
+        "    await send({'type': 'http.response.body', 'body': b''})\n"
+        "async def send(message):\n"
+        "    pass\n"
+        "tracer = DummyTracer()\n"
+        "middleware = TraceMiddleware(app, tracer=tracer)\n"
+        "scope = {'type': 'http', 'method': 'GET', 'path': '/', 'headers': []}\n"
+        "asyncio.get_event_loop().run_until_complete(middleware(scope, None, send))\n"
+        "[[span]] = tracer.writer.pop_traces()\n"
+        "assert span.resource == 'GET /', span.resource\n"
+        "imported = [name for name in sys.modules if name.startswith('starlette')]\n"
+        "assert not imported, imported\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,148 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
+import pytest
+from starlette.types import Message, Receive, Scope, Send
+
+import ddtrace_asgi
+from tests.utils.asgi import mock_send
+from tests.utils.tracer import DummyTracer
+
+
+@pytest.mark.asyncio
+async def test_lifespan(tracer: DummyTracer) -> None:
+    running: List[bool] = []
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "lifespan"
+        while True:
+            message = await receive()
+            assert middleware._lag_monitor is not None
+            running.append(middleware._lag_monitor.running)
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            else:
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    middleware = ddtrace_asgi.TraceMiddleware(app, tracer=tracer, load_metrics=True)
+    assert middleware._lag_monitor is not None
+    messages: "asyncio.Queue[Message]" = asyncio.Queue()
+    await messages.put({"type": "lifespan.startup"})
+    await messages.put({"type": "lifespan.shutdown"})
+
+    await middleware({"type": "lifespan"}, messages.get, mock_send)
+    assert running == [True, False]
+    assert not middleware._lag_monitor.running
+
+
+@pytest.mark.asyncio
+async def test_lifespan_failed(tracer: DummyTracer) -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await receive()
+        raise RuntimeError("Oops")
+
+    async def receive() -> Message:
+        return {"type": "lifespan.startup"}
+
+    middleware = ddtrace_asgi.TraceMiddleware(app, tracer=tracer, load_metrics=True)
+    assert middleware._lag_monitor is not None
+    with pytest.raises(RuntimeError):
+        await middleware({"type": "lifespan"}, receive, mock_send)
+    assert not middleware._lag_monitor.running
+
+
+@pytest.mark.asyncio
+async def test_lifespan_no_monitor(tracer: DummyTracer) -> None:
+    received: List[Receive] = []
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        received.append(receive)
+
+    async def receive() -> Message:
+        raise NotImplementedError  # pragma: no cover
+
+    middleware = ddtrace_asgi.TraceMiddleware(app, tracer=tracer)
+    assert middleware._lag_monitor is None
+    await middleware({"type": "lifespan"}, receive, mock_send)
+    assert received == [receive]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"head_sample_rate": 0},
+        {"head_sample_rate": 0, "latency_sink": lambda summaries: None},
+    ],
+)
+async def test_inflight_requests(tracer: DummyTracer, options: Dict[str, Any]) -> None:
+    release = asyncio.Event()
+    inflight: List[int] = []
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        inflight.append(middleware._inflight)
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = ddtrace_asgi.TraceMiddleware(
+        app, tracer=tracer, load_metrics=True, **options
+    )
+
+    async with httpx.AsyncClient(app=middleware) as client:
+        requests = [
+            asyncio.ensure_future(client.get("http://testserver/")) for _ in range(3)
+        ]
+        while len(inflight) < 3:
+            await asyncio.sleep(0)
+        release.set()
+        for response in await asyncio.gather(*requests):
+            assert response.status_code == 200
+
+    assert inflight == [1, 2, 3]
+    assert middleware._inflight == 0
+
+    spans = tracer.writer.pop()
+    if not options:
+        metrics = [span.metrics["asgi.inflight_requests"] for span in spans]
+        assert metrics == [1, 2, 3]
+    else:
+        assert spans == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("lifespan", [False, True])
+async def test_loop_lag(tracer: DummyTracer, lifespan: bool) -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = ddtrace_asgi.TraceMiddleware(app, tracer=tracer, load_metrics=True)
+    monitor = middleware._lag_monitor
+    assert monitor is not None
+    monitor._interval = 0.01
+    if lifespan:
+        monitor.start()
+
+    lags: List[Optional[float]] = []
+    try:
+        async with httpx.AsyncClient(app=middleware) as client:
+            for _ in range(2):
+                r = await client.get("http://testserver/")
+                assert r.status_code == 200
+                [span] = tracer.writer.pop()
+                assert span.metrics["asgi.inflight_requests"] == 1
+                lags.append(span.metrics.get("asgi.loop_lag_ns"))
+                await asyncio.sleep(0.02)
+        # Without lifespan, sampling starts on the first request.
+        assert monitor.running
+    finally:
+        monitor.stop()
+
+    # Nothing was sampled yet when the first request finished.
+    first, second = lags
+    assert first is None
+    assert second is not None and second >= 0
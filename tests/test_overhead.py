@@ -0,0 +1,64 @@
+import httpx
+import pytest
+
+import ddtrace_asgi
+from ddtrace_asgi._overhead import OverheadCounter
+from tests.utils.fixtures import create_app
+from tests.utils.tracer import DummyTracer
+
+
+def test_counter() -> None:
+    counter = OverheadCounter()
+    assert counter.get_stats() == {"requests": 0, "pre_app_ns": 0, "post_app_ns": 0}
+
+    counter.add(1000, 200)
+    counter.add(3000, 400)
+    assert counter.get_stats() == {
+        "requests": 2,
+        "pre_app_ns": 4000,
+        "post_app_ns": 600,
+    }
+
+    counter._reset()
+    assert counter.get_stats() == {"requests": 0, "pre_app_ns": 0, "post_app_ns": 0}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("measure_overhead", [False, True])
+async def test_middleware(
+    application: str, tracer: DummyTracer, measure_overhead: bool
+) -> None:
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {"tracer": tracer, "measure_overhead": measure_overhead},
+            )
+        ],
+    )
+
+    before = ddtrace_asgi.get_overhead_stats()
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/")
+        assert r.status_code == 200
+        with pytest.raises(RuntimeError):
+            await client.get("http://testserver/exception/")
+    after = ddtrace_asgi.get_overhead_stats()
+
+    spans = [trace[0] for trace in tracer.writer.pop_traces()]
+    assert len(spans) == 2
+
+    if not measure_overhead:
+        assert after == before
+        for span in spans:
+            assert "asgi.overhead.pre_app_ns" not in span.metrics
+            assert "asgi.overhead.post_app_ns" not in span.metrics
+        return
+
+    assert after["requests"] == before["requests"] + 2
+    pre_app_ns = sum(span.metrics["asgi.overhead.pre_app_ns"] for span in spans)
+    post_app_ns = sum(span.metrics["asgi.overhead.post_app_ns"] for span in spans)
+    assert 0 < pre_app_ns == after["pre_app_ns"] - before["pre_app_ns"]
+    # The process-wide totals also count the time spent finishing spans.
+    assert 0 < post_app_ns < after["post_app_ns"] - before["post_app_ns"]
@@ -0,0 +1,214 @@
+from typing import List, Optional, Tuple
+
+import httpx
+import pytest
+from ddtrace.ext import priority
+from ddtrace.span import Span
+
+import ddtrace_asgi
+from ddtrace_asgi._propagation import Propagator
+from tests.utils.fixtures import create_app
+from tests.utils.tracer import DummyTracer
+
+TRACE_ID_128 = "463ac35c9f6413ad48485a3953bb6124"
+SPAN_ID = "0020000000000001"
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ([], None),
+        ([(b"x-request-id", b"abc")], None),
+        (
+            [(b"x-datadog-trace-id", b"1234"), (b"x-datadog-parent-id", b"5678")],
+            (1234, 5678, None),
+        ),
+        (
+            [
+                (b"x-datadog-trace-id", b"1234"),
+                (b"x-datadog-parent-id", b"5678"),
+                (b"x-datadog-sampling-priority", b"2"),
+            ],
+            (1234, 5678, priority.USER_KEEP),
+        ),
+        ([(b"x-datadog-trace-id", b"invalid")], None),
+        ([(b"x-datadog-sampling-priority", b"1")], None),
+    ],
+)
+def test_datadog(
+    headers: List[Tuple[bytes, bytes]], expected: Optional[Tuple[int, int, int]]
+) -> None:
+    context = Propagator(["datadog"]).extract(headers)
+    if expected is None:
+        assert context is None
+    else:
+        assert context is not None
+        assert (context.trace_id, context.span_id, context.sampling_priority) == (
+            expected
+        )
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        (
+            [
+                (b"x-b3-traceid", TRACE_ID_128.encode()),
+                (b"x-b3-spanid", SPAN_ID.encode()),
+                (b"x-b3-sampled", b"1"),
+            ],
+            (0x48485A3953BB6124, 0x0020000000000001, priority.AUTO_KEEP),
+        ),
+        (
+            [
+                (b"x-b3-traceid", b"48485a3953bb6124"),
+                (b"x-b3-spanid", SPAN_ID.encode()),
+                (b"x-b3-flags", b"1"),
+            ],
+            (0x48485A3953BB6124, 0x0020000000000001, priority.USER_KEEP),
+        ),
+        (
+            [(b"b3", f"{TRACE_ID_128}-{SPAN_ID}-0".encode())],
+            (0x48485A3953BB6124, 0x0020000000000001, priority.AUTO_REJECT),
+        ),
+        (
+            [(b"b3", f"{TRACE_ID_128}-{SPAN_ID}".encode())],
+            (0x48485A3953BB6124, 0x0020000000000001, None),
+        ),
+        ([(b"b3", b"0")], None),
+        ([(b"b3", b"invalid-invalid")], None),
+        ([(b"x-b3-sampled", b"1")], None),
+        ([(b"b3", b"0000000000000000-0000000000000001")], None),
+    ],
+)
+def test_b3(
+    headers: List[Tuple[bytes, bytes]], expected: Optional[Tuple[int, int, int]]
+) -> None:
+    context = Propagator(["b3"]).extract(headers)
+    if expected is None:
+        assert context is None
+    else:
+        assert context is not None
+        assert (context.trace_id, context.span_id, context.sampling_priority) == (
+            expected
+        )
+
+
+@pytest.mark.parametrize(
+    "traceparent, expected",
+    [
+        (
+            f"00-{TRACE_ID_128}-{SPAN_ID}-01",
+            (0x48485A3953BB6124, 0x0020000000000001, priority.AUTO_KEEP),
+        ),
+        (
+            f"00-{TRACE_ID_128}-{SPAN_ID}-00",
+            (0x48485A3953BB6124, 0x0020000000000001, priority.AUTO_REJECT),
+        ),
+        (f"ff-{TRACE_ID_128}-{SPAN_ID}-01", None),
+        (f"00-{TRACE_ID_128}-{SPAN_ID}", None),
+        (f"00-{TRACE_ID_128}-{SPAN_ID}-1", None),
+        (f"00-{TRACE_ID_128}-{SPAN_ID}-zz", None),
+        (f"00-{'0' * 32}-{SPAN_ID}-01", None),
+    ],
+)
+def test_tracecontext(
+    traceparent: str, expected: Optional[Tuple[int, int, int]]
+) -> None:
+    headers = [(b"traceparent", traceparent.encode())]
+    context = Propagator(["tracecontext"]).extract(headers)
+    if expected is None:
+        assert context is None
+    else:
+        assert context is not None
+        assert (context.trace_id, context.span_id, context.sampling_priority) == (
+            expected
+        )
+
+
+def test_styles_order() -> None:
+    headers = [
+        (b"x-datadog-trace-id", b"1234"),
+        (b"x-datadog-parent-id", b"5678"),
+        (b"traceparent", f"00-{TRACE_ID_128}-{SPAN_ID}-01".encode()),
+    ]
+
+    context = Propagator(["datadog", "tracecontext"]).extract(headers)
+    assert context is not None
+    assert context.trace_id == 1234
+
+    context = Propagator(["tracecontext", "datadog"]).extract(headers)
+    assert context is not None
+    assert context.trace_id == 0x48485A3953BB6124
+
+    # Only headers of enabled styles are considered.
+    context = Propagator(["b3"]).extract(headers)
+    assert context is None
+
+    context = Propagator(["datadog", "tracecontext"]).extract(
+        [(b"x-datadog-origin", b"synthetics")]
+    )
+    assert context is None
+
+
+def test_unknown_style() -> None:
+    with pytest.raises(ValueError):
+        Propagator(["jaeger"])
+
+
+@pytest.mark.asyncio
+async def test_propagation_styles(application: str, tracer: DummyTracer) -> None:
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {"tracer": tracer, "propagation_styles": ["datadog", "b3"]},
+            )
+        ],
+    )
+
+    headers = {"x-b3-traceid": "48485a3953bb6124", "x-b3-spanid": SPAN_ID}
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/", headers=headers)
+
+    assert r.status_code == 200
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    spans: List[Span] = traces[0]
+    assert len(spans) == 1
+    span = spans[0]
+    assert span.trace_id == 0x48485A3953BB6124
+    assert span.parent_id == 0x0020000000000001
+
+
+@pytest.mark.asyncio
+async def test_distributed_tracing_disabled(
+    application: str, tracer: DummyTracer
+) -> None:
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {"tracer": tracer, "distributed_tracing": False},
+            )
+        ],
+    )
+
+    headers = {"x-datadog-trace-id": "1234", "x-datadog-parent-id": "5678"}
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/", headers=headers)
+
+    assert r.status_code == 200
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    spans: List[Span] = traces[0]
+    assert len(spans) == 1
+    span = spans[0]
+    assert span.trace_id != 1234
+    assert span.parent_id is None
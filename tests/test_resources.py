@@ -0,0 +1,237 @@
+import sys
+from typing import Any, List
+
+import httpx
+import pytest
+from ddtrace.span import Span
+from fastapi import FastAPI
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Host, Mount, Route, Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import ddtrace_asgi
+from ddtrace_asgi._resources import ResourceNamer
+from ddtrace_asgi._utils import LRUCache
+from tests.utils.tracer import DummyTracer
+
+
+async def hello(scope: Scope, receive: Receive, send: Send) -> None:
+    response = PlainTextResponse("Hello, world!")
+    await response(scope, receive, send)
+
+
+async def endpoint(request: Request) -> Response:
+    return PlainTextResponse("Hello, world!")
+
+
+async def get_resource(app: ASGIApp, tracer: DummyTracer, url: str) -> str:
+    async with httpx.AsyncClient(app=app) as client:
+        await client.get(url)
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    spans: List[Span] = traces[0]
+    return spans[0].resource
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "url, resource",
+    [
+        ("http://testserver/", "GET /"),
+        ("http://testserver/users/42", "GET /users/{user_id:int}"),
+        ("http://testserver/api/items/abc", "GET /api/items/{item_id}"),
+        ("http://testserver/api/unknown", "GET /api/{path:path}"),
+        ("http://testserver/static/css/main.css", "GET /static/{path:path}"),
+        ("http://testserver/submit", "GET /submit"),
+        ("http://internal/status/1", "GET /status/{code}"),
+        ("http://testserver/unknown/123", "GET /unknown/{id}"),
+    ],
+)
+async def test_starlette_route_template(
+    tracer: DummyTracer, url: str, resource: str
+) -> None:
+    routes = [
+        Route("/", endpoint),
+        Route("/users/{user_id:int}", endpoint),
+        Mount("/api", routes=[Route("/items/{item_id}", endpoint)]),
+        Mount("/static", app=hello),
+        Route("/submit", endpoint, methods=["POST"]),
+        Host("internal", app=Router(routes=[Route("/status/{code}", endpoint)])),
+    ]
+    app = Starlette(
+        routes=routes,
+        middleware=[
+            Middleware(
+                ddtrace_asgi.TraceMiddleware,
+                tracer=tracer,
+                resource_normalizers=[(r"/\d+", "/{id}")],
+            )
+        ],
+    )
+
+    assert await get_resource(app, tracer, url) == resource
+
+
+@pytest.mark.asyncio
+async def test_fastapi_route_template(tracer: DummyTracer) -> None:
+    app = FastAPI()
+
+    @app.get("/users/{user_id}")
+    async def get_user(user_id: int) -> dict:
+        return {"id": user_id}
+
+    app.add_middleware(ddtrace_asgi.TraceMiddleware, tracer=tracer)
+
+    url = "http://testserver/users/42"
+    assert await get_resource(app, tracer, url) == "GET /users/{user_id}"
+
+
+@pytest.mark.asyncio
+async def test_root_path(tracer: DummyTracer) -> None:
+    app = ddtrace_asgi.TraceMiddleware(
+        Starlette(routes=[Route("/users/{user_id}", endpoint)]), tracer=tracer
+    )
+
+    async def call(root_path: str) -> None:
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/users/1",
+            "root_path": root_path,
+            "headers": [],
+        }
+
+        async def receive() -> Message:
+            return {"type": "http.request"}  # pragma: no cover
+
+        async def send(message: Message) -> None:
+            pass
+
+        await app(scope, receive, send)
+
+    await call(root_path="/v1")
+    await call(root_path="/v1")
+    traces = tracer.writer.pop_traces()
+    assert [trace[0].resource for trace in traces] == ["GET /v1/users/{user_id}"] * 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "normalizers, url, resource",
+    [
+        ([], "http://testserver/users/42", "GET /users/42"),
+        ([(r"/\d+", "/{id}")], "http://testserver/users/42", "GET /users/{id}"),
+        (
+            [(r"/[0-9a-f-]{36}", "/{uuid}"), (r"/\d+", "/{id}")],
+            "http://testserver/users/4/orders/07f7f4a8-2ef6-4c89-9b8d-8c57b4c4a6e1",
+            "GET /users/{id}/orders/{uuid}",
+        ),
+    ],
+)
+async def test_raw_normalizers(
+    tracer: DummyTracer, normalizers: list, url: str, resource: str
+) -> None:
+    app = ddtrace_asgi.TraceMiddleware(
+        hello, tracer=tracer, resource_normalizers=normalizers
+    )
+    assert await get_resource(app, tracer, url) == resource
+
+
+@pytest.mark.asyncio
+async def test_shared_middleware(tracer: DummyTracer) -> None:
+    users = Starlette(routes=[Route("/{user_id}", endpoint)])
+    items = Starlette(routes=[Route("/{item_id}", endpoint)])
+    app = ddtrace_asgi.TraceMiddleware(users, tracer=tracer)
+
+    async def call(scope_app: Starlette) -> str:
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/1",
+            "headers": [],
+            "app": scope_app,
+        }
+
+        async def receive() -> Message:
+            return {"type": "http.request"}  # pragma: no cover
+
+        async def send(message: Message) -> None:
+            pass
+
+        await app(scope, receive, send)
+        [[span]] = tracer.writer.pop_traces()
+        return span.resource
+
+    assert await call(users) == "GET /{user_id}"
+    assert await call(items) == "GET /{item_id}"
+    assert await call(users) == "GET /{user_id}"
+
+
+@pytest.mark.asyncio
+async def test_host_routes(tracer: DummyTracer) -> None:
+    internal = Router(routes=[Route("/status/{code}", endpoint)])
+    app = ddtrace_asgi.TraceMiddleware(
+        Starlette(routes=[Mount("/api", routes=[Host("internal", app=internal)])]),
+        tracer=tracer,
+    )
+
+    resources = []
+    async with httpx.AsyncClient(app=app) as client:
+        for url in [
+            "http://internal/api/status/1",
+            "http://public/api/status/1",
+            "http://internal/api/status/1",
+        ]:
+            await client.get(url)
+            [[span]] = tracer.writer.pop_traces()
+            resources.append(span.resource)
+
+    assert resources == [
+        "GET /api/status/{code}",
+        "GET /api/{path:path}",
+        "GET /api/status/{code}",
+    ]
+
+
+def test_starlette_not_imported(monkeypatch: Any) -> None:
+    # NOTE: as for raw applications served while Starlette was never imported.
+    monkeypatch.delitem(sys.modules, "starlette.routing")
+    namer = ResourceNamer(hello, normalizers=[(r"/\d+", "/{id}")])
+    scope = {"type": "http", "method": "GET", "path": "/users/1", "headers": []}
+    assert namer.get(scope, "GET", "/users/1") == "GET /users/{id}"
+
+
+@pytest.mark.asyncio
+async def test_not_starlette(tracer: DummyTracer) -> None:
+    class App:
+        routes = ["not", "starlette", "routes"]
+
+        async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+            await hello(scope, receive, send)
+
+    app = ddtrace_asgi.TraceMiddleware(
+        App(), tracer=tracer, resource_normalizers=[(r"/\d+", "/{id}")]
+    )
+    url = "http://testserver/users/42"
+    assert await get_resource(app, tracer, url) == "GET /users/{id}"
+
+
+def test_lru_cache() -> None:
+    cache: LRUCache[str, int] = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert len(cache) == 0
+    assert cache.get("a") is None
@@ -0,0 +1,330 @@
+import random
+from typing import Any, Dict, List, Optional
+
+import httpx
+import pytest
+from ddtrace.constants import SAMPLE_RATE_METRIC_KEY, SAMPLING_PRIORITY_KEY
+from ddtrace.ext import priority
+from ddtrace.propagation.http import HTTPPropagator
+from ddtrace.span import Span
+from starlette.types import Receive, Scope, Send
+
+import ddtrace_asgi
+from ddtrace_asgi._compat import perf_counter_ns
+from ddtrace_asgi._sampling import HeadSampler, TailSampler, TokenBucket
+from tests.utils.asgi import mock_http_scope, mock_receive, mock_send
+from tests.utils.fixtures import create_app
+from tests.utils.tracer import DummyTracer
+
+
+def test_rules() -> None:
+    sampler = HeadSampler(
+        0.5, rules={"GET /health": 0, "* /api/*": 0.1, "post /users/*/orders": 1}
+    )
+    assert sampler.get_rate("GET", "/health") == 0
+    assert sampler.get_rate("POST", "/health") == 0.5
+    assert sampler.get_rate("GET", "/api/users/1") == 0.1
+    assert sampler.get_rate("DELETE", "/api/") == 0.1
+    assert sampler.get_rate("POST", "/users/1/orders") == 1
+    assert sampler.get_rate("GET", "/") == 0.5
+
+
+@pytest.mark.parametrize(
+    "rate, rules",
+    [(1.5, None), (-0.1, None), (1, {"GET /": 2}), (1, {"/health": 0})],
+)
+def test_invalid_options(rate: float, rules: Dict[str, float]) -> None:
+    with pytest.raises(ValueError):
+        HeadSampler(rate, rules)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/", "/child/"])
+async def test_drop(application: str, tracer: DummyTracer, path: str) -> None:
+    app = create_app(
+        application,
+        middleware=[
+            (ddtrace_asgi.TraceMiddleware, {"tracer": tracer, "head_sample_rate": 0})
+        ],
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get(f"http://testserver{path}")
+
+    assert r.status_code == 200
+    assert tracer.writer.pop_traces() == []
+    assert not tracer.current_span()
+
+
+@pytest.mark.asyncio
+async def test_drop_exception(application: str, tracer: DummyTracer) -> None:
+    app = create_app(
+        application,
+        middleware=[
+            (ddtrace_asgi.TraceMiddleware, {"tracer": tracer, "head_sample_rate": 0})
+        ],
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        with pytest.raises(RuntimeError):
+            await client.get("http://testserver/exception/")
+
+    assert tracer.writer.pop_traces() == []
+    assert not tracer.current_span()
+
+
+@pytest.mark.asyncio
+async def test_keep(application: str, tracer: DummyTracer) -> None:
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {
+                    "tracer": tracer,
+                    "head_sample_rate": 0,
+                    "head_sample_rules": {"GET /child/": 1},
+                },
+            )
+        ],
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        await client.get("http://testserver/")
+        await client.get("http://testserver/child/")
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    spans: List[Span] = traces[0]
+    assert len(spans) == 2
+    span = next(span for span in spans if span.name == "asgi.request")
+    assert span.resource == "GET /child/"
+    assert span.get_metric(SAMPLING_PRIORITY_KEY) == priority.AUTO_KEEP
+    assert span.get_metric(SAMPLE_RATE_METRIC_KEY) is None
+
+
+@pytest.mark.asyncio
+async def test_keep_sample_rate(
+    application: str, tracer: DummyTracer, monkeypatch: Any
+) -> None:
+    monkeypatch.setattr(random, "random", lambda: 0.1)
+
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {"tracer": tracer, "head_sample_rate": 0.5},
+            )
+        ],
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        await client.get("http://testserver/")
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    span = traces[0][0]
+    assert span.get_metric(SAMPLE_RATE_METRIC_KEY) == 0.5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "rate, sampling_priority, kept",
+    [(0, "1", True), (0, "2", True), (1, "0", False), (1, "-1", False)],
+)
+async def test_inbound_sampling_priority(
+    application: str,
+    tracer: DummyTracer,
+    rate: float,
+    sampling_priority: str,
+    kept: bool,
+) -> None:
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {"tracer": tracer, "head_sample_rate": rate},
+            )
+        ],
+    )
+
+    headers = {
+        "x-datadog-trace-id": "1234",
+        "x-datadog-parent-id": "5678",
+        "x-datadog-sampling-priority": sampling_priority,
+    }
+
+    async with httpx.AsyncClient(app=app) as client:
+        await client.get("http://testserver/", headers=headers)
+
+    traces = tracer.writer.pop_traces()
+    if kept:
+        assert len(traces) == 1
+        span = traces[0][0]
+        assert span.trace_id == 1234
+        assert span.get_metric(SAMPLING_PRIORITY_KEY) == int(sampling_priority)
+    else:
+        assert traces == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "headers, trace_id, sampling_priority",
+    [
+        ({}, None, priority.AUTO_REJECT),
+        (
+            {"x-datadog-trace-id": "1234", "x-datadog-parent-id": "5678"},
+            1234,
+            priority.AUTO_REJECT,
+        ),
+        (
+            {
+                "x-datadog-trace-id": "1234",
+                "x-datadog-parent-id": "5678",
+                "x-datadog-sampling-priority": "-1",
+            },
+            1234,
+            priority.USER_REJECT,
+        ),
+    ],
+)
+async def test_drop_propagation(
+    tracer: DummyTracer, headers: dict, trace_id: int, sampling_priority: int
+) -> None:
+    propagated: dict = {}
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        with tracer.trace("asgi.request.child") as span:
+            HTTPPropagator().inject(span.context, propagated)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = ddtrace_asgi.TraceMiddleware(app, tracer=tracer, head_sample_rate=0)
+
+    async with httpx.AsyncClient(app=app) as client:
+        await client.get("http://testserver/", headers=headers)
+
+    assert tracer.writer.pop_traces() == []
+    if trace_id is not None:
+        assert propagated["x-datadog-trace-id"] == str(trace_id)
+    assert propagated["x-datadog-sampling-priority"] == str(sampling_priority)
+
+
+def test_token_bucket() -> None:
+    bucket = TokenBucket(2, now_ns=0)
+    assert bucket.take(0)
+    assert bucket.take(0)
+    assert not bucket.take(0)
+    assert not bucket.take(400_000_000)
+    assert bucket.take(500_000_000)
+    # Tokens do not accumulate beyond the rate.
+    assert bucket.take(10_000_000_000)
+    assert bucket.take(10_000_000_000)
+    assert not bucket.take(10_000_000_000)
+
+
+def test_token_bucket_slow_rate() -> None:
+    bucket = TokenBucket(0.5, now_ns=0)
+    assert bucket.take(0)
+    assert not bucket.take(1_000_000_000)
+    assert bucket.take(2_000_000_000)
+
+    bucket = TokenBucket(0, now_ns=0)
+    assert not bucket.take(0)
+    assert not bucket.take(10_000_000_000)
+
+
+def test_tail_sampler(monkeypatch: Any) -> None:
+    now_ns = perf_counter_ns()
+    sampler = TailSampler(
+        latency_threshold=1, latency_rules={"GET /slow": 5}, budget=1000
+    )
+    assert sampler.sample("GET /", 200, False, now_ns, 10**9 - 1) is None
+    assert sampler.sample("GET /", 200, False, now_ns, 10**9) == "slow"
+    assert sampler.sample("GET /slow", 200, False, now_ns, 10**9) is None
+    assert sampler.sample("GET /slow", 200, False, now_ns, 5 * 10**9) == "slow"
+    assert sampler.sample("GET /", 500, False, now_ns, 0) == "error"
+    assert sampler.sample("GET /", None, True, now_ns, 0) == "error"
+    assert sampler.sample("GET /", 404, False, now_ns, 0) is None
+
+    sampler = TailSampler()
+    assert sampler.sample("GET /", 200, False, now_ns, 10**12) is None
+    assert sampler.sample("GET /", 500, False, now_ns, 0) == "error"
+
+    sampler = TailSampler(rate=1)
+    assert sampler.sample("GET /", 200, False, now_ns, 0) == "rate"
+
+    sampler = TailSampler(rate=0.5)
+    monkeypatch.setattr(random, "random", lambda: 0.1)
+    assert sampler.sample("GET /", 200, False, now_ns, 0) == "rate"
+    monkeypatch.setattr(random, "random", lambda: 0.9)
+    assert sampler.sample("GET /", 200, False, now_ns, 0) is None
+
+    with pytest.raises(ValueError):
+        TailSampler(rate=2)
+
+
+def test_tail_sampler_budget() -> None:
+    sampler = TailSampler(budget=2)
+    now_ns = perf_counter_ns()
+    assert sampler.sample("GET /", 500, False, now_ns, 0) == "error"
+    assert sampler.sample("GET /", 500, False, now_ns, 0) == "error"
+    assert sampler.sample("GET /", 500, False, now_ns, 0) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options, path, reason",
+    [
+        ({"tail_latency_threshold": 60}, "/child/", None),
+        ({"tail_latency_threshold": 0}, "/child/", "slow"),
+        ({"tail_latency_rules": {"GET /child/": 0}}, "/child/", "slow"),
+        ({"tail_latency_rules": {"GET /child/": 0}}, "/", None),
+        ({"tail_sample_rate": 1}, "/", "rate"),
+        ({"tail_sample_rate": 0}, "/exception/", "error"),
+    ],
+)
+async def test_tail_sampling(
+    application: str,
+    tracer: DummyTracer,
+    options: dict,
+    path: str,
+    reason: Optional[str],
+) -> None:
+    app = create_app(
+        application,
+        middleware=[(ddtrace_asgi.TraceMiddleware, {"tracer": tracer, **options})],
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        try:
+            await client.get(f"http://testserver{path}")
+        except RuntimeError:
+            pass
+
+    traces = tracer.writer.pop_traces()
+    if reason is None:
+        assert traces == []
+        return
+
+    assert len(traces) == 1
+    span = next(span for span in traces[0] if span.name == "asgi.request")
+    assert span.get_tag("tail_sampling.reason") == reason
+    if reason != "rate":
+        assert span.get_metric(SAMPLING_PRIORITY_KEY) == priority.USER_KEEP
+
+
+@pytest.mark.asyncio
+async def test_tail_sampling_no_response(tracer: DummyTracer) -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        raise RuntimeError("Oops")
+
+    app = ddtrace_asgi.TraceMiddleware(app, tracer=tracer, tail_sample_rate=0)
+
+    with pytest.raises(RuntimeError):
+        await app(dict(mock_http_scope), mock_receive, mock_send)
+
+    [[span]] = tracer.writer.pop_traces()
+    assert span.get_tag("tail_sampling.reason") == "error"
@@ -0,0 +1,29 @@
+import pytest
+from starlette.requests import Request
+
+from ddtrace_asgi._scope import get_url
+
+
+@pytest.mark.parametrize(
+    "scope",
+    [
+        {"headers": [(b"host", b"example.org")], "path": "/"},
+        {"headers": [(b"host", b"example.org:8000")], "path": "/users"},
+        {"headers": [], "path": "/", "server": ("example.org", 80)},
+        {"headers": [], "path": "/", "server": ("example.org", 8000)},
+        {
+            "headers": [],
+            "path": "/",
+            "scheme": "https",
+            "server": ("example.org", 443),
+        },
+        {"headers": [], "path": "/"},
+        {"headers": [], "path": "/users", "root_path": "/api"},
+        {"headers": [(b"host", b"example.org")], "path": "/", "query_string": b"a=1"},
+    ],
+)
+def test_get_url(scope: dict) -> None:
+    scope = {"type": "http", **scope}
+    path = scope.get("root_path", "") + scope["path"]
+    query_string = scope.get("query_string", b"")
+    assert get_url(scope, path, query_string) == str(Request(scope).url)
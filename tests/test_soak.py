@@ -0,0 +1,151 @@
+"""
+Soak test: push many mixed requests through `TraceMiddleware`, and check that memory
+and the number of live spans and contexts stay bounded.
+
+The number of requests is kept small by default, so that the test suite stays fast.
+For a proper soak, run e.g.:
+
+    DDTRACE_ASGI_SOAK_REQUESTS=1000000 pytest tests/test_soak.py
+"""
+
+import asyncio
+import gc
+import os
+import threading
+import tracemalloc
+from typing import Any, Dict, List
+
+import pytest
+from ddtrace.context import Context
+from ddtrace.span import Span
+from starlette.types import Message, Receive, Scope, Send
+
+import ddtrace_asgi
+from tests.utils.config import override_http_config
+from tests.utils.tracer import DummyTracer
+
+SOAK_REQUESTS = int(os.environ.get("DDTRACE_ASGI_SOAK_REQUESTS", "3000"))
+CONCURRENCY = 50
+KINDS = ("ok", "stream", "exception", "disconnect", "cancelled", "cancel")
+# Growth allowed per request once warmed up, to absorb allocator noise.
+MAX_GROWTH_PER_REQUEST = 16
+# NOTE: writer threads left running by other tests allocate locks while they wait.
+IGNORED_ALLOCATIONS = [tracemalloc.Filter(False, threading.__file__)]
+
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    kind = scope["path"].split("/")[1]
+    if kind == "disconnect":
+        message = await receive()
+        assert message["type"] == "http.disconnect"
+        return
+    if kind == "cancelled":
+        raise asyncio.CancelledError()
+    if kind == "cancel":
+        await asyncio.Event().wait()  # Until cancelled by the server.
+
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    if kind == "stream":
+        for _ in range(3):
+            await send({"type": "http.response.body", "body": b"a", "more_body": True})
+    await send({"type": "http.response.body", "body": b"Hello, world!"})
+    if kind == "exception":
+        raise RuntimeError("Oops")
+
+
+async def request(middleware: ddtrace_asgi.TraceMiddleware, index: int) -> None:
+    kind = KINDS[index % len(KINDS)]
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "path": f"/{kind}/{index}",
+        "root_path": "",
+        "query_string": b"q=%d" % index,
+        "headers": [
+            (b"host", b"testserver"),
+            (b"x-request-id", b"%d" % index),
+            (b"x-datadog-trace-id", b"%d" % (index + 1)),
+            (b"x-datadog-parent-id", b"1234"),
+        ],
+    }
+
+    async def receive() -> Message:
+        # NOTE: only requests that wait for the client to disconnect receive.
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        pass
+
+    task = asyncio.ensure_future(middleware(scope, receive, send))
+    if kind == "cancel":
+        await asyncio.sleep(0)
+        task.cancel()
+    try:
+        await task
+    except (RuntimeError, asyncio.CancelledError):
+        pass
+
+
+def live_objects() -> List[Any]:
+    gc.collect()
+    return [obj for obj in gc.get_objects() if isinstance(obj, (Span, Context))]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"head_sample_rate": 0},
+        {"load_metrics": True, "measure_overhead": True, "timing_breakdown": True},
+    ],
+)
+async def test_soak(tracer: DummyTracer, options: Dict[str, Any]) -> None:
+    # NOTE: a small resource cache, so that evictions happen while warming up.
+    middleware = ddtrace_asgi.TraceMiddleware(
+        app, tracer=tracer, resource_cache_size=64, **options
+    )
+    traces = 0
+
+    async def run(start: int, stop: int) -> None:
+        nonlocal traces
+        for batch in range(start, stop, CONCURRENCY):
+            indexes = range(batch, min(batch + CONCURRENCY, stop))
+            await asyncio.gather(*(request(middleware, index) for index in indexes))
+            traces += len(tracer.writer.pop_traces())
+            tracer.writer.pop()
+
+    warmup = SOAK_REQUESTS // 4
+    with override_http_config("asgi", ["x-request-id"]):
+        middleware.reload_config()
+        tracemalloc.start()
+        try:
+            await run(0, warmup)
+            # NOTE: keep these alive, so that their ids are not reused.
+            before = live_objects()
+            known = {id(obj) for obj in before}
+            snapshot = tracemalloc.take_snapshot()
+
+            await run(warmup, SOAK_REQUESTS)
+            after = [obj for obj in live_objects() if id(obj) not in known]
+            stats = (
+                tracemalloc.take_snapshot()
+                .filter_traces(IGNORED_ALLOCATIONS)
+                .compare_to(snapshot.filter_traces(IGNORED_ALLOCATIONS), "filename")
+            )
+            growth = sum(stat.size_diff for stat in stats)
+        finally:
+            tracemalloc.stop()
+
+    per_request = growth / (SOAK_REQUESTS - warmup)
+
+    # Every request was finished, and sent unless dropped.
+    assert traces == (0 if options.get("head_sample_rate") == 0 else SOAK_REQUESTS)
+    # No span or context outlives its request, or stays active.
+    assert not after
+    assert tracer.current_span() is None
+    assert middleware._inflight == 0
+    assert per_request < MAX_GROWTH_PER_REQUEST
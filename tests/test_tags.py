@@ -0,0 +1,100 @@
+import math
+from typing import Optional
+
+import pytest
+from ddtrace.constants import (
+    ANALYTICS_SAMPLE_RATE_KEY,
+    MANUAL_DROP_KEY,
+    MANUAL_KEEP_KEY,
+)
+from ddtrace.context import Context
+from ddtrace.ext import priority
+from ddtrace.span import Span
+from starlette.types import Receive, Scope, Send
+
+import ddtrace_asgi
+from ddtrace_asgi._tags import StaticTags, TagBuffer
+from tests.utils.asgi import mock_http_scope, mock_receive, mock_send
+from tests.utils.tracer import DummyTracer
+
+
+def make_span() -> Span:
+    return Span(tracer=None, name="test", context=Context())
+
+
+@pytest.mark.parametrize(
+    "tags",
+    [
+        {},
+        {"env": "testing", "version": 2, "enabled": True},
+        {ANALYTICS_SAMPLE_RATE_KEY: 0.5},
+        {ANALYTICS_SAMPLE_RATE_KEY: "1"},
+        {ANALYTICS_SAMPLE_RATE_KEY: None},
+        {ANALYTICS_SAMPLE_RATE_KEY: "invalid"},
+        {ANALYTICS_SAMPLE_RATE_KEY: math.nan},
+        {ANALYTICS_SAMPLE_RATE_KEY: math.inf},
+        {MANUAL_KEEP_KEY: None},
+        {MANUAL_DROP_KEY: None},
+    ],
+)
+def test_same_as_set_tags(tags: dict) -> None:
+    expected = make_span()
+    expected.set_tags(tags)
+
+    span = make_span()
+    StaticTags(tags).apply(span)
+
+    assert span.meta == expected.meta
+    assert span.metrics == expected.metrics
+    assert span.context.sampling_priority == expected.context.sampling_priority
+
+
+def test_sampling_priority() -> None:
+    span = make_span()
+    StaticTags({MANUAL_DROP_KEY: None}).apply(span)
+    assert span.context.sampling_priority == priority.USER_REJECT
+
+
+def test_tag_buffer() -> None:
+    tags = TagBuffer()
+    tags.set_tag("a", "1")
+    tags.set_tags({"b": 2, ANALYTICS_SAMPLE_RATE_KEY: 0.5})
+    tags.set_metric("c", 3)
+
+    span = make_span()
+    tags.flush(span)
+    assert span.meta == {"a": "1", "b": "2"}
+    assert span.metrics == {ANALYTICS_SAMPLE_RATE_KEY: 0.5, "c": 3}
+
+    # Tags are only flushed once.
+    span = make_span()
+    tags.flush(span)
+    assert span.meta == {}
+    assert span.metrics == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("head_sample_rate", [None, 0])
+async def test_scope(tracer: DummyTracer, head_sample_rate: Optional[float]) -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        span: Span = scope["ddtrace_asgi.span"]
+        assert span is tracer.current_root_span()
+        tags: TagBuffer = scope["ddtrace_asgi.tags"]
+        tags.set_tag("user.id", "42")
+        tags.set_metric("items", 3)
+        assert span.get_tag("user.id") is None
+        await send({"type": "http.response.start", "status": 200})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = ddtrace_asgi.TraceMiddleware(
+        app, tracer=tracer, head_sample_rate=head_sample_rate
+    )
+    await app(dict(mock_http_scope), mock_receive, mock_send)
+
+    traces = tracer.writer.pop_traces()
+    if head_sample_rate == 0:
+        assert traces == []
+        return
+    [[span]] = traces
+    assert span.get_tag("user.id") == "42"
+    assert span.get_metric("items") == 3
@@ -12,7 +12,7 @@ from starlette.types import Message, Receive, Scope, Send
 
 import ddtrace_asgi
 from tests.utils.asgi import mock_app, mock_http_scope, mock_receive, mock_send
-from tests.utils.config import override_config
+from tests.utils.config import override_config, override_http_config
 from tests.utils.fixtures import create_app
 from tests.utils.tracer import DummyTracer
 
@@ -104,6 +104,7 @@ async def test_child(application: str, tracer: Tracer) -> None:
     assert span.service == "test.asgi.service"
     assert span.resource == "GET /child/"
     assert span.get_tag("hello") is None
+    assert span.get_tag(http_ext.STATUS_CODE) == "200"
     assert span.start >= start
     assert span.duration <= end - start
     assert span.error == 0
@@ -115,6 +116,7 @@ async def test_child(application: str, tracer: Tracer) -> None:
     assert child_span.service == "test.asgi.service"
     assert child_span.resource == "child"
     assert child_span.get_tag("hello") == "world"
+    assert child_span.get_tag(http_ext.STATUS_CODE) is None
     assert child_span.start >= start
     assert child_span.duration <= end - start
     assert child_span.error == 0
@@ -198,6 +200,43 @@ async def test_trace_query_string(application: str, tracer: DummyTracer) -> None
     assert span.get_tag(http_ext.QUERY_STRING) == "foo=bar"
 
 
+@pytest.fixture
+def trace_headers() -> Iterator[None]:
+    with override_http_config("asgi", trace_headers=["x-request-id", "content-type"]):
+        yield
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("trace_headers")
+async def test_trace_headers(application: str, tracer: DummyTracer) -> None:
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {"tracer": tracer, "service": "test.asgi.service"},
+            )
+        ],
+    )
+
+    headers = {"x-request-id": "abc123", "x-other": "other"}
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/", headers=headers)
+
+    assert r.status_code == 200
+    assert r.text == "Hello, world!"
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    spans: List[Span] = traces[0]
+    assert len(spans) == 1
+    span = spans[0]
+    assert span.get_tag("http.request.headers.x-request-id") == "abc123"
+    assert span.get_tag("http.request.headers.x-other") is None
+    assert span.get_tag("http.response.headers.content-type").startswith("text/plain")
+
+
 @pytest.mark.asyncio
 async def test_app_exception(application: str, tracer: DummyTracer) -> None:
     app = create_app(
@@ -308,3 +347,81 @@ async def test_tags(
     assert span.resource == "GET /"
     for key, value in expected_tags.items():
         assert span.get_tag(key) == value
+
+
+@pytest.mark.asyncio
+async def test_streaming(application: str, tracer: DummyTracer) -> None:
+    app = create_app(
+        application,
+        middleware=[
+            (
+                ddtrace_asgi.TraceMiddleware,
+                {"tracer": tracer, "service": "test.asgi.service"},
+            )
+        ],
+    )
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.get("http://testserver/stream/")
+
+    assert r.status_code == 200
+    assert r.text == "Hello" * 10
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    spans: List[Span] = traces[0]
+    assert len(spans) == 1
+    span = spans[0]
+    assert span.resource == "GET /stream/"
+    assert span.get_tag(http_ext.STATUS_CODE) == "200"
+    assert span.get_metric("http.response.body.bytes") == len(r.content)
+    assert 0 < span.get_metric("http.response.ttfb_ns")
+    assert span.get_metric("http.response.ttfb_ns") <= span.get_metric(
+        "http.response.ttlb_ns"
+    )
+
+
+@pytest.mark.asyncio
+async def test_request_body(tracer: DummyTracer) -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            size += len(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        await send({"type": "http.response.start", "status": 200})
+        await send({"type": "http.response.body", "body": b"%d" % size})
+
+    app = ddtrace_asgi.TraceMiddleware(app, tracer=tracer)
+
+    async with httpx.AsyncClient(app=app) as client:
+        r = await client.post("http://testserver/", data=b"x" * 1000)
+
+    assert r.text == "1000"
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    [span] = traces[0]
+    assert span.get_metric("http.request.body.bytes") == 1000
+    assert span.get_metric("http.response.body.bytes") == 4
+
+
+@pytest.mark.asyncio
+async def test_incomplete_response(tracer: DummyTracer) -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": 200})
+        await send({"type": "http.response.body", "body": b"Hi", "more_body": True})
+        raise RuntimeError("Oops")
+
+    app = ddtrace_asgi.TraceMiddleware(app, tracer=tracer)
+
+    with pytest.raises(RuntimeError):
+        await app(mock_http_scope, mock_receive, mock_send)
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    [span] = traces[0]
+    assert span.get_metric("http.request.body.bytes") == 0
+    assert span.get_metric("http.response.body.bytes") == 2
+    assert span.get_metric("http.response.ttfb_ns") is not None
+    assert span.get_metric("http.response.ttlb_ns") is None
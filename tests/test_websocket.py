@@ -0,0 +1,168 @@
+from typing import List
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import WebSocketRoute
+from starlette.types import Message, Receive, Scope, Send
+from starlette.websockets import WebSocket
+
+import ddtrace_asgi
+from tests.utils.tracer import DummyTracer
+
+
+def websocket_scope(path: str = "/ws") -> Scope:
+    return {
+        "type": "websocket",
+        "scheme": "ws",
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"host", b"testserver")],
+    }
+
+
+class Connection:
+    def __init__(self, messages: List[Message]) -> None:
+        self.incoming = [{"type": "websocket.connect"}, *messages]
+        self.outgoing: List[Message] = []
+
+    async def receive(self) -> Message:
+        if self.incoming:
+            return self.incoming.pop(0)
+        return {"type": "websocket.disconnect", "code": 1001}
+
+    async def send(self, message: Message) -> None:
+        self.outgoing.append(message)
+
+
+async def echo(scope: Scope, receive: Receive, send: Send) -> None:
+    message = await receive()
+    assert message["type"] == "websocket.connect"
+    await send({"type": "websocket.accept"})
+    while True:
+        message = await receive()
+        if message["type"] == "websocket.disconnect":
+            break
+        await send({**message, "type": "websocket.send"})
+
+
+@pytest.mark.asyncio
+async def test_websocket(tracer: DummyTracer) -> None:
+    app = ddtrace_asgi.TraceMiddleware(echo, tracer=tracer, trace_websockets=True)
+    connection = Connection(
+        [
+            {"type": "websocket.receive", "text": "Hello"},
+            {"type": "websocket.receive", "text": "é"},
+            {"type": "websocket.receive", "bytes": b"\x00\x01"},
+            {"type": "websocket.receive"},
+        ]
+    )
+
+    await app(websocket_scope(), connection.receive, connection.send)
+
+    assert len(connection.outgoing) == 5
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    [span] = traces[0]
+    assert span.name == "asgi.websocket"
+    assert span.resource == "WEBSOCKET /ws"
+    assert span.get_tag("http.url") == "ws://testserver/ws"
+    assert span.get_metric("websocket.messages.received") == 4
+    assert span.get_metric("websocket.messages.sent") == 4
+    assert span.get_metric("websocket.bytes.received") == 5 + 2 + 2
+    assert span.get_metric("websocket.bytes.sent") == 5 + 2 + 2
+    assert span.get_metric("websocket.close_code") == 1001
+    for name in "receive.wait_ns", "send.latency_ns":
+        for suffix in "p50", "p99", "max":
+            assert span.get_metric(f"websocket.{name}.{suffix}") >= 0
+    assert span.get_metric("websocket.receive.latency_ns.p50") is None
+
+
+@pytest.mark.asyncio
+async def test_websocket_starlette(tracer: DummyTracer) -> None:
+    async def endpoint(websocket: WebSocket) -> None:
+        await websocket.accept()
+        await websocket.send_text("Hello")
+        await websocket.close(code=1000)
+
+    app = Starlette(routes=[WebSocketRoute("/ws/{room}", endpoint)])
+    app.add_middleware(
+        ddtrace_asgi.TraceMiddleware, tracer=tracer, trace_websockets=True
+    )
+    connection = Connection([])
+
+    await app(websocket_scope("/ws/lobby"), connection.receive, connection.send)
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    [span] = traces[0]
+    assert span.resource == "WEBSOCKET /ws/{room}"
+    assert span.get_metric("websocket.messages.sent") == 1
+    assert span.get_metric("websocket.close_code") == 1000
+
+
+@pytest.mark.asyncio
+async def test_websocket_exception(tracer: DummyTracer) -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await receive()
+        raise RuntimeError("Oops")
+
+    app = ddtrace_asgi.TraceMiddleware(app, tracer=tracer, trace_websockets=True)
+    connection = Connection([])
+
+    with pytest.raises(RuntimeError):
+        await app(websocket_scope(), connection.receive, connection.send)
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    [span] = traces[0]
+    assert span.error == 1
+    assert span.get_metric("websocket.close_code") is None
+    assert span.get_metric("websocket.send.latency_ns.p50") is None
+
+
+@pytest.mark.asyncio
+async def test_websocket_distributed_tracing(tracer: DummyTracer) -> None:
+    app = ddtrace_asgi.TraceMiddleware(echo, tracer=tracer, trace_websockets=True)
+    scope = websocket_scope()
+    scope["headers"] = [
+        (b"x-datadog-trace-id", b"1234"),
+        (b"x-datadog-parent-id", b"5678"),
+    ]
+    connection = Connection([])
+
+    await app(scope, connection.receive, connection.send)
+
+    traces = tracer.writer.pop_traces()
+    assert len(traces) == 1
+    [span] = traces[0]
+    assert span.trace_id == 1234
+    assert span.parent_id == 5678
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options, scope",
+    [
+        ({}, websocket_scope()),
+        ({"trace_websockets": True, "exclude": ["/ws"]}, websocket_scope()),
+        ({"trace_websockets": True}, {"type": "websocket"}),
+    ],
+)
+async def test_websocket_not_traced(
+    tracer: DummyTracer, options: dict, scope: Scope
+) -> None:
+    calls = []
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        calls.append(scope)
+
+    app = ddtrace_asgi.TraceMiddleware(app, tracer=tracer, **options)
+    connection = Connection([])
+    await app(scope, connection.receive, connection.send)
+
+    assert len(calls) == 1
+    assert tracer.writer.pop_traces() == []
+    if "exclude" in options:
+        assert calls[0]["ddtrace_asgi.span"] is None
+        assert calls[0]["ddtrace_asgi.context"] is None
+        assert "ddtrace_asgi.tags" in calls[0]
@@ -0,0 +1,272 @@
+import os
+import weakref
+from typing import Any, Dict, Iterator, List
+
+import httpx
+import pytest
+from ddtrace import Tracer
+from ddtrace.filters import FilterRequestsOnUrl
+from ddtrace.sampler import RateByServiceSampler
+from ddtrace.span import Span
+
+import ddtrace_asgi
+from ddtrace_asgi import _writer
+from tests.utils.agent import FakeAgent
+from tests.utils.fixtures import create_app
+
+
+@pytest.fixture
+def agent() -> Iterator[FakeAgent]:
+    with FakeAgent() as agent:
+        yield agent
+
+
+def make_trace(name: str = "test") -> List[Span]:
+    return [Span(tracer=None, name=name, service="test")]
+
+
+@pytest.mark.asyncio
+async def test_install(application: str, agent: FakeAgent) -> None:
+    tracer = Tracer()
+    tracer.configure(hostname="127.0.0.1", port=agent.port)
+    writer = ddtrace_asgi.BatchedWriter.install(tracer)
+    assert tracer.writer is writer
+
+    app = create_app(
+        application,
+        middleware=[(ddtrace_asgi.TraceMiddleware, {"tracer": tracer})],
+    )
+    async with httpx.AsyncClient(app=app) as client:
+        for _ in range(3):
+            r = await client.get("http://testserver/")
+            assert r.status_code == 200
+
+    writer.stop()
+
+    assert len(agent.traces) == 3
+    assert all(trace[0]["name"] == "asgi.request" for trace in agent.traces)
+    assert agent.payloads[0].endpoint == "/v0.4/traces"
+    assert agent.payload_size > 0
+    assert writer.stats == {
+        "buffered_traces": 0,
+        "written_traces": 3,
+        "dropped_traces": 0,
+        "sent_traces": 3,
+        "failed_traces": 0,
+    }
+
+
+def test_batch_size(agent: FakeAgent) -> None:
+    writer = ddtrace_asgi.BatchedWriter(
+        "127.0.0.1", agent.port, batch_size=10, flush_interval=60
+    )
+    try:
+        for _ in range(9):
+            writer.write(make_trace())
+        writer.write(None)
+        assert writer.stats["buffered_traces"] == 9
+
+        writer.write(make_trace())
+        agent.wait_for_traces(10)
+        assert len(agent.traces) == 10
+        assert [len(payload.traces) for payload in agent.payloads] == [10]
+    finally:
+        writer.stop()
+
+
+def test_count_only() -> None:
+    with FakeAgent(keep_traces=False) as agent:
+        writer = ddtrace_asgi.BatchedWriter("127.0.0.1", agent.port)
+        for _ in range(3):
+            writer.write(make_trace())
+        writer.stop()
+
+        assert agent.trace_count == 3
+        assert agent.traces == []
+        assert agent.payload_size > 0
+
+
+def test_capacity(agent: FakeAgent) -> None:
+    writer = ddtrace_asgi.BatchedWriter(
+        "127.0.0.1", agent.port, capacity=5, batch_size=2, flush_interval=60
+    )
+    writer._stopped = True  # Keep the background thread from flushing.
+    writer._wakeup.set()
+    writer._thread.join()
+
+    for _ in range(8):
+        writer.write(make_trace())
+    assert writer.stats["buffered_traces"] == 5
+    assert writer.dropped_traces == 3
+
+    writer.flush()
+    assert len(agent.traces) == 5
+    assert [len(payload.traces) for payload in agent.payloads] == [2, 2, 1]
+    assert writer.sent_traces == 5
+
+
+def test_filters(agent: FakeAgent) -> None:
+    writer = ddtrace_asgi.BatchedWriter(
+        "127.0.0.1",
+        agent.port,
+        filters=[FilterRequestsOnUrl(r"http://testserver/health")],
+    )
+    health = make_trace("health")
+    health[0].set_tag("http.url", "http://testserver/health")
+    writer.write(health)
+    writer.stop()
+    assert agent.traces == []
+
+    writer = ddtrace_asgi.BatchedWriter(
+        "127.0.0.1",
+        agent.port,
+        filters=[FilterRequestsOnUrl(r"http://testserver/health")],
+    )
+    writer.write(make_trace())
+    writer.write(health)
+    writer.stop()
+    assert [trace[0]["name"] for trace in agent.traces] == ["test"]
+
+
+def test_priority_sampler(agent: FakeAgent) -> None:
+    agent.rate_by_service = {"service:test,env:": 0.5}
+    sampler = RateByServiceSampler()
+    writer = ddtrace_asgi.BatchedWriter(
+        "127.0.0.1", agent.port, priority_sampler=sampler
+    )
+    writer.write(make_trace())
+    writer.stop()
+
+    assert sampler._by_service_samplers["service:test,env:"].sample_rate == 0.5
+
+    # No rates.
+    agent.rate_by_service = {}
+    writer = ddtrace_asgi.BatchedWriter(
+        "127.0.0.1", agent.port, priority_sampler=sampler
+    )
+    writer.write(make_trace())
+    writer.stop()
+    assert writer.sent_traces == 1
+
+
+def test_priority_sampler_update_rates(agent: FakeAgent) -> None:
+    # Priority samplers of ddtrace 0.33+.
+    class Sampler:
+        def __init__(self) -> None:
+            self.rates: List[Dict[str, float]] = []
+
+        def update_rate_by_service_sample_rates(self, rates: Dict[str, float]) -> None:
+            self.rates.append(rates)
+
+    agent.rate_by_service = {"service:test,env:": 0.5}
+    sampler = Sampler()
+    writer = ddtrace_asgi.BatchedWriter(
+        "127.0.0.1", agent.port, priority_sampler=sampler
+    )
+    writer.write(make_trace())
+    writer.stop()
+
+    assert sampler.rates == [{"service:test,env:": 0.5}]
+    assert writer.sent_traces == 1
+
+
+def test_invalid_rates(agent: FakeAgent) -> None:
+    agent.rate_by_service = {"service:test,env:": "invalid"}  # type: ignore
+    sampler = RateByServiceSampler()
+    writer = ddtrace_asgi.BatchedWriter(
+        "127.0.0.1", agent.port, priority_sampler=sampler
+    )
+    writer.write(make_trace())
+    writer.stop()
+
+    assert "service:test,env:" not in sampler._by_service_samplers
+    assert writer.sent_traces == 1
+    assert writer.dropped_traces == 0
+
+
+def test_send_error(agent: FakeAgent) -> None:
+    class BrokenFilter:
+        def process_trace(self, trace: List[Span]) -> List[Span]:
+            raise RuntimeError("Oops")
+
+    writer = ddtrace_asgi.BatchedWriter(
+        "127.0.0.1", agent.port, batch_size=2, filters=[BrokenFilter()]
+    )
+    for _ in range(3):
+        writer.write(make_trace())
+    writer.stop()
+
+    assert agent.traces == []
+    assert writer.stats == {
+        "buffered_traces": 0,
+        "written_traces": 3,
+        "dropped_traces": 3,
+        "sent_traces": 0,
+        "failed_traces": 0,
+    }
+
+
+@pytest.mark.parametrize("status", [500, None])
+def test_agent_error(status: int) -> None:
+    with FakeAgent(status=status or 200) as agent:
+        port = agent.port if status else 1
+        writer = ddtrace_asgi.BatchedWriter("127.0.0.1", port)
+        writer.write(make_trace())
+        writer.write(make_trace())
+        writer.stop()
+
+    assert writer.failed_traces == 2
+    assert writer.sent_traces == 0
+
+
+def test_restart_at_fork(agent: FakeAgent, monkeypatch: Any) -> None:
+    writer = ddtrace_asgi.BatchedWriter("127.0.0.1", agent.port, flush_interval=60)
+    writer.write(make_trace())
+    # The background thread does not survive a fork.
+    writer._stopped = True
+    writer._wakeup.set()
+    writer._thread.join()
+    writer._stopped = False
+    agent.payloads.clear()
+
+    monkeypatch.setattr(_writer, "_writers", weakref.WeakSet([writer]))
+    _writer._restart_at_fork()
+    # The tracer then asks for a new writer, on its first span.
+    assert writer.recreate() is writer
+    assert writer._thread.is_alive()
+    assert writer.stats["buffered_traces"] == writer.stats["written_traces"] == 0
+
+    writer.write(make_trace())
+    writer.stop()
+    assert len(agent.traces) == 1
+    assert writer.sent_traces == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork()")
+def test_fork(agent: FakeAgent) -> None:
+    tracer = Tracer()
+    tracer.configure(hostname="127.0.0.1", port=agent.port)
+    writer = ddtrace_asgi.BatchedWriter.install(tracer, flush_interval=60)
+    tracer.trace("parent").finish()
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        # NOTE: leave the child without running pytest teardown.
+        code = 1
+        try:
+            # NOTE: the tracer recreates its writer on the first span of a new process.
+            tracer.trace("child").finish()
+            writer.stop(timeout=5)
+            if (
+                tracer.writer is writer
+                and writer.sent_traces == 1
+                and writer.stats["buffered_traces"] == 0
+            ):
+                code = 0
+        finally:
+            os._exit(code)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    writer.stop()
+    assert sorted(trace[0]["name"] for trace in agent.traces) == ["child", "parent"]
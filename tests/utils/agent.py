@@ -0,0 +1,118 @@
+"""
+A fake Datadog Agent, that decodes and counts trace payloads.
+"""
+
+import json
+import threading
+import typing
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from ddtrace.vendor import msgpack
+
+
+class Payload(typing.NamedTuple):
+    endpoint: str
+    size: int
+    traces: typing.List[typing.List[dict]]
+    trace_count: int
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    agent: "FakeAgent"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _Server
+
+    def do_PUT(self) -> None:
+        agent = self.server.agent
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+
+        if agent.status >= 400:
+            self.send_response(agent.status)
+            self.end_headers()
+            return
+
+        # NOTE: ddtrace encodes traces with msgpack by default.
+        traces = msgpack.unpackb(body, raw=False)
+        agent.record(
+            Payload(
+                self.path, len(body), traces if agent.keep_traces else [], len(traces)
+            )
+        )
+
+        response = json.dumps({"rate_by_service": agent.rate_by_service}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format: str, *args: typing.Any) -> None:
+        pass
+
+
+class FakeAgent:
+    """
+    Usage:
+
+        with FakeAgent() as agent:
+            writer = BatchedWriter(hostname="127.0.0.1", port=agent.port)
+            ...
+            agent.wait_for_traces(10)
+
+    With `keep_traces=False`, traces are only counted, so that long load tests do not
+    keep them all in memory.
+    """
+
+    def __init__(self, status: int = 200, keep_traces: bool = True) -> None:
+        self.status = status
+        self.keep_traces = keep_traces
+        self.rate_by_service: typing.Dict[str, float] = {}
+        self.payloads: typing.List[Payload] = []
+        self._received = threading.Condition()
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.agent = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.01,), daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def traces(self) -> typing.List[typing.List[dict]]:
+        with self._received:
+            return [trace for payload in self.payloads for trace in payload.traces]
+
+    @property
+    def trace_count(self) -> int:
+        with self._received:
+            return sum(payload.trace_count for payload in self.payloads)
+
+    @property
+    def payload_size(self) -> int:
+        with self._received:
+            return sum(payload.size for payload in self.payloads)
+
+    def record(self, payload: Payload) -> None:
+        with self._received:
+            self.payloads.append(payload)
+            self._received.notify_all()
+
+    def wait_for_traces(self, count: int, timeout: float = 5) -> None:
+        with self._received:
+            self._received.wait_for(
+                lambda: sum(p.trace_count for p in self.payloads) >= count, timeout
+            )
+
+    def __enter__(self) -> "FakeAgent":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
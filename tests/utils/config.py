@@ -13,3 +13,18 @@ def override_config(integration: str, **values: typing.Any) -> typing.Iterator[N
         yield
     finally:
         options.update(original)
+
+
+@contextlib.contextmanager
+def override_http_config(
+    integration: str, trace_headers: typing.Sequence[str]
+) -> typing.Iterator[None]:
+    http_config = getattr(ddtrace.config, integration).http
+    original = set(http_config._whitelist_headers)
+    http_config._whitelist_headers.clear()
+    http_config.trace_headers(list(trace_headers))
+    try:
+        yield
+    finally:
+        http_config._whitelist_headers.clear()
+        http_config._whitelist_headers.update(original)